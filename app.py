@@ -1,12 +1,29 @@
+import atexit
+import hmac
+import os
+import time
+import uuid
+_script_started = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
-import zipfile
-import os
-import plotly.graph_objects as go
 import streamlit.components.v1 as components
-from autogluon.tabular import TabularPredictor
+import bulk_jobs
+import feature_schema
+import frontend_assets
+import recommendations
+import risk_gauge
+import scoring
+import what_if
+from assessment_store import AssessmentStore, read_cohort
+from model_loader import BackgroundLoader
+from bulk_jobs import JobManager, JobRejectedError
+from micro_batcher import MicroBatcher, QueueFullError
+from model_server import ADDRESS_ENV, ModelClient
+from result_cache import ResultCache, encode_answers
+
+_imports_done = time.perf_counter()
 
 # ==========================================
 # 1. ตั้งค่าหน้าเว็บและธีม (NOMOS Style)
@@ -17,77 +34,33 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
-
-# Custom CSS: หัวข้อ = Sarabun, เนื้อหา = Sarabun
-st.markdown("""
-<style>
-    /* 1. นำเข้า Font จาก Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Sarabun:wght@300;400;600;700&family=Sarabun:wght@300;400;500;700&display=swap');
-    
-    /* 2. กำหนด Font พื้นฐาน (เนื้อหา) เป็น Sarabun */
-    html, body, [class*="css"], p, div, label, .stMarkdown, .stTextInput, .stNumberInput, .stSelectbox {
-        font-family: 'Sarabun', sans-serif;
-        color: #333333;
-    }
-
-    /* 3. กำหนด Font หัวข้อ (Header) เป็น Sarabun */
-    h1, h2, h3, h4, h5, h6, .stTitle {
-        font-family: 'Sarabun', sans-serif !important;
-        font-weight: 600; /* ปรับความหนาให้ดูเด่น */
-    }
-    
-    /* 4. ปรับแต่งปุ่มกด (Button) ให้เป็น Sarabun เพื่อความสวยงาม */
-    .stButton>button {
-        font-family: 'Sarabun', sans-serif !important;
-        border-radius: 20px;
-        border: 1px solid #333;
-        color: #333;
-        background-color: white;
-        padding: 10px 24px;
-        transition: all 0.3s;
-    }
-    .stButton>button:hover {
-        background-color: #333;
-        color: white;
-        border-color: #333;
-    }
-
-    /* 5. ปรับแต่ง Class พิเศษ (จากโค้ดหน้า Landing Page) */
-    .hero-text {
-        font-family: 'Sarabun', sans-serif;
-        font-size: 3em;
-        font-weight: 400; /* แก้ไข: ปรับจาก 700 เป็น 400 ให้ตัวบางลง */
-        color: #1E3A8A;
-        text-align: center;
-        margin-bottom: 20px;
-    }
-    .sub-hero {
-        font-family: 'Sarabun', sans-serif; /* คำโปรยรอง */
-        font-size: 1.5em;
-        font-weight: 300;
-        color: #555;
-        text-align: center;
-        margin-bottom: 40px;
-    }
-    .step-indicator {
-        font-family: 'Sarabun', sans-serif;
-        text-align: center;
-        color: #888;
-        font-size: 0.9em;
-        margin-bottom: 20px;
-    }
-</style>
-""", unsafe_allow_html=True)
+# ฟอนต์ + CSS ทุกหน้าอยู่ใน static/fincheck.css (ฝังครั้งเดียวต่อ Session ที่ส่วน Main App Logic)
 
 # ==========================================
 # 2. ระบบจัดการ Session State (เพื่อเปลี่ยนหน้า)
 # ==========================================
+# หน้าสำหรับเจ้าหน้าที่/นักวิเคราะห์ เปิดได้เฉพาะเมื่อ ?token= ตรงกับ FINCHECK_STAFF_TOKEN (ไม่ตั้ง = ปิดหน้าเหล่านี้)
+# ผู้ใช้ทั่วไปที่เปิด ?view=... โดยไม่มี Token จะเห็นหน้าแรกตามปกติ
+STAFF_TOKEN_ENV = 'FINCHECK_STAFF_TOKEN'
+STAFF_PAGES = ('cohort', 'bulk')
+
+def is_staff():
+    token = os.environ.get(STAFF_TOKEN_ENV)
+    return bool(token) and hmac.compare_digest(st.query_params.get('token', '').encode('utf-8'), token.encode('utf-8'))
+
 if 'page' not in st.session_state:
-    st.session_state.page = 'landing'
+    # ?view=cohort = เปิดหน้าภาพรวมสำหรับนักวิเคราะห์โดยตรง / ?view=bulk = หน้าอัปโหลดไฟล์ให้คะแนนทีละมากสำหรับเจ้าหน้าที่
+    view = st.query_params.get('view')
+    st.session_state.page = view if view in STAFF_PAGES and is_staff() else 'landing'
 if 'inputs' not in st.session_state:
     st.session_state.inputs = {}
 if 'results' not in st.session_state:
     st.session_state.results = {}
+if 'bulk_jobs' not in st.session_state:
+    # รหัสงานให้คะแนนไฟล์ของ Session นี้ (งานทำต่อแม้เปลี่ยนหน้า) เก็บใน URL ด้วย เปิดหน้าใหม่/รีเฟรชก็ยังตามงานเดิมได้
+    st.session_state.bulk_jobs = [j for j in st.query_params.get('jobs', '').split(',') if j]
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex # ใช้ผูกผลการประเมินกับโปรไฟล์ของผู้ใช้คนเดียวกัน
 
 def navigate_to(page):
     st.session_state.page = page
@@ -97,78 +70,75 @@ def navigate_to(page):
 # 3. ฟังก์ชันโหลดโมเดล (Resource Loader)
 # ==========================================
 @st.cache_resource
+def start_model_loader():
+    # เริ่มโหลดโมเดลใน Thread เบื้องหลังครั้งเดียวต่อ Process (ไม่บล็อกการวาดหน้า Landing/แบบฟอร์ม)
+    return BackgroundLoader()
+
 def load_resources():
-    # 3.1 โหลด Clustering Model
-    if not os.path.exists('kmeans_behavior_model.joblib') or not os.path.exists('scaler_behavior.joblib'):
-        st.error("ไม่พบไฟล์โมเดล Clustering (.joblib) กรุณาตรวจสอบ GitHub")
-        st.stop()
-        
-    kmeans = joblib.load('kmeans_behavior_model.joblib')
-    scaler = joblib.load('scaler_behavior.joblib')
+    # รอโมเดลเฉพาะกรณีที่ผู้ใช้กดประเมินผลก่อนโหลดเสร็จ
+    loader = start_model_loader()
+    if not loader.ready():
+        with st.spinner("กำลังเตรียมระบบพยากรณ์ กรุณารอสักครู่..."):
+            return loader.result()
+    return loader.result()
+
+def model_texts(version):
+    # ข้อความ DNA/คำแนะนำของรุ่นโมเดลที่ให้ผลนี้ (None = ข้อความเริ่มต้น เช่น ใช้ Server ให้คะแนน)
+    return None if MODEL_SERVER else start_model_loader().texts(version)
+
+@st.cache_resource(max_entries=2)
+def get_result_cache(version):
+    # Cache ผลการประเมินต่อรุ่นโมเดล (โมเดลเปลี่ยน = Cache ใหม่ ผลของรุ่นเก่าหมดอายุตาม result_cache.DEFAULT_MAX_AGE)
+    return ResultCache(version)
+
+@st.cache_resource(max_entries=1, on_release=lambda batcher: batcher.close())
+def get_batcher(version, _resources):
+    # รวมคำขอพยากรณ์จากทุก Session ใน Process นี้เป็น Batch (1 ตัวต่อรุ่นโมเดล)
+    # สลับรุ่น -> ตัวรวมของรุ่นเดิมพยากรณ์คำขอที่ค้างให้หมดแล้วปิด และปล่อยโมเดลรุ่นเดิม
+    return MicroBatcher.from_env(
+        lambda answers: scoring.predict_risk_prob(answers, _resources.predictor, _resources.template))
 
-    # 3.2 โหลด AutoGluon (รวมไฟล์ Zip)
-    extract_path = './autogluon_model_extracted'
-    combined_zip_name = 'full_model_combined.zip'
+@st.cache_resource
+def get_model_client(address):
+    return ModelClient(address)
 
-    if not os.path.exists(extract_path):
-        part_files = sorted([f for f in os.listdir('.') if f.startswith('model_part_')])
-        
-        if not part_files:
-            # กรณีไม่มีไฟล์ part (อาจจะรันในเครื่องที่มีโฟลเดอร์อยู่แล้ว หรือไม่มีไฟล์เลย)
-            if not os.path.exists("Ag-20250201_135012"): # เช็คชื่อโฟลเดอร์โมเดลจริง
-                 st.warning("ไม่พบไฟล์โมเดล AutoGluon (model_part_*.zip) กำลังทำงานในโหมด Demo...")
-                 return kmeans, scaler, None, None 
-
-        if part_files:
-            with open(combined_zip_name, 'wb') as combined_file:
-                for part in part_files:
-                    with open(part, 'rb') as p:
-                        combined_file.write(p.read())
-            
-            with zipfile.ZipFile(combined_zip_name, 'r') as zip_ref:
-                zip_ref.extractall(extract_path)
-
-    # ค้นหา path ของ predictor.pkl
-    model_path = extract_path
-    for root, dirs, files in os.walk(extract_path):
-        if 'predictor.pkl' in files:
-            model_path = root
-            break
-    
-    try:
-        predictor = TabularPredictor.load(model_path, require_py_version_match=False)
-    except:
-        predictor = None # กรณีโหลดไม่ได้จริงๆ
+@st.cache_resource
+def get_assessment_store():
+    # ที่เก็บผลการประเมิน/โปรไฟล์ 1 ตัวต่อ Process (เขียนลงดิสก์ด้วย Thread เบื้องหลัง) เขียนที่ค้างให้หมดตอนปิด
+    store = AssessmentStore.from_env()
+    atexit.register(store.close, 5.0)
+    return store
+
+@st.cache_resource
+def get_job_manager():
+    # คิวงานให้คะแนนไฟล์ 1 ตัวต่อ Process (Worker Thread เบื้องหลัง ใช้ร่วมกันทุก Session)
+    return JobManager.from_env()
+
+# ตั้ง FINCHECK_MODEL_SERVER = ใช้ Server ให้คะแนนแยก Process (model_server.py) Replica นี้ไม่ต้องโหลดโมเดลเอง
+MODEL_SERVER = os.environ.get(ADDRESS_ENV)
+
+# เริ่มโหลดทรัพยากร (ไม่รอ)
+model_loader = None if MODEL_SERVER else start_model_loader()
 
-    # 3.3 โหลดข้อมูลดิบ (สำหรับ Imputation)
+if model_loader is not None and model_loader.ready():
     try:
-        df_raw = pd.read_excel('RawData2.xlsx')
-    except:
-        df_raw = pd.DataFrame() # กรณีไม่มีไฟล์
-
-    return kmeans, scaler, predictor, df_raw
-
-# โหลดทรัพยากร
-kmeans_model, scaler_model, predictor_model, df_raw = load_resources()
-
-# --- ฟังก์ชันสั่งเลื่อนหน้าจอขึ้นบนสุด (อัปเดตแก้ปัญหาหน้า 4 ไม่เลื่อน) ---
-def scroll_to_top():
-    js = """
-        <script>
-            // หน่วงเวลา 0.15 วินาที (150ms) เพื่อรอให้ Streamlit วาดหน้าจอให้เสร็จก่อน
-            setTimeout(function() {
-                // 1. สั่งเลื่อนหน้าต่างหลัก (Window)
-                window.parent.scrollTo(0, 0);
-                
-                // 2. สั่งเลื่อนกรอบเนื้อหาของ Streamlit (ครอบคลุมทั้งคอมพิวเตอร์และมือถือ)
-                var containers = window.parent.document.querySelectorAll('.main, .block-container, .stApp');
-                for (var i = 0; i < containers.length; i++) {
-                    containers[i].scrollTop = 0;
-                }
-            }, 150); 
-        </script>
-    """
-    components.html(js, height=0)
+        _resources = model_loader.result()
+    except FileNotFoundError as e:
+        st.error(str(e))
+        st.stop()
+    except Exception as e:
+        # ไฟล์ Part เสีย / โหลด AutoGluon ไม่ได้ -> แสดงข้อผิดพลาด (หน้าอื่นยังใช้ได้ ระบบลองโหลดใหม่เบื้องหลัง)
+        st.error(f"🚨 โหลดโมเดลไม่สำเร็จ: {e}")
+        _resources = None
+    if _resources is not None and _resources.predictor is None and _resources.template is None:
+        st.warning("ไม่พบไฟล์โมเดล AutoGluon (model_part_*.zip) กำลังทำงานในโหมด Demo...")
+
+# --- ช่องเลือกคำตอบ 1 ข้อ (ข้อความคำถาม/ตัวเลือก/ค่าเริ่มต้นมาจาก feature_schema คืนค่ารหัสที่ส่งเข้าโมเดลโดยตรง) ---
+def answer_select(name):
+    field = feature_schema.FIELDS[name]
+    codes = feature_schema.choice_codes(name)
+    return st.selectbox(field.label, codes, index=codes.index(field.default),
+                        format_func=lambda code: feature_schema.choice_label(name, code))
 
 # ==========================================
 # 4. ส่วนแสดงผล (Page Views)
@@ -176,60 +146,6 @@ def scroll_to_top():
 
 # --- หน้าที่ 1: Landing Page (แก้ไข: SME FinCheck เป็น Jost Light สีชมพู + ปุ่มมีกรอบเทา) ---
 def show_landing():
-    # 1. ฝัง CSS (Sarabun + Jost + Button Styling)
-    st.markdown("""
-        <style>
-        /* นำเข้า Font: Sarabun (ไทย) และ Jost (อังกฤษ) */
-        @import url('https://fonts.googleapis.com/css2?family=Jost:wght@300;400;600&family=Sarabun:wght@300;400;600&display=swap');
-        
-        /* บังคับใช้ฟอนต์ Sarabun กับทุกส่วนของเว็บเป็นหลัก */
-        html, body, [class*="css"], h1, h2, h3, button, input, select, label, div {
-            font-family: 'Sarabun', sans-serif !important;
-        }
-        
-        /* ปรับหัวข้อสีน้ำเงินเข้ม */
-        h1, h2, h3 { color: #1E3A8A !important; font-weight: 600; }
-        
-        /* --- ส่วนตกแต่งปุ่มกด (Start) --- */
-        /* 1. สถานะปกติ (มีกรอบเทาตลอดเวลา) */
-        div[data-testid="stBaseButton-primary"] > button, 
-        button[kind="primary"] {
-            transition: all 0.3s ease !important;
-            border-radius: 8px !important;
-            border: 2px solid #A9A9A9 !important; /* กรอบสีเทา */
-        }
-        
-        /* 2. สถานะเมื่อเอาเมาส์ไปชี้ (Hover) -> เปลี่ยนพื้นหลังเป็นสีชมพู */
-        div[data-testid="stBaseButton-primary"] > button:hover,
-        button[kind="primary"]:hover {
-            background-color: #FE5C8D !important;  /* สีชมพูจุฬาฯ */
-            border-color: #A9A9A9 !important;     /* กรอบยังคงเป็นสีเทา */
-            color: white !important;              /* ตัวอักษรสีขาว */
-            box-shadow: 0 4px 15px rgba(254, 92, 141, 0.4) !important;
-            transform: scale(1.05) !important;
-        }
-
-        /* Hero Text */
-        .hero-title {
-            font-family: 'Sarabun', sans-serif !important;
-            font-size: 2.5em !important;
-            font-weight: bold;
-            color: #1E3A8A;
-            text-align: center;
-            margin-top: 20px;
-            margin-bottom: 10px;
-            line-height: 1.3;
-        }
-        .hero-subtitle {
-            font-family: 'Sarabun', sans-serif !important;
-            font-size: 1.2em !important;
-            color: #555;
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-
     # 2. แสดงรูปภาพ (บีบให้เหลือ 50% ของหน้าจอ)
     c_img1, c_img2, c_img3 = st.columns([1, 2, 1]) 
     with c_img2:
@@ -244,7 +160,7 @@ def show_landing():
     st.markdown("""
         <div class="hero-title">
             ตรวจสุขภาพธุรกิจและการเงินด้วย<br>
-            <span style='font-family: "Jost", sans-serif; font-weight: 500; color: #FE5C8D; font-size: 1.1em;'>SME FinCheck</span>
+            <span class="brand">SME FinCheck</span>
         </div>
     """, unsafe_allow_html=True)
     
@@ -271,22 +187,6 @@ def show_landing():
         
 # --- หน้าที่ 2: Input Step 1 (DNA) ---
 def show_input_step1():
-    scroll_to_top() # <--- ใส่ไว้บรรทัดแรก
-    
-    # 1. ฝัง CSS (Sarabun + สีหัวข้อ)
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Sarabun:wght@300;400;600&display=swap');
-        
-        html, body, [class*="css"], h1, h2, h3, h4, h5, button, input, select, label, div {
-            font-family: 'Sarabun', sans-serif !important;
-        }
-        
-        /* ปรับสีหัวข้อให้เป็นสีน้ำเงิน */
-        h1, h2, h3 { color: #1E3A8A !important; font-weight: 600; }
-        </style>
-    """, unsafe_allow_html=True)
-    
     st.markdown('<p style="color: #888; font-size: 1.1em; margin-bottom: 0;">ขั้นตอนที่ 1/2: การประเมิน</p>', unsafe_allow_html=True)
     
     # หัวข้อหลัก
@@ -299,28 +199,25 @@ def show_input_step1():
         "**5** = มากที่สุด"
     )
 
-    # ตัวเลือกคะแนน
-    score_options = [0, 1, 2, 3, 4, 5]
-
     with st.form("form_step1"):
         col1, col2, col3 = st.columns(3)
         
         with col1:
             st.markdown("<h5 style='color: #1E3A8A; font-weight: bold;'>การตลาดและผลิตภัณฑ์</h5>", unsafe_allow_html=True)
-            beh_mon = st.selectbox("ท่านติดตามและตรวจสอบความพึงพอใจของลูกค้า", score_options, index=0)
-            brn_image = st.selectbox("ท่านให้ความสำคัญกับภาพลักษณ์องค์กร", score_options, index=0)
-            brn_brand = st.selectbox("การรับรู้และความน่าเชื่อถือของแบรนด์ของท่าน", score_options, index=0)
+            beh_mon = answer_select('BEH_MON')
+            brn_image = answer_select('BRN_IMAGE')
+            brn_brand = answer_select('BRN_BRAND')
         
         with col2:
             st.markdown("<h5 style='color: #1E3A8A; font-weight: bold;'>เทคโนโลยีและการรับมือสถานการณ์</h5>", unsafe_allow_html=True)
-            sav_virus = st.selectbox("การอัพเดทโปรแกรมป้องกันไวรัสเพื่อความปลอดภัยของระบบงาน", score_options, index=0)
-            sav_pdpa = st.selectbox("ท่านปฏิบัติตามกฎหมาย PDPA เพื่อรักษาข้อมูลลูกค้า", score_options, index=0)
-            cri_pln = st.selectbox("ท่านมีแผนรองรับวิกฤตการณ์ต่าง ๆ เช่น ภัยสงคราม โรคระบาด แผ่นดินไหว เป็นต้น", score_options, index=0)
+            sav_virus = answer_select('SAV_VIRUS')
+            sav_pdpa = answer_select('SAV_PDPA')
+            cri_pln = answer_select('CRI_PLN')
 
         with col3:
             st.markdown("<h5 style='color: #1E3A8A; font-weight: bold;'>นโยบายภาครัฐ</h5>", unsafe_allow_html=True)
-            pol_ben = st.selectbox("ท่านได้รับประโยชน์จากนโยบายภาครัฐ", score_options, index=0)
-            pol_adj = st.selectbox("ท่านสามารถปรับรูปแบบธุรกิจให้สอดคล้องนโยบายรัฐ", score_options, index=0)
+            pol_ben = answer_select('POL_BEN')
+            pol_adj = answer_select('POL_ADJ')
 
         st.markdown("---")
         
@@ -340,180 +237,152 @@ def show_input_step1():
 
 # --- หน้าที่ 3: Input Step 2 (Business Mgmt) ---
 def show_input_step2():
-    scroll_to_top() 
-
-    # 1. ฝัง CSS
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Sarabun:wght@300;400;600&display=swap');
-        html, body, [class*="css"], h1, h2, h3, h4, h5, h6, p, span, div, label, button, input, select {
-            font-family: 'Sarabun', sans-serif !important;
-        }
-        .stButton>button {
-            background-color: #FE5C8D !important;
-            color: white !important;
-            border: 1px solid #ddd !important;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-
     st.markdown('<p style="color: #888; font-size: 1.1em; margin-bottom: 0;">ขั้นตอนที่ 2/2: การประเมิน</p>', unsafe_allow_html=True)
     st.markdown("<h3 style='color: #1E3A8A; margin-top: 0;'>💼 ระดับดำเนินงาน</h3>", unsafe_allow_html=True)
 
     st.info("💡 **กรุณาประเมินระดับการดำเนินงาน**\n\n**0** = ไม่มี   •   **1** = น้อยที่สุด   •   **5** = มากที่สุด")
 
-    # ✅ ใช้คำสั่ง list(range(6)) เพื่อสร้างเลข 0 ถึง 5 อัตโนมัติ (แก้ปัญหาระบบแชทกลืนตัวเลข)
-    score_options = list(range(6))
-    binary_options = ["ไม่มี (0)", "มี (1)"]
-
     with st.form("form_step2"):
         col1, col2, col3 = st.columns(3)
         with col1:
             st.markdown("<p style='color: #1E3A8A; font-weight: bold;'>ผู้ประกอบการและทีมงาน</p>", unsafe_allow_html=True)
-            cap_netw = st.selectbox("ท่านใช้เครือข่ายหรือพันธมิตรในการดำเนินธุรกิจในระดับใด", score_options, index=0)
-            csr3 = st.selectbox("กิจการของท่านมีระบบกำจัดของเสีย", binary_options, index=0)
-            ohr_career = st.selectbox("กิจการของท่านมีเส้นทางอาชีพให้พนักงานรับรู้", binary_options, index=0)
+            cap_netw = answer_select('CAP_NETW')
+            csr3 = answer_select('CSR3')
+            ohr_career = answer_select('OHR_CAREER')
         
         with col2:
             st.markdown("<p style='color: #1E3A8A; font-weight: bold;'>การบัญชีและสถานการณ์เศรษฐกิจ</p>", unsafe_allow_html=True)
-            prc_cfw = st.selectbox("กระแสเงินสดเพื่อประกอบธุรกิจและชำระหนี้อยู่ในระดับใด", score_options, index=0)
-            eco_adt = st.selectbox("กิจการของท่านสามารถในการปรับตัวรับสถานการณ์เศรษฐกิจในระดับใด", score_options, index=0)
+            prc_cfw = answer_select('PRC_CFW')
+            eco_adt = answer_select('ECO_ADT')
         
         with col3:
             st.markdown("<p style='color: #1E3A8A; font-weight: bold;'>เทคโนโลยีและการสื่อสาร</p>", unsafe_allow_html=True)
-            ecm_net = st.selectbox("การเข้าถึงเครือข่ายอินเตอร์เน็ตของกิจการอยู่ในระดับใด", score_options, index=0)
-            res_ch = st.selectbox("ความสามารถในการโต้ตอบลูกค้าผ่านช่องทางต่าง ๆ อยู่ในระดับใด", score_options, index=0)
+            ecm_net = answer_select('ECM_NET')
+            res_ch = answer_select('RES_CH')
 
         st.markdown("---")
         submitted = st.form_submit_button("🚀 ประเมินผลลัพธ์", type="primary", use_container_width=True)
 
         if submitted:
-            csr3_val = 1 if "มี" in csr3 else 0
-            ohr_career_val = 1 if "มี" in ohr_career else 0
-            
             st.session_state.inputs.update({
-                'CAP_NETW': cap_netw, 'CSR3': csr3_val, 'OHR_CAREER': ohr_career_val,
+                'CAP_NETW': cap_netw, 'CSR3': csr3, 'OHR_CAREER': ohr_career,
                 'PRC_CFW': prc_cfw, 'ECO_ADT': eco_adt,
                 'ECM_NET': ecm_net, 'RES_CH': res_ch,
             })
             
             success = process_results()
             if success:
+                save_assessment()
                 navigate_to('dashboard') 
 
+# --- บันทึกผลการประเมินลงที่เก็บถาวร (แค่ใส่คิว ไม่รอดิสก์) ---
+def save_assessment():
+    results = st.session_state.results
+    get_assessment_store().record_assessment(
+        st.session_state.session_id, st.session_state.inputs, results['cluster_id'], results['risk_prob'],
+        results['risk_score'], results.get('model_version'))
+
 # --- ฟังก์ชันประมวลผล (Processing Logic) ---
+def process_results_remote(answers):
+    # ส่งคำตอบไปให้ Server ให้คะแนน คำนวณทั้ง DNA ธุรกิจและความเสี่ยง
+    client = get_model_client(MODEL_SERVER)
+    try:
+        cache = get_result_cache(client.info()['version'])
+        cache_key = encode_answers(answers.iloc[0].to_numpy())
+        cached = cache.get(cache_key) if cache_key is not None else None
+        version = cache.version
+        if cached is None:
+            started = time.perf_counter()
+            scores, version = client.score(answers)
+    except (ConnectionError, TimeoutError) as e:
+        st.error(f"⏳ {e}")
+        return False
+    except Exception as e:
+        st.error(f"🚨 ข้อผิดพลาดจากระบบพยากรณ์: {e}")
+        return False
+
+    if cached is not None:
+        cluster_id, prob, risk_score = cached
+    else:
+        cluster_id, prob, risk_score = (int(scores['cluster_id'].iloc[0]), float(scores['risk_prob'].iloc[0]),
+                                        float(scores['risk_score'].iloc[0]))
+        if cache_key is not None and version == cache.version:
+            cache.put(cache_key, (cluster_id, prob, risk_score), time.perf_counter() - started)
+    st.session_state.results.update({'cluster_id': int(cluster_id), 'risk_prob': prob, 'risk_score': risk_score,
+                                     'model_version': version})
+    return True
+
 def process_results():
     prob = 0.5
     cluster_id = 0
     inputs = st.session_state.inputs
 
+    # แปลงคำตอบเป็นตาราง 1 แถว (ใช้ขั้นตอนเดียวกับ scoring.score_frame เพื่อให้ผลตรงกัน)
+    answers = scoring.prepare_answers([inputs])
+    if MODEL_SERVER:
+        return process_results_remote(answers)
+
+    try:
+        resources = load_resources()
+    except Exception as e:
+        st.error(f"🚨 โหลดโมเดลไม่สำเร็จ: {e}")
+        return False
+
+    # 0. ตรวจ Cache (คำตอบชุดนี้เคยประเมินด้วยโมเดลรุ่นนี้แล้ว ไม่ต้องเรียกโมเดลซ้ำ)
+    cache = get_result_cache(resources.version)
+    cache_key = encode_answers(answers.iloc[0].to_numpy())
+    cached = cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        cluster_id, prob, risk_score = cached
+        st.session_state.results.update({'cluster_id': int(cluster_id), 'risk_prob': prob, 'risk_score': risk_score,
+                                         'model_version': resources.version})
+        return True
+
+    started = time.perf_counter()
+    cluster_ok = True
+
     # 1. Clustering Logic (DNA ธุรกิจ)
-    cluster_features = ['BEH_MON', 'BRN_IMAGE', 'BRN_BRAND', 'SAV_VIRUS', 'SAV_PDPA', 'CRI_PLN', 'POL_BEN', 'POL_ADJ']
-    cluster_vals = [inputs.get(f, 0) for f in cluster_features]
-    
     try:
-        X_cluster = pd.DataFrame([cluster_vals], columns=cluster_features)
-        X_scaled = scaler_model.transform(X_cluster)
-        raw_cluster_id = kmeans_model.predict(X_scaled)
-        cluster_id = int(np.ravel(raw_cluster_id).item())
+        cluster_id = int(scoring.assign_clusters(answers, resources.scaler, resources.kmeans, resources.cluster_table)[0])
     except Exception as e:
         print(f"Cluster Error: {e}")
         cluster_id = 0
+        cluster_ok = False
         
     st.session_state.results['cluster_id'] = cluster_id
 
-    # 2. Prediction Logic (AutoGluon)
-    if predictor_model is not None and not df_raw.empty:
+    # 2. Prediction Logic (AutoGluon ผ่านตัวรวม Batch ข้าม Session)
+    if scoring.has_predictor(resources):
         try:
-            pred_df = df_raw.head(1).copy().reset_index(drop=True)
+            prob = float(get_batcher(resources.version, resources).predict(answers)[0])
             
-            for col in pred_df.columns:
-                pred_df.at[0, col] = float('nan')
-            
-            for key, val in inputs.items():
-                if key in pred_df.columns:
-                    pred_df.at[0, key] = float(val) if isinstance(val, (int, float)) else val
-
-            if 'SIZ' in pred_df.columns: pred_df.at[0, 'SIZ'] = 1 
-            if 'YER' in pred_df.columns: pred_df.at[0, 'YER'] = 10 
-                
-            prob_df = predictor_model.predict_proba(pred_df)
-            
-            # ✅ แก้ปัญหา _iLocIndexer ด้วยการดึงค่าผ่าน numpy array (flatten) รับรองไม่พัง
-            prob_array = prob_df.values.flatten()
-            prob = float(prob_array[-1]) 
-            
-            # =======================================================
-            # 🌟 ส่วนเทียบบัญญัติไตรยางศ์ (Min-Max Scaling จากค่าทดสอบจริง)
-            # =======================================================
-            MAX_RAW_PROB = 0.491  # เพดานความเสี่ยงสูงสุด (เมื่อตอบ 0 หมด)
-            MIN_RAW_PROB = 0.099  # พื้นความเสี่ยงต่ำสุด (เมื่อตอบ 5 และมีครบหมด)
-            
-            # สมการเทียบบัญญัติไตรยางศ์: (ค่าปัจจุบัน - ค่าต่ำสุด) / (ค่าสูงสุด - ค่าต่ำสุด)
-            # ป้องกันกรณีตัวหารเป็น 0 (เผื่อไว้)
-            if MAX_RAW_PROB > MIN_RAW_PROB:
-                scaled_prob = (prob - MIN_RAW_PROB) / (MAX_RAW_PROB - MIN_RAW_PROB)
-            else:
-                scaled_prob = 0
-                
-            risk_score = scaled_prob * 100
-            
-            # ดักไว้ไม่ให้คะแนนทะลุ 100 หรือติดลบ (ในกรณีที่โมเดลสวิงเกินค่าที่เทสไว้เล็กน้อย)
-            risk_score = min(100.0, max(0.0, risk_score))
-            # =======================================================
+            # เทียบบัญญัติไตรยางศ์ตามตาราง Calibration ของโมเดลรุ่นนี้ (หรือค่าทดสอบจริงเดิม) และดักช่วง 0-100
+            risk_score = float(scoring.rescale_risk(prob, resources.rescale))
 
+        except (QueueFullError, TimeoutError) as e:
+            st.error(f"⏳ {e}")
+            return False
         except Exception as e:
             st.error(f"🚨 ข้อผิดพลาดจากระบบพยากรณ์: {e}")
             return False 
     else:
         # กรณีไม่มีโมเดล (Fallback)
-        score = inputs.get('PRC_CFW', 0) * 0.4 + inputs.get('CAP_NETW', 0) * 0.3 + inputs.get('BEH_MON', 0) * 0.3
-        prob = 1 - (score / 5.0)
-        risk_score = prob * 100
+        fallback_prob, fallback_score = scoring.fallback_risk(answers)
+        prob = float(fallback_prob[0])
+        risk_score = float(fallback_score[0])
 
     # บันทึกผลลัพธ์ลงระบบ
     st.session_state.results['risk_prob'] = prob          # เก็บค่าดิบจาก AutoGluon ไว้ (เผื่อใช้งานในอนาคต)
     st.session_state.results['risk_score'] = risk_score   # ค่าสเกล 0-100% ที่แปลงแล้วสำหรับโชว์กราฟ
+    st.session_state.results['model_version'] = resources.version
+
+    if cache_key is not None and cluster_ok:
+        cache.put(cache_key, (cluster_id, prob, risk_score), time.perf_counter() - started)
     
     return True
 
 # --- หน้าที่ 4: Dashboard (Result) - ฉบับแก้ไข Syntax Error (วงเล็บครบ) ---
 def show_dashboard():
-    scroll_to_top() # <--- ใส่ไว้บรรทัดแรก
-    
-    # 1. ฝัง CSS (เพิ่มส่วนตกแต่งปุ่มกด)
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Sarabun:wght@300;400;600&display=swap');
-        
-        html, body, [class*="css"], h1, h2, h3, button, input, select, label, div {
-            font-family: 'Sarabun', sans-serif !important;
-        }
-        h1, h2, h3 { color: #1E3A8A !important; font-weight: 600; }
-
-        /* --- ปรับแต่งปุ่มกดแบบ Primary (ปุ่ม Recommendation) --- */
-        /* สถานะปกติ: พื้นขาว กรอบเทา */
-        div[data-testid="stBaseButton-primary"] > button,
-        button[kind="primary"] {
-            background-color: white !important;
-            color: #333 !important;                 
-            border: 2px solid #A9A9A9 !important;   
-            border-radius: 8px !important;
-            transition: all 0.3s ease !important;
-        }
-
-        /* สถานะ Hover: พื้นชมพูจุฬา ตัวอักษรขาว */
-        div[data-testid="stBaseButton-primary"] > button:hover,
-        button[kind="primary"]:hover {
-            background-color: #FF5C8D !important;   /* สีชมพู Chula */
-            border-color: #FF5C8D !important;       /* กรอบสีชมพู */
-            color: white !important;                
-            box-shadow: 0 4px 10px rgba(255, 92, 141, 0.4) !important;
-            transform: scale(1.02) !important;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-
     # ตรวจสอบข้อมูล
     if 'inputs' not in st.session_state or not st.session_state.inputs:
         st.warning("⚠️ กรุณากรอกข้อมูลในขั้นตอนที่ 1 และ 2 ให้ครบถ้วนก่อนครับ")
@@ -537,18 +406,8 @@ def show_dashboard():
     # 3. ส่วนแสดงผล (Display)
     # ==========================================
     
-    # Mapping DNA
-    cluster_info = {
-        0: {"name": "Active Marketer (นักการตลาดไฟแรง)", "color": "#F9D607", # เหลือง (กลาง)
-            "desc": "โดดเด่นด้านการตลาดและภาพลักษณ์องค์กร ควรเสริมสร้างระบบเทคโนโลยีและการบริหารความเสี่ยงหลังบ้าน"},
-        1: {"name": "Potential Starter (นักสู้ผู้มีศักยภาพ)", "color": "#e74c3c", # แดง (สูง)
-            "desc": "มีความยืดหยุ่น ควรสร้างวินัยทางการเงินและวางระบบบัญชีให้น่าเชื่อถือ เพื่อเพิ่มโอกาสเข้าถึงแหล่งเงินทุน"},
-        2: {"name": "Master Leader (ผู้นำระดับมาสเตอร์)", "color": "#2ecc71", # เขียว (ต่ำ)
-            "desc": "ความพร้อมรอบด้าน ทั้งด้านการเงิน การตลาด และการรับมือวิกฤตการณ์ ธนาคารและนักลงทุนพร้อมสนับสนุนแหล่งเงินทุน"}
-    }
-    
-    # ดึงค่า DNA (ใช้ .get เพื่อป้องกัน Error)
-    dna = cluster_info.get(cluster_id, cluster_info[1])
+    # Mapping DNA (ข้อความอยู่ใน recommendations.py ใช้ร่วมกับรายงาน bulk_reports.py)
+    dna = recommendations.cluster_info(cluster_id, model_texts(st.session_state.results.get('model_version')))
 
     st.markdown(f"<h3 style='text-align:center; color:#1E3A8A;'>📊 ผลการประเมินสุขภาพการเงิน</h3>", unsafe_allow_html=True)
     st.markdown("---")
@@ -567,108 +426,92 @@ def show_dashboard():
         st.write("")
         st.markdown("#### 💡 คำแนะนำเบื้องต้น:", unsafe_allow_html=True)
         
-        # Logic คำแนะนำ
-        if cluster_id == 1: # Potential (แดง)
-            st.warning("⚠️ ควรเร่งจัดทำบัญชีรายรับ-รายจ่ายให้ชัดเจน และลดภาระหนี้ที่ไม่จำเป็น")
-        elif cluster_id == 0: # Active (เหลือง)
-            st.info("ℹ️ การตลาดยอดเยี่ยม เข้าใจผู้บริโภค แต่ต้องอุดรูรั่วความปลอดภัยของระบบ IT")
-        else: # Master (เขียว)
-            st.success("✅ เครดิตดี เตรียมเอกสารยื่นกู้เพื่อขยายกิจการได้เลย")
+        # Logic คำแนะนำ (warning = Potential แดง / info = Active เหลือง / success = Master เขียว)
+        kind, advice = dna['advice']
+        getattr(st, kind)(advice)
 
     with col2:
         st.markdown(f"### 🔮 มีข้อจำกัดการเข้าถึงแหล่งเงินทุน: **{risk_score:.1f}%**", unsafe_allow_html=True)
         
         # ==========================================
-        # 🌟 โค้ดกราฟ Gauge Chart (แสดงข้อความ สูง/ปานกลาง/ต่ำ)
+        # 🌟 กราฟ Gauge (แสดงข้อความ สูง/ปานกลาง/ต่ำ) สร้างครั้งเดียวต่อคะแนนที่ปัดแล้ว + ระดับ
         # ==========================================
-        
-        # 1. กำหนดเงื่อนไขคำที่จะแสดงตรงกลางกราฟ ตามช่วงคะแนน
-        if risk_score < 40:
-            risk_level_text = "ต่ำ"
-            text_color = "#1b5e20"  # เขียวเข้ม
-        elif risk_score <= 70:
-            risk_level_text = "ปานกลาง"
-            text_color = "#b8860b"  # เหลืองทอง
+        gauge_score, risk_level_text = risk_gauge.gauge_key(risk_score)
+        if risk_gauge.RENDERER == 'svg':
+            st.markdown(risk_gauge.svg_gauge(gauge_score, risk_level_text), unsafe_allow_html=True)
         else:
-            risk_level_text = "สูง"
-            text_color = "#842029"  # แดงเข้ม
-
-        # 2. สร้างกราฟ Gauge (ซ่อนตัวเลขตรงกลาง)
-        fig = go.Figure(go.Indicator(
-            mode = "gauge",  
-            value = risk_score,
-            gauge = {
-                'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "gray", 'tickvals': [0, 40, 70, 100]},
-                'bar': {'color': "darkblue"},
-                'bgcolor': "white",
-                'borderwidth': 2,
-                'bordercolor': "gray",
-                'steps': [
-                    {'range': [0, 40], 'color': "#2ecc71"},   # เขียว 
-                    {'range': [40, 70], 'color': "#F9D607"},  # เหลือง 
-                    {'range': [70, 100], 'color': "#e74c3c"}  # แดง 
-                ],
-                'threshold': {
-                    'line': {'color': "black", 'width': 4},
-                    'thickness': 0.75,
-                    'value': risk_score
-                }
-            }
-        ))
-
-        # 3. แปะข้อความ สูง/ปานกลาง/ต่ำ ลงไปตรงกลางเกจ
-        fig.add_annotation(
-            x=0.5, y=0.10,  
-            text=f"<b>{risk_level_text}</b>",
-            font=dict(size=60, color=text_color, family="Sarabun"),
-            showarrow=False
-        )
-        
-        fig.update_layout(height=300, margin=dict(l=20, r=20, t=30, b=20), font={'family': "Sarabun"})
-        st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(risk_gauge.plotly_gauge(gauge_score, risk_level_text), use_container_width=True)
 
     st.markdown("---")
+    show_what_if(inputs)
+    st.markdown("---")
     
     c_btn1, c_btn2, c_btn3 = st.columns([0.15, 0.7, 0.15])
     with c_btn2:
         if st.button("📄 ดูข้อเสนอแนะโดยละเอียด (Recommendation)", type="primary", use_container_width=True):
             navigate_to('recommendation')
 
-# --- หน้าที่ 5: Recommendations (ปรับแต่งขนาดตัวอักษรและไอคอน + ผสาน AI 2 ตัว) ---
-def show_recommendation():
-    scroll_to_top() # <--- ใส่ไว้บรรทัดแรก
+# --- What-if: ถ้าปรับคำตอบแต่ละข้อขึ้น/ลง 1 ระดับ ความเสี่ยงและ DNA ธุรกิจจะเปลี่ยนอย่างไร ---
+def what_if_scorer():
+    # ให้คะแนนทุกแถวที่จำลองในการเรียกครั้งเดียว ผ่านช่องทางเดียวกับการประเมินปกติ คืนค่า (score_fn, Cache)
+    if MODEL_SERVER:
+        client = get_model_client(MODEL_SERVER)
+        cache = get_result_cache(client.info()['version'])
+
+        def score_remote(answers):
+            scores, version = client.score(answers)
+            if version != cache.version:
+                raise RuntimeError("โมเดลเพิ่งเปลี่ยนรุ่น กรุณาประเมินใหม่อีกครั้ง")
+            return scores
+        return score_remote, cache
+
+    resources = load_resources()
+    predict = get_batcher(resources.version, resources).predict if scoring.has_predictor(resources) else None
+    return (lambda answers: scoring.score_chunk(answers, resources, predict)), get_result_cache(resources.version)
+
+def show_what_if(inputs):
+    st.markdown("### 🔁 ถ้าปรับคำตอบข้อไหน ความเสี่ยงจะเปลี่ยนอย่างไร (What-if)")
+    started = time.perf_counter()
+    try:
+        score_fn, cache = what_if_scorer()
+        base, table, scored = what_if.simulate(inputs, score_fn, cache)
+    except (QueueFullError, TimeoutError, ConnectionError) as e:
+        st.warning(f"⏳ {e}")
+        return
+    except Exception as e:
+        st.warning(f"คำนวณ What-if ไม่สำเร็จ: {e}")
+        return
+    if table.empty:
+        st.info("ไม่มีคำตอบที่ปรับได้")
+        return
 
-    # 1. ฝัง CSS (Sarabun + ปุ่ม Hover ชมพูจุฬาฯ)
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Sarabun:wght@300;400;600&display=swap');
-        html, body, [class*="css"], h1, h2, h3, button, input, select, label, div {
-            font-family: 'Sarabun', sans-serif !important;
-        }
-        
-        /* --- ปรับแต่งปุ่มกดแบบ Primary --- */
-        /* สถานะปกติ: พื้นขาว กรอบเทา */
-        div[data-testid="stBaseButton-primary"] > button,
-        button[kind="primary"] {
-            background-color: white !important;
-            color: #333 !important;                 
-            border: 2px solid #A9A9A9 !important;   
-            border-radius: 8px !important;
-            transition: all 0.3s ease !important;
-        }
-
-        /* สถานะ Hover: พื้นชมพูจุฬา ตัวอักษรขาว */
-        div[data-testid="stBaseButton-primary"] > button:hover,
-        button[kind="primary"]:hover {
-            background-color: #FF5C8D !important;
-            border-color: #FF5C8D !important;
-            color: white !important;
-            box-shadow: 0 4px 10px rgba(255, 92, 141, 0.4) !important;
-            transform: scale(1.02) !important;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    texts = model_texts(st.session_state.results.get('model_version'))
+    best = table.iloc[0]
+    if best['risk_change'] < 0:
+        st.success(f"💡 ปรับข้อ \"{feature_schema.FIELDS[best['column']].label}\" จาก "
+                   f"{feature_schema.choice_label(best['column'], int(best['current']))} เป็น "
+                   f"{feature_schema.choice_label(best['column'], int(best['new']))} "
+                   f"ลดความเสี่ยงได้มากที่สุด ({best['risk_change']:+.1f} จุด)")
+
+    view = pd.DataFrame({
+        'คำถาม': [feature_schema.FIELDS[c].label for c in table['column']],
+        'ปรับคำตอบ': [f"{feature_schema.choice_label(c, int(cur))} → {feature_schema.choice_label(c, int(new))}"
+                      for c, cur, new in zip(table['column'], table['current'], table['new'])],
+        'ความเสี่ยงใหม่ (%)': table['risk_score'],
+        'เปลี่ยนแปลง (จุด)': table['risk_change'],
+        'DNA ธุรกิจ': [recommendations.cluster_info(cid, texts)['name'] if changed else '—'
+                       for cid, changed in zip(table['cluster_id'], table['cluster_changed'])],
+    })
+    st.dataframe(view, hide_index=True, use_container_width=True, column_config={
+        'ความเสี่ยงใหม่ (%)': st.column_config.NumberColumn(format="%.1f"),
+        'เปลี่ยนแปลง (จุด)': st.column_config.NumberColumn(format="%+.1f"),
+    })
+    st.caption(f"จำลอง {len(table)} แบบจากความเสี่ยงปัจจุบัน {base['risk_score']:.1f}% "
+               f"(ให้คะแนนใหม่ {scored} แบบในการเรียกโมเดลครั้งเดียว ที่เหลือจาก Cache) "
+               f"ใน {(time.perf_counter() - started) * 1000:.0f} ms")
 
+# --- หน้าที่ 5: Recommendations (ปรับแต่งขนาดตัวอักษรและไอคอน + ผสาน AI 2 ตัว) ---
+def show_recommendation():
     # 2. หัวข้อหลัก (สีน้ำเงิน #1E3A8A)
     st.markdown("<h3 style='color: #1E3A8A;'>🎯 คำแนะนำสำหรับท่าน (Recommendations)</h3>", unsafe_allow_html=True)
     st.markdown("---")
@@ -689,35 +532,12 @@ def show_recommendation():
     # ---------------------------------------------------------
     # ส่วนที่ 1: คำแนะนำด้านการเงิน ยึดตามความเสี่ยง AutoGluon (Risk Score)
     # ---------------------------------------------------------
-    if risk_score > 70:
-        urgent_advice = "ควรเร่งสร้างวินัยทางการเงิน จัดทำบัญชีรายรับ-รายจ่ายให้ชัดเจน และลดภาระหนี้ที่ไม่จำเป็นด่วน ธนาคาร นักลงทุนและเจ้าหนี้พิจารณา 'กระแสเงินสด' ที่น่าเชื่อถือเป็นหลัก"
-    elif risk_score >= 41:
-        urgent_advice = "กิจการของท่านยังพอประคองตัวได้ แต่ควรระวังการใช้เงินเกินตัว ควรเริ่มจัดเตรียมเอกสารทางการเงินให้เป็นระบบ จัดเตรียมพร้อมด้านไอทีและการรองรับวิกฤติการณ์ต่าง ๆ ที่อาจเกิดขึ้น"
-    else:
-        urgent_advice = "กิจการมีเครือข่ายธุรกิจที่ดี บัญชีและกระแสเงินสดน่าเชื่อถือทำให้เครดิตอยู่ในเกณฑ์ยอดเยี่ยม ระบบไอทีมีความพร้อม สามารถปรับตัวกับเศรษฐกิจและวิกฤติการณ์ได้ เตรียมแผนธุรกิจเพื่อยื่นขอเงินทุนขยายกิจการได้เลย"
+    urgent_advice = recommendations.urgent_advice(risk_score)
 
     # ---------------------------------------------------------
     # ส่วนที่ 2: คำแนะนำด้านการจัดการ ยึดตาม DNA ธุรกิจ (K-Means)
     # ---------------------------------------------------------
-    recs = {
-        0: { # Active Marketer
-            "strength": "กิจการของท่านมีความเข้มแข็งด้านการตลาด การสร้างแบรนด์และภาพลักษณ์องค์กร",
-            "urgent": "ควรสร้างความปลอดภัยทางเทคโนโลยี รักษาข้อมูลส่วนบุคคลของลูกค้า และกำหนดแผนรองรับวิกฤตการณ์ด่วน! ธนาคารและนักลงทุนมองว่านี่คือความเสี่ยงแฝง",
-            "maintain": "รักษาฐานลูกค้าเอาไว้ให้มั่น และเสริมสร้างการตลาดออนไลน์ให้ต่อเนื่อง"
-        },
-        1: { # Potential Starter
-            "strength": "กิจการของท่านมีความยืดหยุ่นและมีโอกาสในการเริ่มต้นวางระบบองค์กรที่ถูกต้อง",
-            "urgent": "ควรเริ่มจัดทำบัญชีรายรับ-รายจ่ายที่ชัดเจน น่าเชื่อถือ และเสริมสร้างวินัยการเงิน แยกกระเป๋าส่วนตัวออกจากกระเป๋าของธุรกิจ ธนาคารและนักลงทุนต้องการตัวเลขที่น่าเชื่อถือ",
-            "maintain": "ยึดมั่นความตั้งใจธุรกิจเอาไว้ หาความรู้เพิ่มเติมด้านการจัดการ และการวางแผนงบประมาณ"
-        },
-        2: { # Master Leader
-            "strength": "กิจการของท่านมีความพร้อมรอบด้าน ธนาคารและนักลงทุนพอใจกับกิจการลักษณะนี้",
-            "urgent": "ควรหาโอกาสขยายธุรกิจให้เติบโตยิ่งขึ้น ลงทุนในนวัตกรรมเพื่อสร้างความได้เปรียบระยะยาว",
-            "maintain": "รักษามาตรฐานระบบการจัดการ ส่งเสริมการตลาดและผลิตภัณฑ์ และเทคโนโลยีให้ทันสมัยอยู่เสมอ"
-        }
-    }
-
-    rec = recs.get(cluster_id, recs)
+    rec = recommendations.cluster_recs(cluster_id, model_texts(st.session_state.results.get('model_version')))
 
     # --- แสดงผลหน้าจอ (ปรับตาม Format สีสันสวยงามที่ท่านออกแบบไว้) ---
     
@@ -770,56 +590,6 @@ def show_recommendation():
 
 # --- หน้าที่ 6: Profile & Survey (TAM) - ฉบับแก้ไขข้อความและปุ่ม ---
 def show_profile():
-    scroll_to_top() # <--- ใส่ไว้บรรทัดแรก
-    
-    # 1. ฝัง CSS (Sarabun + ปุ่มกด/ปุ่มลิงก์ Hover ชมพูจุฬาฯ)
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Sarabun:wght@300;400;600&display=swap');
-        
-        html, body, [class*="css"], h1, h2, h3, h4, h5, button, input, select, label, div, p, a {
-            font-family: 'Sarabun', sans-serif !important;
-        }
-
-        /* --- 1. ปรับแต่งปุ่มกดแบบ Primary (ปุ่ม "ยืนยัน" ใน Form) --- */
-        div[data-testid="stFormSubmitButton"] > button,
-        button[kind="primary"] {
-            background-color: white !important;
-            color: #333 !important;                 
-            border: 2px solid #A9A9A9 !important;   
-            border-radius: 8px !important;
-            transition: all 0.3s ease !important;
-        }
-        /* Hover: สีชมพูจุฬา ตัวอักษรขาว */
-        div[data-testid="stFormSubmitButton"] > button:hover,
-        button[kind="primary"]:hover {
-            background-color: #FF5C8D !important;
-            border-color: #FF5C8D !important;
-            color: white !important;                
-            box-shadow: 0 4px 10px rgba(255, 92, 141, 0.4) !important;
-            transform: scale(1.02) !important;
-        }
-
-        /* --- 2. ปรับแต่งปุ่มลิงก์ (Link Button ทำแบบสอบถาม) --- */
-        div[data-testid="stLinkButton"] > a {
-            background-color: white !important;
-            color: #333 !important;
-            border: 2px solid #A9A9A9 !important;
-            border-radius: 8px !important;
-            transition: all 0.3s ease !important;
-            text-decoration: none !important;
-        }
-        /* Link Button Hover: สีชมพูจุฬา ตัวอักษรขาว */
-        div[data-testid="stLinkButton"] > a:hover {
-            background-color: #FF5C8D !important;
-            border-color: #FF5C8D !important;
-            color: white !important;
-            box-shadow: 0 4px 10px rgba(255, 92, 141, 0.4) !important;
-            transform: scale(1.02) !important;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-
     # 2. หัวข้อหลัก (สีน้ำเงิน #1E3A8A)
     st.markdown("<h2 style='color:#1E3A8A; font-weight:bold;'>👤 โปรไฟล์</h2>", unsafe_allow_html=True)
     st.write("เพื่อให้งานวิจัยนี้สมบูรณ์ โปรดบันทึกข้อมูลเพื่อการอ้างอิง")
@@ -839,6 +609,9 @@ def show_profile():
             submitted = st.form_submit_button("ยืนยัน", type="primary", use_container_width=True)
         
     if submitted:
+        # record_profile คืนค่า False เมื่อไม่ได้เข้าคิวบันทึก (ปิดการบันทึก / คิวเต็ม) -> ไม่บอกว่าบันทึกแล้ว
+        saved = get_assessment_store().record_profile(st.session_state.session_id, name.strip(), email.strip())
+        saved_line = f"ข้อมูลของท่าน <b>{name if name else ''}</b> ได้ถูกบันทึกแล้ว<br>" if saved else ""
         st.balloons() # ลูกโป่งลอย
         st.success("ขอบพระคุณที่ร่วมเป็นส่วนหนึ่งของงานวิจัย!")
         
@@ -847,8 +620,7 @@ def show_profile():
         <div style='background-color:#e8f5e9; padding:20px; border-radius:10px; text-align:center; border: 1px solid #c8e6c9; margin-bottom: 20px;'>
             <h3 style='color:#2e7d32; margin-bottom:10px;'>🙏 ขอความกรุณากดลิงค์เพื่อตอบแบบสอบถามด้านล่าง</h3>
             <p style='font-size: 1.1em; color:#1b5e20;'>
-                ข้อมูลของท่าน <b>{name if name else ''}</b> ได้ถูกบันทึกแล้ว<br>
-                ขอบคุณครับ
+                {saved_line}ขอบคุณครับ
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -864,9 +636,143 @@ def show_profile():
             # CSS ด้านบนจะทำให้ปุ่มนี้ Hover แล้วเป็นสีชมพู
             st.link_button("📝 ทำแบบสอบถามแสดงความเห็นต่อ SME FinCheck", ms_form_url, use_container_width=True)
 
+# --- หน้าภาพรวม Cohort (สำหรับนักวิเคราะห์ เปิดด้วย ?view=cohort&token=...) ---
+# อ่านเฉพาะค่าสะสม (ตารางขนาดคงที่) ไม่อ่านประวัติทั้งหมด และใช้ผลอ่านซ้ำทุก Session ภายใน COHORT_TTL วินาที
+COHORT_TTL = float(os.environ.get('FINCHECK_COHORT_TTL', 5))
+
+@st.cache_data(ttl=COHORT_TTL, show_spinner=False)
+def load_cohort(path):
+    return read_cohort(path)
+
+def show_cohort():
+    st.markdown("<h3 style='color: #1E3A8A;'>📈 ภาพรวมผู้ประเมินทั้งหมด (Cohort)</h3>", unsafe_allow_html=True)
+    st.markdown("---")
+
+    cohort = load_cohort(get_assessment_store().path)
+    if not cohort or not cohort['total']:
+        st.info("ยังไม่มีผลการประเมินที่บันทึกไว้")
+        return
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("จำนวนผลการประเมิน", f"{cohort['total']:,}")
+    c2.metric("คะแนนความเสี่ยงเฉลี่ย", f"{cohort['mean_risk']:.1f}%")
+    c3.metric("ความเสี่ยงสูง (> 70)", f"{cohort['bands'].iloc[-1] / cohort['total']:.0%}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### 🧬 สัดส่วนกลุ่ม DNA ธุรกิจ")
+        st.bar_chart(cohort['clusters'], color='#1E3A8A', horizontal=True)
+    with col2:
+        st.markdown("#### 🔮 การกระจายคะแนนความเสี่ยง")
+        st.bar_chart(cohort['histogram'], color=[color for _, _, color in risk_gauge.STEPS])
+        st.caption(" • ".join(f"{name}: {count:,}" for name, count in cohort['bands'].items()))
+
+    st.markdown("#### 📋 ค่าเฉลี่ยคำตอบรายข้อ")
+    st.dataframe(cohort['answers'], use_container_width=True,
+                 column_config={'ค่าเฉลี่ย': st.column_config.NumberColumn(format="%.2f")})
+
+# --- หน้าให้คะแนนไฟล์ทีละมาก (สำหรับเจ้าหน้าที่ธนาคาร เปิดด้วย ?view=bulk&token=...) ---
+def bulk_scorer():
+    # เลือกช่องทางให้คะแนนใน Script นี้ แล้วให้ Worker สร้างตัวให้คะแนนตอนเริ่มงาน (ใช้รุ่นโมเดลเดียวทั้งไฟล์)
+    if MODEL_SERVER:
+        client = get_model_client(MODEL_SERVER)
+        return lambda: client.score
+    loader = start_model_loader()
+
+    def make_scorer():
+        resources = loader.result() # รอโมเดลใน Worker ไม่ใช่ในหน้าเว็บ
+        return lambda answers: (scoring.score_chunk(answers, resources), resources.version)
+    return make_scorer
+
+def submit_bulk_job(uploaded):
+    manager = get_job_manager()
+    try:
+        job_id, path = manager.save_upload(uploaded.name, uploaded.getbuffer())
+    except (ValueError, OSError) as e:
+        st.error(f"🚨 {e}")
+        return
+    try:
+        checked = bulk_jobs.validate(path)
+        manager.submit(job_id, uploaded.name, path, checked['rows'], bulk_scorer())
+    except (ValueError, JobRejectedError) as e:
+        manager.discard(job_id)
+        st.error(f"🚨 {e}")
+        return
+    st.session_state.bulk_jobs.insert(0, job_id)
+    st.query_params['jobs'] = ','.join(st.session_state.bulk_jobs)
+    if checked['invalid']:
+        st.warning(f"⚠️ พบค่าที่อ่านไม่ได้หรืออยู่นอกช่วง {checked['invalid']:,} ช่องใน {checked['sample_rows']:,} แถวแรก "
+                   "ข้อเหล่านั้นจะถือว่าไม่ได้ตอบ")
+
+def show_bulk_job(manager, job):
+    status = {
+        bulk_jobs.QUEUED: f"⏳ รอคิว (ลำดับที่ {manager.queue_position(job)})",
+        bulk_jobs.RUNNING: "⚙️ กำลังให้คะแนน",
+        bulk_jobs.DONE: "✅ เสร็จแล้ว",
+        bulk_jobs.FAILED: "🚨 ไม่สำเร็จ",
+        bulk_jobs.CANCELLED: "⛔ ยกเลิกแล้ว",
+    }[job.status]
+    with st.container(border=True):
+        st.markdown(f"**{job.filename}** — {status}")
+        total = f" / {job.rows_total:,}" if job.rows_total else ""
+        st.progress(job.progress(), text=f"{job.rows_done:,}{total} แถว | {job.seconds():.0f} วินาที")
+        if job.status in bulk_jobs.ACTIVE:
+            if st.button("ยกเลิก", key=f"cancel-{job.id}"):
+                job.cancel()
+        elif job.status == bulk_jobs.DONE:
+            if job.incomplete:
+                st.caption(f"มี {job.incomplete:,} แถวที่ตอบไม่ครบ (ให้คะแนนโดยถือว่าข้อนั้นไม่ได้ตอบ)")
+            # อ่านไฟล์จากดิสก์ตอนกดดาวน์โหลดเท่านั้น (ไม่โหลดผลลัพธ์ทั้งไฟล์ทุกครั้งที่วาดหน้า)
+            st.download_button("⬇️ ดาวน์โหลดผลลัพธ์ (.csv)", data=job.read_output, file_name=job.output_name(),
+                               mime='text/csv', on_click='ignore', key=f"download-{job.id}", type="primary")
+        elif job.status == bulk_jobs.FAILED:
+            st.error(job.error)
+
+@st.fragment(run_every=1.0)
+def show_bulk_jobs_live():
+    # วาดเฉพาะส่วนสถานะงานใหม่ทุกวินาทีระหว่างมีงานค้าง (ส่วนอื่นของหน้าไม่ Rerun) งานจบแล้ววาดทั้งหน้าใหม่ครั้งเดียว
+    if not show_bulk_jobs():
+        st.rerun(scope='app')
+
+def show_bulk_jobs():
+    manager = get_job_manager()
+    jobs = [job for job in map(manager.get, st.session_state.bulk_jobs) if job is not None]
+    for job in jobs:
+        show_bulk_job(manager, job)
+    return any(job.status in bulk_jobs.ACTIVE for job in jobs)
+
+def show_bulk():
+    st.markdown("<h3 style='color: #1E3A8A;'>📂 ให้คะแนนลูกค้า SME ทีละมาก (อัปโหลดไฟล์)</h3>", unsafe_allow_html=True)
+    st.markdown("---")
+    st.info("💡 ไฟล์ต้องมีคอลัมน์คำตอบครบ 15 ข้อ: " + ", ".join(feature_schema.INPUT_COLUMNS)
+            + "\n\nระบบให้คะแนนเบื้องหลัง ระหว่างนี้เปลี่ยนหน้าหรือทำงานอื่นได้ ผลลัพธ์เก็บไว้ให้ดาวน์โหลดตามเวลาที่กำหนด")
+
+    with st.form("bulk_form", clear_on_submit=True):
+        uploaded = st.file_uploader("ไฟล์ข้อมูลลูกค้า (.xlsx / .csv / .parquet)", type=list(bulk_jobs.UPLOAD_TYPES))
+        submitted = st.form_submit_button("🚀 เริ่มให้คะแนน", type="primary", use_container_width=True)
+    if submitted:
+        if uploaded is None:
+            st.warning("⚠️ กรุณาเลือกไฟล์ก่อน")
+        else:
+            submit_bulk_job(uploaded)
+
+    active = any(job is not None and job.status in bulk_jobs.ACTIVE
+                 for job in map(get_job_manager().get, st.session_state.bulk_jobs))
+    if active:
+        show_bulk_jobs_live()
+    else:
+        show_bulk_jobs()
+
 # ==========================================
 # 5. Main App Logic
 # ==========================================
+# ฝังโค้ดโหลด Asset ครั้งเดียวต่อ Session (รอบถัดไปไม่ส่ง CSS/iframe ซ้ำ) + ตัวระบุหน้าขนาดเล็กทุกรอบ
+# ตัวระบุหน้าใช้เลือก CSS เฉพาะหน้า และให้เบราว์เซอร์เลื่อนขึ้นบนสุดเมื่อเปลี่ยนหน้า
+if not st.session_state.get('_assets_injected'):
+    st.session_state._assets_injected = True
+    components.html(frontend_assets.bootstrap_html(), height=0)
+st.markdown(frontend_assets.page_marker(st.session_state.page), unsafe_allow_html=True)
+
 if st.session_state.page == 'landing':
     show_landing()
 elif st.session_state.page == 'input_step1':
@@ -879,3 +785,14 @@ elif st.session_state.page == 'recommendation':
     show_recommendation()
 elif st.session_state.page == 'profile':
     show_profile()
+elif st.session_state.page == 'cohort' and is_staff():
+    show_cohort()
+elif st.session_state.page == 'bulk' and is_staff():
+    show_bulk()
+
+# บันทึกเวลาแสดงผลหน้าแรกของแต่ละ Session (ติดตาม time-to-first-paint)
+if not st.session_state.get('_first_paint_logged'):
+    st.session_state._first_paint_logged = True
+    print(f"[startup] แสดงผลหน้าแรก ({st.session_state.page}): import {_imports_done - _script_started:.2f}s | "
+          f"render {time.perf_counter() - _imports_done:.2f}s | "
+          f"{'ใช้ Server ให้คะแนน ' + MODEL_SERVER if model_loader is None else 'โมเดลพร้อมแล้ว' if model_loader.ready() else 'โมเดลยังโหลดอยู่เบื้องหลัง'}")
@@ -0,0 +1,275 @@
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import pandas as pd
+
+import cohort_stats
+import feature_schema
+import scoring
+
+# ==========================================
+# บันทึกผลการประเมินและโปรไฟล์ลงดิสก์ (หน้าเว็บแค่ใส่คิว ไม่รอดิสก์)
+# ==========================================
+# Thread เขียนตัวเดียวต่อ Process รวมรายการในคิวเป็น Transaction เดียวต่อรอบ (SQLite WAL)
+# หลาย Replica เขียนไฟล์เดียวกันได้ เพราะแต่ละ Replica ถือ Lock เขียนแค่ช่วงสั้นๆ รอบละครั้ง
+STORE_PATH_ENV = 'FINCHECK_STORE_PATH'     # ว่าง = ไม่บันทึก
+FLUSH_MS_ENV = 'FINCHECK_STORE_FLUSH_MS'   # รอบการเขียนลงดิสก์
+MAX_BATCH_ENV = 'FINCHECK_STORE_BATCH'     # จำนวนรายการสูงสุดต่อ Transaction
+MAX_QUEUE_ENV = 'FINCHECK_STORE_QUEUE'     # จำนวนรายการที่รอเขียนได้ เกินนี้ทิ้งและนับไว้ (ไม่บล็อกผู้ใช้)
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'assessments.sqlite')
+DEFAULT_FLUSH_MS = 500.0
+DEFAULT_MAX_BATCH = 1000
+DEFAULT_MAX_QUEUE = 100000
+
+ANSWER_COLUMNS = feature_schema.INPUT_COLUMNS
+TABLES = ('assessments', 'profiles')
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS assessments ('
+    'id INTEGER PRIMARY KEY, session_id TEXT, created REAL NOT NULL, model_version TEXT, '
+    + ''.join(f'"{col}" REAL, ' for col in ANSWER_COLUMNS)
+    + 'cluster_id INTEGER, risk_prob REAL, risk_score REAL)',
+    'CREATE INDEX IF NOT EXISTS assessments_created ON assessments (created)',
+    'CREATE TABLE IF NOT EXISTS profiles ('
+    'id INTEGER PRIMARY KEY, session_id TEXT, created REAL NOT NULL, name TEXT, email TEXT)',
+)
+_INSERT = {
+    'assessments': f'INSERT INTO assessments (session_id, created, model_version, '
+                   f'{", ".join(chr(34) + c + chr(34) for c in ANSWER_COLUMNS)}, cluster_id, risk_prob, risk_score) '
+                   f'VALUES ({", ".join("?" * (len(ANSWER_COLUMNS) + 6))})',
+    'profiles': 'INSERT INTO profiles (session_id, created, name, email) VALUES (?, ?, ?, ?)',
+}
+
+def connect(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    cohort_stats.ensure(conn)
+    return conn
+
+class AssessmentStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, flush_ms=DEFAULT_FLUSH_MS, max_batch=DEFAULT_MAX_BATCH,
+                 max_queue=DEFAULT_MAX_QUEUE):
+        self.path = path
+        self.flush_interval = max(0.0, flush_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.counters = {'queued': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'retries': 0,
+                         'write_errors': 0, 'write_seconds': 0.0}
+        self._closed = False
+        self._thread = None
+        if self.path:
+            self._thread = threading.Thread(target=self._run, name='assessment-store', daemon=True)
+            self._thread.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.environ.get(STORE_PATH_ENV, DEFAULT_STORE_PATH),
+                   flush_ms=float(os.environ.get(FLUSH_MS_ENV, DEFAULT_FLUSH_MS)),
+                   max_batch=int(os.environ.get(MAX_BATCH_ENV, DEFAULT_MAX_BATCH)),
+                   max_queue=int(os.environ.get(MAX_QUEUE_ENV, DEFAULT_MAX_QUEUE)))
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    # ---------- ฝั่งหน้าเว็บ (ไม่แตะดิสก์) ----------
+    def _enqueue(self, table, row):
+        if not self.path or self._closed:
+            return False
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def record_assessment(self, session_id, answers, cluster_id, risk_prob, risk_score, model_version):
+        # เก็บคำตอบเป็น dict ไว้ก่อน Thread เขียนแปลงเป็นคอลัมน์ทีเดียวทั้ง Batch
+        row = (session_id, time.time(), model_version, dict(answers), int(cluster_id), float(risk_prob),
+               float(risk_score))
+        return self._enqueue('assessments', row)
+
+    def record_profile(self, session_id, name, email):
+        return self._enqueue('profiles', (session_id, time.time(), name or None, email or None))
+
+    # ---------- Thread เขียน ----------
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None) # ส่งต่อสัญญาณปิดให้รอบถัดไป
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        # เชื่อมต่อตั้งแต่เริ่ม (สร้างตาราง/ค่าสะสม Cohort ที่นี่ ฝั่งอ่านเปิดแบบอ่านอย่างเดียว)
+        conn = None
+        try:
+            conn = connect(self.path)
+        except (sqlite3.Error, OSError) as e:
+            print(f"[store] เปิด {self.path} ไม่สำเร็จ จะลองใหม่ตอนเขียน: {e}", file=sys.stderr)
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            try:
+                batch = self._collect(first)
+                conn = self._write_with_retry(conn, batch)
+            except Exception as e:
+                # ข้อมูลบางรายการใช้ไม่ได้ -> เขียนทีละรายการ ทิ้งเฉพาะรายการที่เสีย (Thread เขียนต้องทำงานต่อเสมอ)
+                bad = 0
+                for item in batch if len(batch) > 1 else ():
+                    try:
+                        conn = self._write_with_retry(conn, [item])
+                    except Exception:
+                        bad += 1
+                bad = bad if len(batch) > 1 else 1
+                if bad:
+                    self._count('write_errors', bad)
+                    print(f"[store] ข้อมูล {bad} รายการบันทึกไม่ได้ ทิ้งไป: {e!r}", file=sys.stderr)
+        if conn is not None:
+            conn.close()
+
+    def _write_with_retry(self, conn, batch):
+        for attempt in range(5):
+            try:
+                if conn is None:
+                    conn = connect(self.path)
+                self._write(conn, batch)
+                break
+            except (sqlite3.Error, OSError) as e:
+                # ไฟล์ถูก Replica อื่นล็อกนานเกินไป / ดิสก์มีปัญหา -> รอแล้วลองใหม่ทั้ง Batch
+                self._count('retries')
+                if attempt == 4:
+                    self._count('write_errors', len(batch))
+                    print(f"[store] บันทึกผลการประเมิน {len(batch)} รายการไม่สำเร็จ: {e}", file=sys.stderr)
+                time.sleep(0.1 * 2 ** attempt)
+        return conn
+
+    def _rows(self, batch):
+        rows = {table: [row for t, row in batch if t == table] for table in TABLES}
+        cohort = []
+        if rows['assessments']:
+            # คำตอบทั้ง Batch ผ่าน schema เดียวกับการให้คะแนน (ข้อที่ไม่ได้ตอบ = NULL)
+            matrix = feature_schema.answer_matrix([row[3] for row in rows['assessments']])
+            cohort = cohort_stats.deltas(matrix, [row[4] for row in rows['assessments']],
+                                         [row[6] for row in rows['assessments']])
+            values = matrix.astype(object)
+            values[pd.isna(values)] = None
+            rows['assessments'] = [list(row[:3]) + list(answers) + list(row[4:])
+                                   for row, answers in zip(rows['assessments'], values)]
+        return rows, cohort
+
+    def _write(self, conn, batch):
+        started = time.perf_counter()
+        rows, cohort = self._rows(batch)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for table, table_rows in rows.items():
+                if table_rows:
+                    conn.executemany(_INSERT[table], table_rows)
+            # ค่าสะสมของหน้า Cohort อยู่ใน Transaction เดียวกัน (ไม่มีทางนับซ้ำ/ตกหล่นเมื่อเขียนใหม่)
+            cohort_stats.apply(conn, cohort)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self.counters['written'] += len(batch)
+            self.counters['batches'] += 1
+            self.counters['write_seconds'] += time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['pending'] = self._queue.qsize()
+        stats['avg_batch'] = stats['written'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def close(self, timeout=None):
+        # เขียนรายการที่ค้างในคิวให้หมดก่อนปิด
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+# ==========================================
+# ส่งออกข้อมูลสำหรับวิเคราะห์ (Command Line)
+# ==========================================
+def read_table(path, table='assessments'):
+    if table not in TABLES:
+        raise ValueError(f"ไม่รู้จักตาราง {table} (รองรับ {', '.join(TABLES)})")
+    conn = connect(path)
+    try:
+        df = pd.read_sql_query(f'SELECT * FROM {table} ORDER BY id', conn)
+    finally:
+        conn.close()
+    df['created'] = pd.to_datetime(df['created'], unit='s')
+    return df
+
+def read_cohort(path):
+    # ค่าสะสมของหน้า Cohort (None = ยังไม่มีไฟล์/ตาราง) เปิดแบบอ่านอย่างเดียว ไม่ถือ Lock เขียน
+    # การสร้างตาราง/คำนวณค่าสะสมใหม่ (cohort_stats.ensure) เป็นหน้าที่ของ Thread เขียนตอนเริ่ม
+    if not path or not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True, timeout=5.0, check_same_thread=False)
+    try:
+        return cohort_stats.read(conn)
+    except sqlite3.OperationalError:
+        return None # Thread เขียนยังไม่ได้สร้างตารางค่าสะสม
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: ส่งออกผลการประเมิน/โปรไฟล์ที่บันทึกไว้")
+    parser.add_argument('-o', '--output', help="ไฟล์ผลลัพธ์ (.csv / .parquet / .xlsx)")
+    parser.add_argument('--table', choices=TABLES, default='assessments')
+    parser.add_argument('--path', default=os.environ.get(STORE_PATH_ENV) or DEFAULT_STORE_PATH)
+    parser.add_argument('--rebuild-cohort', action='store_true', help="คำนวณค่าสะสมของหน้า Cohort ใหม่จากประวัติทั้งหมด")
+    args = parser.parse_args(argv)
+    if not args.output and not args.rebuild_cohort:
+        parser.error("ต้องระบุ -o/--output หรือ --rebuild-cohort")
+
+    if not os.path.exists(args.path):
+        print(f"ไม่พบไฟล์ {args.path}", file=sys.stderr)
+        return 1
+    if args.rebuild_cohort:
+        conn = connect(args.path)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            total = cohort_stats.rebuild(conn)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        print(f"คำนวณค่าสะสม Cohort ใหม่จาก {total:,} รายการ", file=sys.stderr)
+        if not args.output:
+            return 0
+    df = read_table(args.path, args.table)
+    scoring.write_table(df, args.output)
+    print(f"ส่งออก {len(df):,} รายการจาก {args.table} -> {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
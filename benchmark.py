@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import cluster_lookup
+import feature_schema
+import model_archive
+import scoring
+from compiled_model import CompiledModel
+
+try:
+    import resource
+except ImportError: # Windows: ไม่มี getrusage รายงาน RSS เป็น None
+    resource = None
+
+# ==========================================
+# Micro-benchmark ของขั้นตอนโหลดโมเดลและการให้คะแนน (ผลเป็น JSON ไว้เทียบระหว่าง Commit)
+# ==========================================
+BATCH_SIZES = (1, 10, 100, 1000, 10000, 100000)
+STAND_IN_LABEL = 'Y_LFC_B'
+STAND_IN_FILE = 'stand_in_predictor.joblib'
+N_STAND_IN_PARTS = 3
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux รายงานเป็น KB, macOS เป็น byte
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def _summary(seconds, rows=None):
+    seconds = np.asarray(seconds, dtype=float)
+    p50 = float(np.percentile(seconds, 50))
+    summary = {
+        'repeats': len(seconds),
+        'p50_ms': p50 * 1000,
+        'p99_ms': float(np.percentile(seconds, 99)) * 1000,
+        'mean_ms': float(seconds.mean()) * 1000,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+    if rows is not None:
+        summary['rows_per_sec'] = rows / p50 if p50 > 0 else None
+    return summary
+
+def measure(fn, repeats, rows=None, setup=None):
+    # setup() เรียกก่อนทุกรอบโดยไม่นับเวลา (เช่น ลบโฟลเดอร์ที่แตกไว้)
+    seconds = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return _summary(seconds, rows)
+
+# ==========================================
+# 1. โมเดลตัวแทน (ใช้เมื่อไม่มี model_part_* หรือไม่ได้ติดตั้ง AutoGluon)
+# ==========================================
+class StandInPredictor:
+    # ต้นไม้ Gradient Boosting จาก RawData2.xlsx รับตาราง 143 คอลัมน์แบบเดียวกับ TabularPredictor
+    def __init__(self, model, features, label):
+        self.model = model
+        self.features = features
+        self.label = label
+
+    def predict_proba(self, df):
+        X = df.reindex(columns=self.features).apply(pd.to_numeric, errors='coerce')
+        return pd.DataFrame(self.model.predict_proba(X.to_numpy(dtype=float)), columns=[0, 1])
+
+def train_stand_in(base_dir, seed=0):
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+    df_raw = pd.read_excel(os.path.join(base_dir, feature_schema.WORKBOOK_FILE))
+    features = [c for c in df_raw.columns
+                if not c.startswith('Y_') and pd.api.types.is_numeric_dtype(df_raw[c])]
+    model = HistGradientBoostingClassifier(max_iter=100, random_state=seed)
+    model.fit(df_raw[features].to_numpy(dtype=float), df_raw[STAND_IN_LABEL].to_numpy())
+    return StandInPredictor(model, features, STAND_IN_LABEL)
+
+def _pack_stand_in(predictor, work_dir):
+    # จำลองไฟล์ model_part_* + model_manifest.json เพื่อวัดการต่อ Part / แตก Zip ด้วยโค้ดจริง
+    model_dir = os.path.join(work_dir, 'model')
+    os.makedirs(model_dir)
+    joblib.dump(predictor, os.path.join(model_dir, STAND_IN_FILE))
+    zip_path = os.path.join(work_dir, 'combined.zip')
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.write(os.path.join(model_dir, STAND_IN_FILE), STAND_IN_FILE)
+
+    with open(zip_path, 'rb') as f:
+        data = f.read()
+    step = -(-len(data) // N_STAND_IN_PARTS)
+    for i in range(N_STAND_IN_PARTS):
+        with open(os.path.join(work_dir, f'{model_archive.PART_PREFIX}{i:02d}'), 'wb') as f:
+            f.write(data[i * step:(i + 1) * step])
+    with open(os.path.join(work_dir, model_archive.MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(model_archive.build_manifest(work_dir), f)
+    os.remove(zip_path)
+    shutil.rmtree(model_dir)
+
+def _link_real_parts(base_dir, work_dir):
+    # ใช้ Part จริงผ่าน symlink (ไม่แตะโฟลเดอร์ที่แตกไว้ของหน้าเว็บ)
+    for name in model_archive.list_parts(base_dir) + [model_archive.MANIFEST_FILE]:
+        src = os.path.join(base_dir, name)
+        if os.path.exists(src):
+            os.symlink(src, os.path.join(work_dir, name))
+
+def _find_file(root, name):
+    for dirpath, _, files in os.walk(root):
+        if name in files:
+            return dirpath
+    return None
+
+def _import_seconds(module, repeats):
+    # เวลา import ต้องวัดใน Process ใหม่ (import ซ้ำใน Process เดิมไม่เสียเวลา)
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    seconds = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        if out.returncode != 0:
+            return None
+        seconds.append(float(out.stdout.strip().splitlines()[-1]))
+    return _summary(seconds)
+
+# ==========================================
+# 2. ขั้นตอนโหลด (load_resources)
+# ==========================================
+def bench_load(base_dir, work_dir, use_stand_in, repeats):
+    results = {}
+    kmeans_path = os.path.join(base_dir, cluster_lookup.KMEANS_FILE)
+    scaler_path = os.path.join(base_dir, cluster_lookup.SCALER_FILE)
+    results['joblib'] = measure(lambda: (joblib.load(kmeans_path), joblib.load(scaler_path)), repeats)
+    results['cluster_table'] = measure(lambda: cluster_lookup.load_table(base_dir, scoring.CLUSTER_FEATURES), repeats)
+    results['schema'] = measure(lambda: feature_schema.load_template(base_dir), repeats)
+    workbook = os.path.join(base_dir, feature_schema.WORKBOOK_FILE)
+    if os.path.exists(workbook):
+        results['read_excel'] = measure(lambda: pd.read_excel(workbook), repeats)
+
+    manifest = model_archive.load_manifest(work_dir)
+    if manifest is not None:
+        results['part_verify'] = measure(lambda: model_archive.verify_parts(work_dir, manifest), repeats)
+
+    extract_path = os.path.join(work_dir, model_archive.EXTRACT_DIR)
+    if model_archive.list_parts(work_dir):
+        results['extract'] = measure(lambda: model_archive.ensure_extracted(work_dir), repeats,
+                                     setup=lambda: shutil.rmtree(extract_path, ignore_errors=True))
+
+    if use_stand_in:
+        model_file = os.path.join(extract_path, STAND_IN_FILE)
+        results['predictor_load'] = measure(lambda: joblib.load(model_file), repeats)
+    elif model_archive.list_parts(work_dir):
+        results['import_autogluon'] = _import_seconds('autogluon.tabular', min(repeats, 3))
+        from autogluon.tabular import TabularPredictor
+        model_path = _find_file(extract_path, 'predictor.pkl') or _find_file(base_dir, 'predictor.pkl')
+        results['predictor_load'] = measure(
+            lambda: TabularPredictor.load(model_path, require_py_version_match=False), min(repeats, 3))
+
+    # รวมทุกขั้นตอนแบบที่หน้าเว็บเรียกจริง (ใช้โมเดลจริงหรือรุ่น compiled ถ้ามี)
+    results['load_artifacts'] = measure(lambda: scoring.load_artifacts(base_dir), min(repeats, 3))
+    return results
+
+# ==========================================
+# 3. ขั้นตอนให้คะแนน (process_results) ที่ขนาด Batch ต่างๆ
+# ==========================================
+def random_answers(n, seed=0):
+    values = np.random.default_rng(seed).integers(0, 6, (n, len(scoring.INPUT_COLUMNS))).astype(float)
+    return pd.DataFrame(values, columns=scoring.INPUT_COLUMNS)
+
+def bench_scoring(resources, batch_sizes, repeats, max_rows_per_stage):
+    results = {}
+    for n in batch_sizes:
+        # Batch ใหญ่วัดน้อยรอบลง ให้แต่ละขั้นใช้แถวรวมไม่เกิน max_rows_per_stage
+        reps = max(3, min(repeats, max_rows_per_stage // n))
+        raw = random_answers(n)
+        answers = scoring.prepare_answers(raw)
+        X_cluster = answers[scoring.CLUSTER_FEATURES].fillna(0)
+        X_scaled = resources.scaler.transform(X_cluster)
+        pred_df = scoring.build_prediction_frame(answers, resources.template)
+        prob = scoring.predict_risk_prob(answers, resources.predictor, resources.template)
+
+        stages = {
+            'prepare_answers': lambda: scoring.prepare_answers(raw),
+            'build_frame': lambda: scoring.build_prediction_frame(answers, resources.template),
+            'scaling': lambda: resources.scaler.transform(X_cluster),
+            'kmeans': lambda: resources.kmeans.predict(X_scaled),
+            'cluster_lookup': lambda: scoring.assign_clusters(answers, resources.scaler, resources.kmeans,
+                                                              resources.cluster_table),
+            'predict_proba': lambda: resources.predictor.predict_proba(
+                answers if isinstance(resources.predictor, CompiledModel) else pred_df),
+            'rescale': lambda: scoring.rescale_risk(prob, resources.rescale),
+            'end_to_end': lambda: scoring.score_chunk(answers, resources),
+        }
+        if resources.cluster_table is None:
+            del stages['cluster_lookup']
+        for stage, fn in stages.items():
+            results.setdefault(stage, {})[str(n)] = measure(fn, reps, rows=n)
+        print(f"  batch {n:>7,}: end_to_end p50 {results['end_to_end'][str(n)]['p50_ms']:.2f} ms", file=sys.stderr)
+    return results
+
+def _git_commit(base_dir):
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=base_dir, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+def run(base_dir=scoring.BASE_DIR, batch_sizes=BATCH_SIZES, repeats=50, max_rows_per_stage=1000000, stand_in=False):
+    report = {'meta': {
+        'commit': _git_commit(base_dir),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'batch_sizes': list(batch_sizes),
+    }}
+
+    resources = scoring.load_artifacts(base_dir)
+    use_stand_in = stand_in or not scoring.has_predictor(resources)
+    work_dir = tempfile.mkdtemp(prefix='fincheck-bench-')
+    try:
+        if use_stand_in:
+            print("ใช้โมเดลตัวแทน (ไม่มี model_part_* หรือ AutoGluon)", file=sys.stderr)
+            predictor = train_stand_in(base_dir)
+            _pack_stand_in(predictor, work_dir)
+            template = feature_schema.load_template(base_dir)
+            resources = resources._replace(predictor=predictor, template=template)
+        else:
+            _link_real_parts(base_dir, work_dir)
+        report['meta']['predictor'] = 'stand-in' if use_stand_in else type(resources.predictor).__name__
+
+        print("วัดขั้นตอนโหลด...", file=sys.stderr)
+        report['load'] = bench_load(base_dir, work_dir, use_stand_in, max(3, repeats // 10))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("วัดขั้นตอนให้คะแนน...", file=sys.stderr)
+    report['scoring'] = bench_scoring(resources, batch_sizes, repeats, max_rows_per_stage)
+    return report
+
+# ==========================================
+# 4. เทียบกับผลครั้งก่อน
+# ==========================================
+def _flatten(report):
+    rows = {}
+    for stage, stats in report.get('load', {}).items():
+        if stats is not None:
+            rows[f'load/{stage}'] = stats['p50_ms']
+    for stage, by_batch in report.get('scoring', {}).items():
+        for n, stats in by_batch.items():
+            rows[f'scoring/{stage}/{n}'] = stats['p50_ms']
+    return rows
+
+def compare(baseline, current, tolerance=0.2, min_ms=0.05):
+    # คืนค่ารายการที่ช้าลงเกิน tolerance (ไม่นับขั้นที่เร็วกว่า min_ms เพราะ noise สูง)
+    old, new = _flatten(baseline), _flatten(current)
+    regressions = []
+    for key in sorted(old.keys() & new.keys()):
+        if max(old[key], new[key]) >= min_ms and new[key] > old[key] * (1 + tolerance):
+            regressions.append((key, old[key], new[key]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: วัดความเร็วแต่ละขั้นตอนของการโหลดโมเดลและการให้คะแนน")
+    parser.add_argument('--base-dir', default=scoring.BASE_DIR)
+    parser.add_argument('-o', '--output', default=None, help="ไฟล์ผล JSON (ค่าเริ่มต้น benchmark-<commit>.json)")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(BATCH_SIZES))
+    parser.add_argument('--repeats', type=int, default=50, help="จำนวนรอบต่อขั้นตอน (Batch ใหญ่จะลดรอบลงเอง)")
+    parser.add_argument('--max-rows', type=int, default=1000000, help="จำนวนแถวรวมสูงสุดต่อขั้นตอนต่อขนาด Batch")
+    parser.add_argument('--stand-in', action='store_true', help="ใช้โมเดลตัวแทนแม้จะมีโมเดลจริง")
+    parser.add_argument('--compare', default=None, help="ไฟล์ผล JSON ครั้งก่อนสำหรับตรวจว่าช้าลงหรือไม่")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="สัดส่วนที่ยอมให้ช้าลงได้ (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.base_dir, args.batch_sizes, args.repeats, args.max_rows, args.stand_in)
+    output = args.output or f"benchmark-{report['meta']['commit'] or 'local'}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"บันทึกผลที่ {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        for key, old, new in regressions:
+            print(f"ช้าลง {key}: {old:.3f} -> {new:.3f} ms ({new / old - 1:+.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"ไม่มีขั้นตอนใดช้าลงเกิน {args.tolerance:.0%} เทียบกับ {args.compare}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import feature_schema
+import scoring
+from stream_scoring import iter_chunks
+
+# ==========================================
+# งานให้คะแนนไฟล์จากหน้าเว็บ (อัปโหลด -> คิว -> Thread เบื้องหลัง -> ดาวน์โหลด)
+# ==========================================
+# Script ของหน้าเว็บแค่บันทึกไฟล์ + ใส่คิว แล้วอ่านสถานะไปแสดง (ไม่บล็อกการ Rerun)
+# Worker อ่านไฟล์ทีละก้อน ให้คะแนน แล้วต่อท้ายไฟล์ผลลัพธ์ .csv บนดิสก์ (หน่วยความจำเท่าหนึ่งก้อน)
+# ตรวจการยกเลิกระหว่างก้อน งานผูกกับ Process (ไม่ใช่ Session) เปลี่ยนหน้า/Rerun งานยังทำต่อ
+JOBS_DIR_ENV = 'FINCHECK_BULK_DIR'        # โฟลเดอร์ไฟล์นำเข้า/ผลลัพธ์ของงาน
+WORKERS_ENV = 'FINCHECK_BULK_WORKERS'     # จำนวนงานที่ทำพร้อมกันต่อ Process
+CHUNK_ENV = 'FINCHECK_BULK_CHUNK'         # จำนวนแถวต่อก้อน (ก้อนเล็ก = ความคืบหน้า/ยกเลิกละเอียดขึ้น)
+MAX_JOBS_ENV = 'FINCHECK_BULK_MAX_JOBS'   # จำนวนงานที่รอ/กำลังทำได้ เกินนี้ปฏิเสธงานใหม่
+TTL_ENV = 'FINCHECK_BULK_TTL'             # วินาทีที่เก็บผลลัพธ์ไว้ให้ดาวน์โหลดหลังงานจบ
+
+DEFAULT_JOBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'bulk_jobs')
+DEFAULT_WORKERS = 1
+DEFAULT_CHUNK = 5000
+DEFAULT_MAX_JOBS = 20
+DEFAULT_TTL = 3600.0
+
+UPLOAD_TYPES = ('csv', 'xlsx', 'xls', 'parquet')
+OUTPUT_COLUMNS = ['cluster_id', 'dna', 'risk_prob', 'risk_score', 'risk_level']
+SAMPLE_ROWS = 1000
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+ACTIVE = (QUEUED, RUNNING)
+
+class JobRejectedError(RuntimeError):
+    pass
+
+class _Cancelled(Exception):
+    pass
+
+# ==========================================
+# 1. ตรวจไฟล์ก่อนเข้าคิว (อ่านแค่ส่วนหัว ไม่อ่านทั้งไฟล์ใน Script ของหน้าเว็บ)
+# ==========================================
+def _head(path, n):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return pd.read_csv(path, nrows=n)
+    if ext == '.parquet':
+        batch = next(pq.ParquetFile(path).iter_batches(batch_size=n), None)
+        return batch.to_pandas() if batch is not None else None
+    if ext in ('.xlsx', '.xls'):
+        return pd.read_excel(path, nrows=n)
+    raise ValueError(f"ไม่รองรับไฟล์ประเภท {ext} (รองรับ {', '.join('.' + t for t in UPLOAD_TYPES)})")
+
+def count_rows(path):
+    # จำนวนแถวข้อมูล (ใช้คำนวณความคืบหน้า) คืนค่า None ถ้านับล่วงหน้าไม่ได้
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == '.csv':
+            with open(path, 'rb') as f:
+                return max(0, sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1)
+        if ext == '.parquet':
+            return pq.ParquetFile(path).metadata.num_rows
+        if ext == '.xlsx':
+            from openpyxl import load_workbook
+            workbook = load_workbook(path, read_only=True)
+            try:
+                rows = workbook.active.max_row
+            finally:
+                workbook.close()
+            return rows - 1 if rows else None
+    except Exception:
+        return None
+    return None
+
+def validate(path):
+    # คืนค่า dict (rows, invalid) หรือ raise ValueError ถ้าไฟล์ใช้ไม่ได้
+    try:
+        head = _head(path, SAMPLE_ROWS)
+    except Exception as e:
+        raise ValueError(f"อ่านไฟล์ไม่ได้: {e}")
+    if head is None or head.empty:
+        raise ValueError("ไฟล์ไม่มีข้อมูล")
+    missing = [c for c in feature_schema.INPUT_COLUMNS if c not in head.columns]
+    if missing:
+        raise ValueError(f"ไฟล์ขาดคอลัมน์คำตอบ {len(missing)} ข้อ: {', '.join(missing)}")
+    # ค่าที่อ่านไม่ออก/นอกช่วงในแถวตัวอย่าง (ให้คะแนนได้ แต่ถือว่าไม่ได้ตอบข้อนั้น)
+    answered = head[feature_schema.INPUT_COLUMNS].notna().to_numpy()
+    invalid = int((answered & np.isnan(feature_schema.answer_matrix(head))).sum())
+    return {'rows': count_rows(path), 'invalid': invalid, 'sample_rows': len(head)}
+
+# ==========================================
+# 2. งาน 1 ชิ้น
+# ==========================================
+class Job:
+    def __init__(self, job_id, filename, input_path, output_path, rows_total):
+        self.id = job_id
+        self.filename = filename
+        self.input_path = input_path
+        self.output_path = output_path
+        self.rows_total = rows_total
+        self.rows_done = 0
+        self.incomplete = 0 # แถวที่มีข้อไม่ได้ตอบ/ค่าใช้ไม่ได้
+        self.status = QUEUED
+        self.error = None
+        self.version = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        # งานที่ยังรอคิวแสดงว่ายกเลิกทันที (Worker ข้ามไปเองเมื่อถึงคิว) งานที่กำลังทำหยุดก่อนก้อนถัดไป
+        self._cancel.set()
+        if self.status == QUEUED:
+            self.status = CANCELLED
+            self.finished = time.time()
+
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        if not self.rows_total:
+            return 0.0
+        return min(0.99, self.rows_done / self.rows_total)
+
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def output_name(self):
+        return os.path.splitext(self.filename)[0] + '-scored.csv'
+
+    def read_output(self):
+        # เรียกตอนกดดาวน์โหลดเท่านั้น ข้อจำกัด: st.download_button ไม่มีแบบ Stream จึงอ่านทั้งไฟล์เข้าหน่วยความจำ
+        # (ขนาดจำกัดโดย server.maxUploadSize ของไฟล์นำเข้า) ไฟล์ใหญ่มากให้ใช้ stream_scoring.py แทน
+        with open(self.output_path, 'rb') as f:
+            return f.read()
+
+def label_scores(scores):
+    # ชื่อกลุ่ม DNA และระดับความเสี่ยงแบบอ่านง่าย ต่อท้ายผลให้คะแนน
+    names = np.array(scoring.CLUSTER_NAMES + ('',), dtype=object)
+    cluster_id = scores['cluster_id'].to_numpy(dtype=int)
+    risk_score = scores['risk_score'].to_numpy(dtype=float)
+    band_names = np.array([name for name, _ in scoring.RISK_BANDS], dtype=object)
+    return pd.DataFrame({
+        'cluster_id': cluster_id,
+        'dna': names[np.where((cluster_id >= 0) & (cluster_id < len(scoring.CLUSTER_NAMES)), cluster_id, -1)],
+        'risk_prob': scores['risk_prob'].to_numpy(dtype=float),
+        'risk_score': risk_score,
+        'risk_level': band_names[scoring.risk_bands(risk_score)],
+    })
+
+# ==========================================
+# 3. ตัวจัดการงาน (1 ตัวต่อ Process)
+# ==========================================
+class JobManager:
+    def __init__(self, jobs_dir=DEFAULT_JOBS_DIR, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK,
+                 max_jobs=DEFAULT_MAX_JOBS, ttl=DEFAULT_TTL):
+        self.jobs_dir = jobs_dir
+        self.chunk_size = max(1, chunk_size)
+        self.max_jobs = max(1, max_jobs)
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._remove_stale()
+        self._threads = [threading.Thread(target=self._run, name=f'bulk-job-{i}', daemon=True)
+                         for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(jobs_dir=os.environ.get(JOBS_DIR_ENV) or DEFAULT_JOBS_DIR,
+                   workers=int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS)),
+                   chunk_size=int(os.environ.get(CHUNK_ENV, DEFAULT_CHUNK)),
+                   max_jobs=int(os.environ.get(MAX_JOBS_ENV, DEFAULT_MAX_JOBS)),
+                   ttl=float(os.environ.get(TTL_ENV, DEFAULT_TTL)))
+
+    # ---------- ฝั่งหน้าเว็บ ----------
+    def save_upload(self, filename, data):
+        # บันทึกไฟล์ที่อัปโหลดลงดิสก์ คืนค่า (รหัสงาน, path)
+        ext = os.path.splitext(filename)[1].lower()
+        if ext.lstrip('.') not in UPLOAD_TYPES:
+            raise ValueError(f"ไม่รองรับไฟล์ประเภท {ext or '(ไม่มีนามสกุล)'} (รองรับ {', '.join('.' + t for t in UPLOAD_TYPES)})")
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.jobs_dir, job_id))
+        path = os.path.join(self.jobs_dir, job_id, 'input' + ext)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return job_id, path
+
+    def discard(self, job_id):
+        shutil.rmtree(os.path.join(self.jobs_dir, job_id), ignore_errors=True)
+
+    def submit(self, job_id, filename, input_path, rows_total, make_scorer):
+        # make_scorer() -> score_fn(answers) -> (scores DataFrame, รุ่นโมเดล) เรียกใน Worker ตอนเริ่มงาน
+        self._expire()
+        with self._lock:
+            if sum(job.status in ACTIVE for job in self._jobs.values()) >= self.max_jobs:
+                raise JobRejectedError("ขณะนี้มีงานให้คะแนนรออยู่จำนวนมาก กรุณาลองใหม่ภายหลัง")
+            job = Job(job_id, filename, input_path, os.path.join(self.jobs_dir, job_id, 'output.csv'), rows_total)
+            self._jobs[job_id] = job
+        self._queue.put((job, make_scorer))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        # ลำดับคิว (1 = งานถัดไป) คืนค่า 0 ถ้าไม่ได้รออยู่
+        if job.status != QUEUED:
+            return 0
+        with self._lock:
+            waiting = sorted((j for j in self._jobs.values() if j.status == QUEUED), key=lambda j: j.created)
+        return next((i + 1 for i, j in enumerate(waiting) if j.id == job.id), 0)
+
+    def _remove_stale(self):
+        # โฟลเดอร์งานของ Process ก่อนหน้า (ไม่มีใครติดตามแล้ว) ที่ไม่มีไฟล์ไหนถูกเขียนนานเกิน TTL
+        # Replica อื่นที่ใช้โฟลเดอร์เดียวกันยังเขียนไฟล์ของงานที่ทำอยู่ทุกก้อน จึงไม่ถูกลบ
+        now = time.time()
+        for name in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                mtimes = [os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)]
+                if now - max(mtimes, default=os.path.getmtime(path)) > self.ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
+
+    def _expire(self):
+        # ลบงานที่จบไปนานเกิน TTL (ไฟล์ผลลัพธ์ด้วย)
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.status not in ACTIVE and job.finished and now - job.finished > self.ttl]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            self.discard(job.id)
+
+    # ---------- Worker ----------
+    def _run(self):
+        while True:
+            job, make_scorer = self._queue.get()
+            self._process(job, make_scorer)
+
+    def _process(self, job, make_scorer):
+        tmp_path = job.output_path + '.tmp'
+        job.started = time.time()
+        try:
+            if job._cancel.is_set():
+                raise _Cancelled()
+            job.status = RUNNING
+            score_fn = make_scorer()
+            # utf-8-sig = เปิดใน Excel แล้วภาษาไทยไม่เพี้ยน
+            with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+                header = True
+                for chunk in iter_chunks(job.input_path, self.chunk_size):
+                    if job._cancel.is_set():
+                        raise _Cancelled()
+                    chunk = chunk.drop(columns=OUTPUT_COLUMNS, errors='ignore').reset_index(drop=True)
+                    answers = scoring.prepare_answers(chunk)
+                    scores, job.version = score_fn(answers)
+                    pd.concat([chunk, label_scores(scores)], axis=1).to_csv(f, header=header, index=False)
+                    header = False
+                    job.incomplete += int(answers.isna().any(axis=1).sum())
+                    job.rows_done += len(chunk)
+            os.replace(tmp_path, job.output_path)
+            job.status = DONE
+        except _Cancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            print(f"[bulk] งาน {job.id} ({job.filename}) ไม่สำเร็จ: {e}")
+        finally:
+            job.finished = time.time()
+            for path in (tmp_path, job.input_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if job.status == DONE:
+                print(f"[bulk] งาน {job.id} ({job.filename}) เสร็จ {job.rows_done:,} แถว ใน {job.seconds():.1f}s")
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import feature_schema
+import scoring
+
+# ==========================================
+# Calibration ช่วงคะแนนความเสี่ยง (แทนการลองตอบ 0 หมด / 5 หมด ด้วยมือทุกครั้งที่เทรนโมเดลใหม่)
+# ==========================================
+# bounds   = ค่าต่ำสุด/สูงสุดของความน่าจะเป็นดิบในตัวอย่าง -> บัญญัติไตรยางศ์แบบเดิม
+# quantile = คะแนน = ตำแหน่งเปอร์เซ็นไทล์ของความน่าจะเป็นดิบในตัวอย่าง (ตารางหลายจุด เรียงเพิ่มขึ้นเสมอ)
+MODES = ('bounds', 'quantile')
+
+# คำถามแบบ ไม่มี (0) / มี (1) ในหน้า Input Step 2 ที่เหลือเป็นระดับ 0-5
+BINARY_COLUMNS = feature_schema.BINARY_COLUMNS
+MAX_LEVEL = 5
+
+# ==========================================
+# 1. สุ่มคำตอบแบบแบ่งชั้น (ครอบคลุมตั้งแต่ตอบ 0 หมดจนถึง 5 หมด)
+# ==========================================
+def stratified_sample(n_samples, n_strata=11, seed=0):
+    # ชั้นที่ k: แต่ละข้อได้คะแนน ~ Binomial(5, p_k) โดย p_k ไล่จาก 0 ถึง 1
+    # ชั้นแรก = ตอบ 0 หมด ชั้นสุดท้าย = ตอบ 5 และมีครบหมด (จุดเดียวกับที่เคยทดสอบด้วยมือ)
+    rng = np.random.default_rng(seed)
+    levels = np.linspace(0.0, 1.0, n_strata)
+    per_stratum = max(1, n_samples // n_strata)
+    p = np.repeat(levels, per_stratum)[:, None]
+
+    values = rng.binomial(MAX_LEVEL, np.broadcast_to(p, (len(p), len(scoring.INPUT_COLUMNS)))).astype(float)
+    binary = [scoring.INPUT_COLUMNS.index(c) for c in BINARY_COLUMNS]
+    values[:, binary] = rng.binomial(1, np.broadcast_to(p, (len(p), len(binary))))
+    return values
+
+def corner_answers():
+    lowest = np.zeros(len(scoring.INPUT_COLUMNS))
+    highest = np.full(len(scoring.INPUT_COLUMNS), float(MAX_LEVEL))
+    highest[[scoring.INPUT_COLUMNS.index(c) for c in BINARY_COLUMNS]] = 1.0
+    return np.vstack([lowest, highest])
+
+# ==========================================
+# 2. ให้คะแนนดิบแบบ Batch หลาย Process (โหลดโมเดลครั้งเดียวต่อ Process)
+# ==========================================
+_RESOURCES = None
+
+def _init_worker(base_dir, variant, threads_per_worker):
+    global _RESOURCES
+    scoring.limit_threads(threads_per_worker)
+    _RESOURCES = scoring.load_artifacts(base_dir, variant=variant)
+
+def _raw_probs(values):
+    if not scoring.has_predictor(_RESOURCES):
+        return None, None
+    answers = scoring.prepare_answers(pd.DataFrame(values, columns=scoring.INPUT_COLUMNS))
+    return _RESOURCES.key, scoring.predict_risk_prob(answers, _RESOURCES.predictor, _RESOURCES.template)
+
+def sweep(values, base_dir=scoring.BASE_DIR, variant=None, workers=None, batch_size=scoring.DEFAULT_CHUNK_SIZE):
+    workers = workers or os.cpu_count() or 1
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    batches = [values[start:start + batch_size] for start in range(0, len(values), batch_size)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(base_dir, variant, threads_per_worker)) as pool:
+        results = list(pool.map(_raw_probs, batches))
+
+    keys = {key for key, _ in results}
+    if None in keys:
+        raise RuntimeError("ไม่พบโมเดล AutoGluon (โหมด Demo ไม่ต้อง Calibrate)")
+    if len(keys) != 1:
+        raise RuntimeError("Worker โหลดโมเดลได้คนละรุ่น (ไฟล์โมเดลถูกเปลี่ยนระหว่าง Calibrate)")
+    return keys.pop(), np.concatenate([prob for _, prob in results])
+
+# ==========================================
+# 3. สร้างตารางแปลงคะแนน
+# ==========================================
+def build_mapping(probs, mode='bounds', n_points=101, low_quantile=0.0, high_quantile=1.0):
+    probs = np.asarray(probs, dtype=float)
+    probs = probs[np.isfinite(probs)]
+    if len(probs) == 0:
+        raise ValueError("ไม่มีความน่าจะเป็นที่ใช้ได้จากการ Sweep")
+
+    if mode == 'bounds':
+        raw = np.quantile(probs, [low_quantile, high_quantile])
+        score = np.array([0.0, 100.0])
+    elif mode == 'quantile':
+        levels = np.linspace(0.0, 1.0, n_points)
+        raw, score = np.quantile(probs, levels), levels * 100
+    else:
+        raise ValueError(f"ไม่รู้จักโหมด {mode} (รองรับ {', '.join(MODES)})")
+
+    # ค่าซ้ำทำให้เปิดตารางไม่ได้ -> เก็บเฉพาะจุดแรกของแต่ละค่า (คะแนนยังเรียงเพิ่มขึ้นเสมอ)
+    raw, first = np.unique(raw, return_index=True)
+    score = score[first]
+    if len(raw) < 2:
+        raise ValueError("ความน่าจะเป็นดิบของทุกตัวอย่างเท่ากัน สร้างช่วงคะแนนไม่ได้")
+    return raw, score
+
+def write_calibration(base_dir, key, entry):
+    path = os.path.join(base_dir, scoring.CALIBRATION_FILE)
+    try:
+        with open(path, encoding='utf-8') as f:
+            calibrations = json.load(f)
+    except (OSError, ValueError):
+        calibrations = {}
+    calibrations[key] = entry
+
+    fd, tmp_path = tempfile.mkstemp(prefix=scoring.CALIBRATION_FILE + '.', suffix='.tmp', dir=base_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(calibrations, f, indent=1)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+    return path
+
+def calibrate(base_dir=scoring.BASE_DIR, variant=None, mode='bounds', n_samples=200000, n_strata=11, seed=0,
+              workers=None, batch_size=scoring.DEFAULT_CHUNK_SIZE, n_points=101, low_quantile=0.0, high_quantile=1.0):
+    started = time.perf_counter()
+    values = np.vstack([corner_answers(), stratified_sample(n_samples, n_strata, seed)])
+    key, probs = sweep(values, base_dir, variant, workers, batch_size)
+    raw, score = build_mapping(probs, mode, n_points, low_quantile, high_quantile)
+    elapsed = time.perf_counter() - started
+
+    entry = {
+        'mode': mode,
+        'raw': raw.tolist(),
+        'score': score.tolist(),
+        'variant': variant or os.environ.get(scoring.PREDICTOR_VARIANT_ENV, 'full'),
+        'samples': int(len(values)),
+        'strata': n_strata,
+        'seed': seed,
+        # ค่าที่ได้จากการตอบ 0 หมด / 5 หมด ไว้เทียบกับ MAX_RAW_PROB / MIN_RAW_PROB เดิม
+        'corners': {'all_lowest': float(probs[0]), 'all_highest': float(probs[1])},
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': elapsed,
+    }
+    path = write_calibration(base_dir, key, entry)
+    return key, entry, path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate ช่วงคะแนนความเสี่ยง 0-100 จากการ Sweep คำตอบแบบ Batch")
+    parser.add_argument('--base-dir', default=scoring.BASE_DIR)
+    parser.add_argument('--variant', default=None, help=f"รุ่นโมเดล (ค่าเริ่มต้นตาม {scoring.PREDICTOR_VARIANT_ENV})")
+    parser.add_argument('--mode', choices=MODES, default='bounds')
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--strata', type=int, default=11)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="จำนวน Process (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument('--batch-size', type=int, default=scoring.DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--points', type=int, default=101, help="จำนวนจุดในตาราง (โหมด quantile)")
+    parser.add_argument('--low-quantile', type=float, default=0.0, help="ตัดค่าต่ำสุดที่เปอร์เซ็นไทล์นี้ (โหมด bounds)")
+    parser.add_argument('--high-quantile', type=float, default=1.0, help="ตัดค่าสูงสุดที่เปอร์เซ็นไทล์นี้ (โหมด bounds)")
+    args = parser.parse_args(argv)
+
+    try:
+        key, entry, path = calibrate(args.base_dir, args.variant, args.mode, args.samples, args.strata, args.seed,
+                                     args.workers, args.batch_size, args.points, args.low_quantile, args.high_quantile)
+    except (RuntimeError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    print(f"Calibrate โมเดลรุ่น {key} ({entry['mode']}) จาก {entry['samples']:,} ตัวอย่าง "
+          f"ใน {entry['seconds']:.1f} วินาที -> {path}", file=sys.stderr)
+    print(f"ช่วงความน่าจะเป็นดิบ: {entry['raw'][0]:.4f} - {entry['raw'][-1]:.4f} "
+          f"(เดิม {scoring.MIN_RAW_PROB} - {scoring.MAX_RAW_PROB}) "
+          f"ตอบ 0 หมด = {entry['corners']['all_lowest']:.4f}, ตอบ 5 หมด = {entry['corners']['all_highest']:.4f}",
+          file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# ==========================================
+# ตาราง DNA ธุรกิจล่วงหน้าสำหรับทุกคำตอบที่เป็นไปได้ (6^8 = 1,679,616 แบบ)
+# ==========================================
+TABLE_FILE = 'cluster_lookup.npy'
+META_FILE = 'cluster_lookup.json'
+KMEANS_FILE = 'kmeans_behavior_model.joblib'
+SCALER_FILE = 'scaler_behavior.joblib'
+
+N_LEVELS = 6     # คำตอบ 0-5
+N_FEATURES = 8   # จำนวนคำถามใน CLUSTER_FEATURES
+TABLE_SIZE = N_LEVELS ** N_FEATURES
+BATCH_SIZE = N_LEVELS ** 7
+
+# ตัวคูณสำหรับแปลงคำตอบ 8 ข้อเป็นตำแหน่งในตาราง (เลขฐาน 6 เรียงจากข้อแรก)
+_PLACE_VALUES = N_LEVELS ** np.arange(N_FEATURES - 1, -1, -1, dtype=np.int64)
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def source_hashes(base_dir):
+    return {name: _sha256(os.path.join(base_dir, name)) for name in (KMEANS_FILE, SCALER_FILE)}
+
+def _combinations(start, end):
+    return np.stack(np.unravel_index(np.arange(start, end), (N_LEVELS,) * N_FEATURES), axis=1)
+
+def _predict(values, scaler, kmeans, feature_names):
+    import pandas as pd
+    X_cluster = pd.DataFrame(values, columns=feature_names)
+    return kmeans.predict(scaler.transform(X_cluster))
+
+def build_table(scaler, kmeans, feature_names, batch_size=BATCH_SIZE):
+    table = np.empty(TABLE_SIZE, dtype=np.uint8)
+    for start in range(0, TABLE_SIZE, batch_size):
+        end = min(start + batch_size, TABLE_SIZE)
+        table[start:end] = _predict(_combinations(start, end), scaler, kmeans, feature_names)
+    return table
+
+def check_table(table, scaler, kmeans, feature_names, n_samples=10000, seed=0):
+    # สุ่มตรวจว่าตารางตรงกับ scaler + kmeans จริง
+    index = np.random.default_rng(seed).integers(0, TABLE_SIZE, n_samples)
+    values = np.stack(np.unravel_index(index, (N_LEVELS,) * N_FEATURES), axis=1)
+    expected = _predict(values, scaler, kmeans, feature_names)
+    return bool(np.array_equal(table[index], expected))
+
+def rebuild(base_dir, feature_names):
+    import joblib
+    kmeans = joblib.load(os.path.join(base_dir, KMEANS_FILE))
+    scaler = joblib.load(os.path.join(base_dir, SCALER_FILE))
+    hashes = source_hashes(base_dir)
+
+    table = build_table(scaler, kmeans, feature_names)
+    if not check_table(table, scaler, kmeans, feature_names):
+        raise RuntimeError("ตาราง DNA ไม่ตรงกับโมเดล K-Means")
+
+    # เขียนไฟล์ชั่วคราวแล้ว rename (หลาย Replica สร้างพร้อมกันได้โดยไม่เห็นไฟล์ครึ่งๆ)
+    fd, tmp_path = tempfile.mkstemp(prefix=TABLE_FILE + '.', suffix='.tmp', dir=base_dir)
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, table)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, os.path.join(base_dir, TABLE_FILE))
+
+    meta = {'sources': hashes, 'feature_names': list(feature_names), 'size': TABLE_SIZE}
+    fd, tmp_path = tempfile.mkstemp(prefix=META_FILE + '.', suffix='.tmp', dir=base_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, os.path.join(base_dir, META_FILE))
+    return table
+
+def load_table(base_dir, feature_names):
+    # เปิดตารางแบบ memory-map (ทุก Worker ใช้หน้า memory ร่วมกัน) สร้างใหม่เมื่อไฟล์ .joblib เปลี่ยน
+    table_path = os.path.join(base_dir, TABLE_FILE)
+    meta_path = os.path.join(base_dir, META_FILE)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        fresh = (meta.get('sources') == source_hashes(base_dir)
+                 and meta.get('feature_names') == list(feature_names)
+                 and os.path.exists(table_path))
+    except (OSError, ValueError):
+        fresh = False
+
+    if not fresh:
+        try:
+            rebuild(base_dir, feature_names)
+        except OSError:
+            # Volume อ่านได้อย่างเดียว: สร้างในหน่วยความจำแทน
+            import joblib
+            kmeans = joblib.load(os.path.join(base_dir, KMEANS_FILE))
+            scaler = joblib.load(os.path.join(base_dir, SCALER_FILE))
+            return build_table(scaler, kmeans, feature_names)
+
+    table = np.load(table_path, mmap_mode='r')
+    if table.shape != (TABLE_SIZE,):
+        raise RuntimeError(f"{TABLE_FILE} มีขนาดไม่ถูกต้อง")
+    return table
+
+def lookup(table, values):
+    # values = array (n, 8) ของคำตอบ คืนค่า None ถ้ามีค่าที่ไม่ใช่จำนวนเต็ม 0-5 (ให้ไปใช้ K-Means ตรงๆ)
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or values.shape[1] != N_FEATURES:
+        return None
+    if not np.all((values >= 0) & (values < N_LEVELS) & (values == np.floor(values))):
+        return None
+    return np.asarray(table[values.astype(np.int64) @ _PLACE_VALUES], dtype=int)
+
+def main(argv=None):
+    import scoring
+
+    parser = argparse.ArgumentParser(description="สร้าง/ตรวจสอบตาราง DNA ธุรกิจ (cluster_lookup.npy)")
+    parser.add_argument('--base-dir', default=scoring.BASE_DIR)
+    parser.add_argument('--check', action='store_true', help="ตรวจสอบตารางที่มีอยู่เท่านั้น")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        import joblib
+        table = np.load(os.path.join(args.base_dir, TABLE_FILE), mmap_mode='r')
+        kmeans = joblib.load(os.path.join(args.base_dir, KMEANS_FILE))
+        scaler = joblib.load(os.path.join(args.base_dir, SCALER_FILE))
+        ok = check_table(table, scaler, kmeans, scoring.CLUSTER_FEATURES)
+        print("ตาราง DNA ตรงกับโมเดล" if ok else "ตาราง DNA ไม่ตรงกับโมเดล", file=sys.stderr)
+        return 0 if ok else 1
+
+    rebuild(args.base_dir, scoring.CLUSTER_FEATURES)
+    print(f"บันทึก {TABLE_FILE} ({TABLE_SIZE:,} แบบ)", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
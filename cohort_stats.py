@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+import feature_schema
+import scoring
+
+# ==========================================
+# สถิติภาพรวมของผู้ประเมินทั้งหมด (Cohort) แบบสะสม
+# ==========================================
+# ไม่คำนวณจากประวัติทั้งหมดทุกครั้งที่เปิดหน้า แต่บวกค่าสะสม (จำนวน / ผลรวม / Histogram ช่องคงที่)
+# ใน Transaction เดียวกับที่ assessment_store เขียนผลการประเมิน -> ตารางมีขนาดคงที่ อ่านได้ในเวลาคงที่
+# metric / key ที่เก็บ:
+#   total/all            จำนวนผลการประเมินทั้งหมด     risk_sum/all   ผลรวมคะแนนความเสี่ยง
+#   cluster/<id>         จำนวนต่อกลุ่ม DNA           band/<ระดับ>    จำนวนต่อระดับความเสี่ยง (scoring.risk_band)
+#   risk_bin/<ช่อง>      Histogram คะแนน 0-100 ช่องละ BIN_WIDTH
+#   answer_sum/<คำถาม>   answer_count/<คำถาม>   ผลรวม/จำนวนคำตอบที่ตอบจริงของแต่ละข้อ (ใช้หาค่าเฉลี่ย)
+TABLE = 'cohort_aggregates'
+BIN_WIDTH = 5 # ขอบ 40/70 ของระดับความเสี่ยงตรงกับขอบช่องพอดี
+N_BINS = 100 // BIN_WIDTH
+ANSWER_COLUMNS = feature_schema.INPUT_COLUMNS
+BAND_NAMES = tuple(name for name, _ in scoring.RISK_BANDS)
+
+SCHEMA = (f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+          'metric TEXT NOT NULL, key TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (metric, key)) WITHOUT ROWID')
+_UPSERT = (f'INSERT INTO {TABLE} (metric, key, value) VALUES (?, ?, ?) '
+           'ON CONFLICT (metric, key) DO UPDATE SET value = value + excluded.value')
+
+def deltas(answers, cluster_ids, risk_scores):
+    # answers = เมทริกซ์คำตอบ (n, 15) จาก feature_schema.answer_matrix (ข้อที่ไม่ได้ตอบ = NaN)
+    answers = np.asarray(answers, dtype=float)
+    cluster_ids = np.asarray(cluster_ids, dtype=np.int64)
+    risk_scores = np.clip(np.asarray(risk_scores, dtype=float), 0.0, 100.0)
+    if not len(risk_scores):
+        return []
+
+    rows = [('total', 'all', float(len(risk_scores))), ('risk_sum', 'all', float(risk_scores.sum()))]
+    rows += [('cluster', str(cluster), float(count))
+             for cluster, count in zip(*np.unique(cluster_ids, return_counts=True))]
+    rows += [('band', BAND_NAMES[band], float(count))
+             for band, count in zip(*np.unique(scoring.risk_bands(risk_scores), return_counts=True))]
+    bins = np.minimum((risk_scores // BIN_WIDTH).astype(np.int64), N_BINS - 1) # คะแนน 100 อยู่ช่องสุดท้าย
+    # คะแนน 70 พอดีเป็นระดับปานกลาง (scoring.risk_bands) -> อยู่ช่อง 65-70 ไม่ใช่ช่อง 70-75 ที่เป็นระดับสูง
+    bins = np.where(risk_scores == scoring.RISK_BAND_EDGES[1], bins - 1, bins)
+    rows += [('risk_bin', str(b), float(count)) for b, count in zip(*np.unique(bins, return_counts=True))]
+
+    answered = ~np.isnan(answers)
+    sums, counts = np.where(answered, answers, 0.0).sum(axis=0), answered.sum(axis=0)
+    for col, total, count in zip(ANSWER_COLUMNS, sums, counts):
+        if count:
+            rows += [('answer_sum', col, float(total)), ('answer_count', col, float(count))]
+    return rows
+
+def apply(conn, rows):
+    # เรียกภายใน Transaction ของผู้เขียน (ผลการประเมินกับค่าสะสมเข้าดิสก์พร้อมกันเสมอ)
+    if rows:
+        conn.executemany(_UPSERT, rows)
+
+def rebuild(conn, chunk_size=10000):
+    # สร้างค่าสะสมใหม่จากประวัติทั้งหมด (ใช้ครั้งเดียวกับไฟล์ที่มีข้อมูลก่อนมีตารางนี้)
+    quoted = ', '.join(f'"{col}"' for col in ANSWER_COLUMNS)
+    conn.execute(f'DELETE FROM {TABLE}')
+    total = 0
+    for chunk in pd.read_sql_query(f'SELECT {quoted}, cluster_id, risk_score FROM assessments', conn,
+                                   chunksize=chunk_size):
+        chunk = chunk.dropna(subset=['cluster_id', 'risk_score'])
+        apply(conn, deltas(chunk[ANSWER_COLUMNS].to_numpy(dtype=float), chunk['cluster_id'], chunk['risk_score']))
+        total += len(chunk)
+    return total
+
+def ensure(conn):
+    # ไฟล์เดิมที่มีผลการประเมินแต่ยังไม่มีค่าสะสม -> สร้างให้ครั้งเดียว (ถือ Lock เขียนกันหลาย Replica ทำซ้ำ)
+    conn.execute(SCHEMA)
+    if conn.execute(f'SELECT 1 FROM {TABLE} LIMIT 1').fetchone():
+        return
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if not conn.execute(f'SELECT 1 FROM {TABLE} LIMIT 1').fetchone():
+            rebuild(conn)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+# ==========================================
+# อ่านค่าสะสมสำหรับหน้า Cohort (อ่านตารางขนาดคงที่ ไม่ขึ้นกับจำนวนผลการประเมิน)
+# ==========================================
+def read(conn):
+    values = {}
+    for metric, key, value in conn.execute(f'SELECT metric, key, value FROM {TABLE}'):
+        values.setdefault(metric, {})[key] = value
+    total = int(values.get('total', {}).get('all', 0))
+
+    clusters = values.get('cluster', {})
+    cluster_counts = pd.Series([int(clusters.get(str(i), 0)) for i in range(len(scoring.CLUSTER_NAMES))],
+                               index=list(scoring.CLUSTER_NAMES), name='จำนวน')
+
+    bands = values.get('band', {})
+    band_counts = pd.Series([int(bands.get(name, 0)) for name in BAND_NAMES], index=list(BAND_NAMES), name='จำนวน')
+
+    # Histogram แยกคอลัมน์ตามระดับความเสี่ยงของแต่ละช่อง (ใช้วาดกราฟแท่งแยกสี)
+    bins = values.get('risk_bin', {})
+    edges = np.arange(N_BINS) * BIN_WIDTH
+    histogram = pd.DataFrame(0, index=[f'{low}-{low + BIN_WIDTH}' for low in edges], columns=list(BAND_NAMES))
+    for b, band in enumerate(scoring.risk_bands(edges + BIN_WIDTH / 2)):
+        histogram.iloc[b, band] = int(bins.get(str(b), 0))
+
+    sums, counts = values.get('answer_sum', {}), values.get('answer_count', {})
+    answers = pd.DataFrame({
+        'คำถาม': [feature_schema.FIELDS[col].label for col in ANSWER_COLUMNS],
+        'ค่าเฉลี่ย': [sums.get(col, 0.0) / counts[col] if counts.get(col) else np.nan for col in ANSWER_COLUMNS],
+        'คะแนนเต็ม': [feature_schema.FIELDS[col].high for col in ANSWER_COLUMNS],
+        'จำนวนที่ตอบ': [int(counts.get(col, 0)) for col in ANSWER_COLUMNS],
+    }, index=ANSWER_COLUMNS)
+
+    mean_risk = values.get('risk_sum', {}).get('all', 0.0) / total if total else np.nan
+    return {'total': total, 'mean_risk': mean_risk, 'clusters': cluster_counts, 'bands': band_counts,
+            'histogram': histogram, 'answers': answers}
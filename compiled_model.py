@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# ==========================================
+# โมเดลต้นไม้ที่ Export จาก AutoGluon (ใช้แค่ numpy ไม่ต้อง import AutoGluon/torch)
+# ==========================================
+# โครงสร้างไฟล์ .npz
+#   node_feature   : คอลัมน์ที่ใช้แบ่ง (-1 = ใบ)
+#   node_threshold : ไปทางซ้ายเมื่อ x <= threshold
+#   node_left/right: index ของโหนดลูก (นับรวมทุกต้นไม้)
+#   node_missing   : 0 = NaN ไปทาง default, 1 = NaN แทนด้วย 0 (LightGBM None), 2 = NaN หรือ 0 ไปทาง default (LightGBM Zero)
+#   node_default_left, node_value
+#   tree_roots     : โหนดแรกของแต่ละต้นไม้
+#   meta           : JSON (คอลัมน์คำตอบ + รายละเอียดสมาชิกแต่ละตัวของ Ensemble)
+COMPILED_FILE = 'compiled_model.npz'
+# ไฟล์ .npz บีบอัด memory-map ไม่ได้ -> แตกแต่ละ array เป็น .npy ไว้ข้างๆ (compiled_model.mmap/) ครั้งเดียว
+# แล้วทุก Replica/Worker เปิดแบบ memory-map ใช้หน้า memory ของไฟล์ร่วมกัน (เหมือน cluster_lookup.npy)
+MMAP_SUFFIX = '.mmap'
+MMAP_STAMP = 'source.json'
+
+LINK_LOGIT = 'logit'  # p = sigmoid(scale * ผลรวมใบ + bias)  (LightGBM / XGBoost / CatBoost)
+LINK_MEAN = 'mean'    # p = ค่าเฉลี่ยของใบ                    (RandomForest / ExtraTrees)
+
+MISSING_DEFAULT = 0
+MISSING_AS_ZERO = 1
+MISSING_ZERO_OR_NAN = 2
+
+NODE_ARRAYS = ('node_feature', 'node_threshold', 'node_left', 'node_right',
+               'node_missing', 'node_default_left', 'node_value')
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+class CompiledModel:
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.input_columns = meta['input_columns']
+        for name in NODE_ARRAYS + ('tree_roots',):
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        if mmap:
+            try:
+                return cls._load_mmap(path)
+            except OSError:
+                pass # Volume อ่านได้อย่างเดียว/สร้างไม่ได้ -> โหลดเข้าหน่วยความจำตามปกติ
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in NODE_ARRAYS + ('tree_roots',)}
+            meta = json.loads(str(data['meta']))
+        return cls(arrays, meta)
+
+    @classmethod
+    def _load_mmap(cls, path):
+        mmap_dir = os.path.splitext(path)[0] + MMAP_SUFFIX
+        stat = os.stat(path)
+        stamp = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        try:
+            with open(os.path.join(mmap_dir, MMAP_STAMP), encoding='utf-8') as f:
+                fresh = json.load(f) == stamp
+        except (OSError, ValueError):
+            fresh = False
+        if not fresh:
+            cls._write_mmap(path, mmap_dir, stamp)
+        arrays = {name: np.load(os.path.join(mmap_dir, name + '.npy'), mmap_mode='r')
+                  for name in NODE_ARRAYS + ('tree_roots',)}
+        with open(os.path.join(mmap_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(arrays, meta)
+
+    @staticmethod
+    def _write_mmap(path, mmap_dir, stamp):
+        # เขียนโฟลเดอร์ชั่วคราวแล้ว rename (หลาย Replica สร้างพร้อมกันได้โดยไม่เห็นไฟล์ครึ่งๆ)
+        tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(mmap_dir) + '.', suffix='.tmp', dir=os.path.dirname(path))
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                for name in NODE_ARRAYS + ('tree_roots',):
+                    np.save(os.path.join(tmp_dir, name + '.npy'), data[name])
+                meta = str(data['meta'])
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                f.write(meta)
+            with open(os.path.join(tmp_dir, MMAP_STAMP), 'w', encoding='utf-8') as f:
+                json.dump(stamp, f)
+            os.chmod(tmp_dir, 0o755)
+            shutil.rmtree(mmap_dir, ignore_errors=True) # ของเก่าจากไฟล์ .npz รุ่นก่อน
+            try:
+                os.rename(tmp_dir, mmap_dir)
+            except OSError:
+                if not os.path.isdir(mmap_dir): # อีก Process สร้างเสร็จไปก่อน
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def save(self, path):
+        arrays = {name: getattr(self, name) for name in NODE_ARRAYS + ('tree_roots',)}
+        np.savez_compressed(path, meta=np.array(json.dumps(self.meta)), **arrays)
+
+    def _leaf_values(self, X, roots):
+        # เดินทุกต้นไม้พร้อมกันทุกแถว (ทีละชั้นความลึก)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(roots, (X.shape[0], len(roots))).copy()
+        while True:
+            feature = self.node_feature[nodes]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            x = X[rows, np.where(internal, feature, 0)]
+            mode = self.node_missing[nodes]
+            is_nan = np.isnan(x)
+            x = np.where(is_nan & (mode == MISSING_AS_ZERO), 0.0, x)
+            missing = np.where(mode == MISSING_ZERO_OR_NAN, is_nan | (x == 0), is_nan & (mode == MISSING_DEFAULT))
+            go_left = np.where(missing, self.node_default_left[nodes], x <= self.node_threshold[nodes])
+            step = np.where(go_left, self.node_left[nodes], self.node_right[nodes])
+            nodes = np.where(internal, step, nodes)
+        return self.node_value[nodes]
+
+    def predict_positive(self, answers):
+        # answers = ตารางคำตอบ 15 ข้อ (DataFrame หรือ array เรียงตาม input_columns)
+        if hasattr(answers, 'reindex'):
+            answers = answers.reindex(columns=self.input_columns).to_numpy(dtype=float)
+        answers = np.asarray(answers, dtype=float).reshape(-1, len(self.input_columns))
+
+        prob = np.zeros(answers.shape[0])
+        for member in self.meta['members']:
+            input_map = np.asarray(member['input_map'])
+            X = np.where(input_map >= 0, answers[:, np.maximum(input_map, 0)],
+                         np.asarray(member['constants'], dtype=float))
+            leaves = self._leaf_values(X, self.tree_roots[member['tree_start']:member['tree_end']])
+            if member['link'] == LINK_LOGIT:
+                p = _sigmoid(member['scale'] * leaves.sum(axis=1) + member['bias'])
+            else:
+                p = leaves.mean(axis=1)
+            prob += member['weight'] * p
+        return prob
+
+    def predict_proba(self, answers):
+        # คืนค่า 2 คอลัมน์ [ไม่เสี่ยง, เสี่ยง] เหมือน TabularPredictor.predict_proba
+        p = self.predict_positive(answers)
+        return np.column_stack([1.0 - p, p])
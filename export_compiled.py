@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import compiled_model
+import feature_schema
+import model_archive
+import scoring
+from compiled_model import CompiledModel
+
+# ==========================================
+# 1. รวบรวมโหนดของต้นไม้ทุกต้นเป็น Array ชุดเดียว
+# ==========================================
+class TreeTables:
+    def __init__(self):
+        self.columns = {name: [] for name in compiled_model.NODE_ARRAYS}
+        self.tree_roots = []
+
+    def add_node(self, feature=-1, threshold=0.0, missing=compiled_model.MISSING_DEFAULT,
+                 default_left=True, value=0.0):
+        index = len(self.columns['node_feature'])
+        for name, val in (('node_feature', feature), ('node_threshold', threshold), ('node_left', index),
+                          ('node_right', index), ('node_missing', missing),
+                          ('node_default_left', default_left), ('node_value', value)):
+            self.columns[name].append(val)
+        return index
+
+    def link(self, parent, left, right):
+        self.columns['node_left'][parent] = left
+        self.columns['node_right'][parent] = right
+
+    def arrays(self):
+        dtypes = {'node_feature': np.int32, 'node_threshold': np.float64, 'node_left': np.int32,
+                  'node_right': np.int32, 'node_missing': np.int8, 'node_default_left': bool,
+                  'node_value': np.float64}
+        arrays = {name: np.asarray(vals, dtype=dtypes[name]) for name, vals in self.columns.items()}
+        arrays['tree_roots'] = np.asarray(self.tree_roots, dtype=np.int32)
+        return arrays
+
+# ==========================================
+# 2. แปลงโมเดลแต่ละชนิดเป็นตารางต้นไม้
+# ==========================================
+_LGB_MISSING = {'None': compiled_model.MISSING_AS_ZERO, 'Zero': compiled_model.MISSING_ZERO_OR_NAN,
+                'NaN': compiled_model.MISSING_DEFAULT}
+
+def _add_lightgbm(tables, booster):
+    dump = booster.dump_model()
+    objective = dump.get('objective', '')
+    if not objective.startswith('binary'):
+        raise NotImplementedError(f"รองรับเฉพาะ LightGBM แบบ binary (พบ {objective})")
+    scale = 1.0
+    for token in objective.split():
+        if token.startswith('sigmoid:'):
+            scale = float(token.split(':', 1)[1])
+
+    def walk(node):
+        if 'leaf_value' in node:
+            return tables.add_node(value=node['leaf_value'])
+        if node.get('decision_type', '<=') != '<=':
+            raise NotImplementedError("ยังไม่รองรับ Categorical split ของ LightGBM")
+        index = tables.add_node(feature=node['split_feature'], threshold=node['threshold'],
+                                missing=_LGB_MISSING[node.get('missing_type', 'None')],
+                                default_left=node.get('default_left', True))
+        tables.link(index, walk(node['left_child']), walk(node['right_child']))
+        return index
+
+    start = len(tables.tree_roots)
+    for tree in dump['tree_info']:
+        tables.tree_roots.append(walk(tree['tree_structure']))
+    return {'link': compiled_model.LINK_LOGIT, 'scale': scale, 'bias': 0.0,
+            'tree_start': start, 'tree_end': len(tables.tree_roots)}
+
+def _add_xgboost(tables, booster):
+    config = json.loads(booster.save_config())
+    objective = config['learner']['objective']['name']
+    if objective != 'binary:logistic':
+        raise NotImplementedError(f"รองรับเฉพาะ XGBoost แบบ binary:logistic (พบ {objective})")
+    base_score = float(str(config['learner']['learner_model_param']['base_score']).strip('[]'))
+    names = booster.feature_names
+
+    def feature_index(split):
+        if names is not None and split in names:
+            return names.index(split)
+        return int(split.lstrip('f'))
+
+    def walk(node, by_id):
+        if 'leaf' in node:
+            return tables.add_node(value=node['leaf'])
+        # XGBoost ไปทางซ้ายเมื่อ x < split จึงเลื่อน threshold ลงหนึ่งค่า float เพื่อใช้ x <= threshold
+        index = tables.add_node(feature=feature_index(node['split']),
+                                threshold=np.nextafter(float(node['split_condition']), -np.inf),
+                                default_left=node['missing'] == node['yes'])
+        tables.link(index, walk(by_id[node['yes']], by_id), walk(by_id[node['no']], by_id))
+        return index
+
+    def flatten(node, by_id):
+        by_id[node['nodeid']] = node
+        for child in node.get('children', []):
+            flatten(child, by_id)
+        return by_id
+
+    start = len(tables.tree_roots)
+    for dump in booster.get_dump(dump_format='json'):
+        root = json.loads(dump)
+        tables.tree_roots.append(walk(root, flatten(root, {})))
+    bias = float(np.log(base_score / (1.0 - base_score)))
+    return {'link': compiled_model.LINK_LOGIT, 'scale': 1.0, 'bias': bias,
+            'tree_start': start, 'tree_end': len(tables.tree_roots)}
+
+def _add_sklearn_forest(tables, forest):
+    if len(forest.classes_) != 2:
+        raise NotImplementedError("รองรับเฉพาะ RandomForest/ExtraTrees แบบ 2 คลาส")
+
+    start = len(tables.tree_roots)
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :]
+        positive = value[:, 1] / value.sum(axis=1)
+        missing_left = getattr(tree, 'missing_go_to_left', np.ones(tree.node_count, dtype=bool))
+        offset = len(tables.columns['node_feature'])
+        for i in range(tree.node_count):
+            if tree.children_left[i] < 0:
+                tables.add_node(value=positive[i])
+            else:
+                tables.add_node(feature=tree.feature[i], threshold=tree.threshold[i],
+                                default_left=bool(missing_left[i]))
+        for i in range(tree.node_count):
+            if tree.children_left[i] >= 0:
+                tables.link(offset + i, offset + tree.children_left[i], offset + tree.children_right[i])
+        tables.tree_roots.append(offset)
+    return {'link': compiled_model.LINK_MEAN, 'scale': 1.0, 'bias': 0.0,
+            'tree_start': start, 'tree_end': len(tables.tree_roots)}
+
+def _add_catboost(tables, model):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.json')
+        model.save_model(path, format='json')
+        with open(path, encoding='utf-8') as f:
+            dump = json.load(f)
+
+    float_features = {f['feature_index']: f for f in dump['features_info'].get('float_features', [])}
+    if dump['features_info'].get('categorical_features'):
+        raise NotImplementedError("ยังไม่รองรับ Categorical feature ของ CatBoost")
+    scale, bias = dump.get('scale_and_bias', [1.0, [0.0]])
+    bias = bias[0] if isinstance(bias, list) else bias
+
+    start = len(tables.tree_roots)
+    for tree in dump['oblivious_trees']:
+        splits = tree['splits']
+        leaves = tree['leaf_values']
+
+        # ต้นไม้ Oblivious: split ที่ i เป็นบิตที่ i ของ index ใบ (x > border = 1)
+        def build(depth, leaf_index):
+            if depth < 0:
+                return tables.add_node(value=leaves[leaf_index])
+            split = splits[depth]
+            info = float_features[split['float_feature_index']]
+            nan_as_true = info.get('nan_value_treatment') == 'AsTrue'
+            index = tables.add_node(feature=info['flat_feature_index'], threshold=split['border'],
+                                    default_left=not nan_as_true)
+            tables.link(index, build(depth - 1, leaf_index), build(depth - 1, leaf_index | (1 << depth)))
+            return index
+
+        tables.tree_roots.append(build(len(splits) - 1, 0))
+    return {'link': compiled_model.LINK_LOGIT, 'scale': float(scale), 'bias': float(bias),
+            'tree_start': start, 'tree_end': len(tables.tree_roots)}
+
+def _add_model(tables, child):
+    kind = type(child).__name__
+    if kind == 'LGBModel':
+        return _add_lightgbm(tables, child.model)
+    if kind == 'XGBoostModel':
+        return _add_xgboost(tables, child.model.get_booster())
+    if kind in ('RFModel', 'XTModel'):
+        return _add_sklearn_forest(tables, child.model)
+    if kind == 'CatBoostModel':
+        return _add_catboost(tables, child.model)
+    raise NotImplementedError(f"ยังไม่รองรับการ Export โมเดลชนิด {kind}")
+
+# ==========================================
+# 3. ผูกคอลัมน์ของโมเดลกับคำตอบ 15 ข้อ (คอลัมน์อื่นต้องเป็นค่าคงที่)
+# ==========================================
+def random_answers(n, rng):
+    # สุ่มภายในช่วงของแต่ละข้อตาม feature_schema (ข้อ มี/ไม่มี ได้ 0-1 ที่เหลือ 0-5)
+    low, high = feature_schema.INPUT_LOW, feature_schema.INPUT_HIGH
+    answers = rng.integers(low.astype(int), high.astype(int) + 1, size=(n, len(scoring.INPUT_COLUMNS))).astype(float)
+    return pd.DataFrame(answers, columns=scoring.INPUT_COLUMNS)
+
+def _bind_inputs(model_input, answers):
+    X = np.asarray(model_input, dtype=float)
+    A = answers.to_numpy(dtype=float)
+    input_map, constants = [], []
+    for j in range(X.shape[1]):
+        col = X[:, j]
+        match = [k for k in range(A.shape[1]) if np.array_equal(col, A[:, k], equal_nan=True)]
+        if match:
+            input_map.append(match[0])
+            constants.append(float('nan'))
+        elif np.all(np.isnan(col)) or np.all(col == col[0]):
+            input_map.append(-1)
+            constants.append(float(col[0]))
+        else:
+            raise NotImplementedError(f"คอลัมน์ที่ {j} ของโมเดลไม่ได้มาจากคำตอบโดยตรง (อาจเป็น Stack feature)")
+    return input_map, constants
+
+def _members(predictor, name, weight):
+    # แตก Ensemble เป็นรายชื่อโมเดลย่อย (น้ำหนักรวมกันเท่ากับ 1)
+    trainer = predictor._trainer
+    model = trainer.load_model(name)
+    if 'WeightedEnsemble' in type(model).__name__:
+        members = []
+        for base, w in model._get_model_weights().items():
+            members += _members(predictor, base, weight * w)
+        return members
+    if hasattr(model, 'load_child') and getattr(model, 'models', None):
+        children = [model.load_child(c) for c in model.models]
+        return [(name, child, weight / len(children)) for child in children]
+    return [(name, model, weight)]
+
+def export(predictor, template, model_name=None, n_bind=512, seed=0):
+    model_name = model_name or predictor.model_best
+    rng = np.random.default_rng(seed)
+    answers = pd.concat([random_answers(n_bind, rng),
+                         pd.DataFrame([[0.0] * 15, [5.0] * 8 + [5.0, 1.0, 1.0, 5.0, 5.0, 5.0, 5.0]],
+                                      columns=scoring.INPUT_COLUMNS)], ignore_index=True)
+    pred_df = scoring.build_prediction_frame(answers, template)
+
+    tables = TreeTables()
+    members = []
+    for base_name, child, weight in _members(predictor, model_name, 1.0):
+        model_input = child.preprocess(predictor.transform_features(pred_df, model=base_name))
+        if hasattr(model_input, 'toarray'):
+            model_input = model_input.toarray()
+        member = _add_model(tables, child)
+        member['input_map'], member['constants'] = _bind_inputs(model_input, answers)
+        member['weight'] = weight
+        member['source'] = f"{base_name}/{getattr(child, 'name', base_name)}"
+        members.append(member)
+
+    meta = {
+        'input_columns': scoring.INPUT_COLUMNS,
+        'model_name': model_name,
+        'members': members,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return CompiledModel(tables.arrays(), meta)
+
+# ==========================================
+# 4. ตรวจสอบว่าผลตรงกับ predict_proba ของ AutoGluon
+# ==========================================
+def verify(compiled, predictor, template, answers, tolerance):
+    pred_df = scoring.build_prediction_frame(answers, template)
+    expected = np.asarray(predictor.predict_proba(pred_df, model=compiled.meta['model_name']).values, dtype=float)[:, -1]
+    actual = compiled.predict_positive(answers)
+    max_diff = float(np.max(np.abs(actual - expected))) if len(answers) else 0.0
+    return max_diff <= tolerance, max_diff
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export โมเดล AutoGluon เป็นตารางต้นไม้ numpy (ไม่ต้องใช้ AutoGluon ตอนรัน)")
+    parser.add_argument('--base-dir', default=scoring.BASE_DIR)
+    parser.add_argument('--source-variant', default='full', help="รุ่นของ predictor ที่จะ Export (full / refit_full / pruned)")
+    parser.add_argument('--model', default=None, help="ชื่อโมเดลใน predictor (ค่าเริ่มต้น = model_best)")
+    parser.add_argument('--verify-only', action='store_true', help="ตรวจไฟล์ที่ Export ไว้แล้วเท่านั้น")
+    parser.add_argument('--samples', type=int, default=20000, help="จำนวนคำตอบสุ่มที่ใช้ตรวจสอบ")
+    parser.add_argument('--tolerance', type=float, default=1e-6)
+    args = parser.parse_args(argv)
+
+    from autogluon.tabular import TabularPredictor
+
+    base_dir = args.base_dir
+    source_path = scoring._variant_path(base_dir, args.source_variant)
+    if source_path is None:
+        extract_path = model_archive.ensure_extracted(base_dir)
+        if extract_path is None:
+            print("ไม่พบไฟล์โมเดล AutoGluon (model_part_*)", file=sys.stderr)
+            return 1
+        source_path = extract_path
+        for root, dirs, files in os.walk(extract_path):
+            if 'predictor.pkl' in files:
+                source_path = root
+                break
+    predictor = TabularPredictor.load(source_path, require_py_version_match=False)
+    template = feature_schema.load_template(base_dir)
+
+    out_dir = os.path.join(base_dir, scoring.VARIANTS_DIR, 'compiled')
+    out_path = os.path.join(out_dir, compiled_model.COMPILED_FILE)
+    if args.verify_only:
+        compiled = CompiledModel.load(out_path)
+    else:
+        compiled = export(predictor, template, args.model)
+        compiled.meta['source_variant'] = args.source_variant
+
+    # ตรวจบนข้อมูลเทรนทั้งหมด (ในรูปแบบแถวของหน้าเว็บ) และคำตอบสุ่มจากทั้ง Answer Space
+    df_raw = pd.read_excel(os.path.join(base_dir, feature_schema.WORKBOOK_FILE))
+    checks = {
+        'training_set': scoring.prepare_answers(df_raw),
+        'random_answers': random_answers(args.samples, np.random.default_rng(1)),
+    }
+    passed = True
+    for name, answers in checks.items():
+        ok, max_diff = verify(compiled, predictor, template, answers, args.tolerance)
+        passed &= ok
+        print(f"{name}: {len(answers):,} แถว, ต่างสูงสุด {max_diff:.3g} -> {'ผ่าน' if ok else 'ไม่ผ่าน'}", file=sys.stderr)
+
+    if not passed:
+        print(f"ผลไม่ตรงกับ predict_proba เกิน {args.tolerance} ไม่บันทึกไฟล์", file=sys.stderr)
+        return 1
+    if not args.verify_only:
+        os.makedirs(out_dir, exist_ok=True)
+        compiled.save(out_path)
+        print(f"บันทึก {out_path} ({len(compiled.tree_roots):,} ต้นไม้) ใช้ด้วย "
+              f"{scoring.PREDICTOR_VARIANT_ENV}=compiled", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 0. Schema ของคำถาม 15 ข้อ (ใช้ร่วมกันระหว่างแบบฟอร์ม การให้คะแนนบนหน้าเว็บ และ Batch)
+# ==========================================
+# choices = คู่ (ข้อความที่แสดงในแบบฟอร์ม, รหัสที่ส่งเข้าโมเดล) เรียงตามลำดับในแบบฟอร์ม
+# คำตอบเก็บเป็น float64 เสมอ (ข้อที่ไม่ได้ตอบ / ค่านอกช่วง = NaN)
+InputField = namedtuple('InputField', ['name', 'label', 'low', 'high', 'default', 'choices'])
+
+ANSWER_DTYPE = np.float64
+LEVEL_CHOICES = tuple((str(level), level) for level in range(6))
+BINARY_CHOICES = (('ไม่มี (0)', 0), ('มี (1)', 1))
+
+def _level(name, label):
+    return InputField(name, label, 0, 5, 0, LEVEL_CHOICES)
+
+def _binary(name, label):
+    return InputField(name, label, 0, 1, 0, BINARY_CHOICES)
+
+INPUT_FIELDS = [
+    # Input Step 1
+    _level('BEH_MON', "ท่านติดตามและตรวจสอบความพึงพอใจของลูกค้า"),
+    _level('BRN_IMAGE', "ท่านให้ความสำคัญกับภาพลักษณ์องค์กร"),
+    _level('BRN_BRAND', "การรับรู้และความน่าเชื่อถือของแบรนด์ของท่าน"),
+    _level('SAV_VIRUS', "การอัพเดทโปรแกรมป้องกันไวรัสเพื่อความปลอดภัยของระบบงาน"),
+    _level('SAV_PDPA', "ท่านปฏิบัติตามกฎหมาย PDPA เพื่อรักษาข้อมูลลูกค้า"),
+    _level('CRI_PLN', "ท่านมีแผนรองรับวิกฤตการณ์ต่าง ๆ เช่น ภัยสงคราม โรคระบาด แผ่นดินไหว เป็นต้น"),
+    _level('POL_BEN', "ท่านได้รับประโยชน์จากนโยบายภาครัฐ"),
+    _level('POL_ADJ', "ท่านสามารถปรับรูปแบบธุรกิจให้สอดคล้องนโยบายรัฐ"),
+    # Input Step 2
+    _level('CAP_NETW', "ท่านใช้เครือข่ายหรือพันธมิตรในการดำเนินธุรกิจในระดับใด"),
+    _binary('CSR3', "กิจการของท่านมีระบบกำจัดของเสีย"),
+    _binary('OHR_CAREER', "กิจการของท่านมีเส้นทางอาชีพให้พนักงานรับรู้"),
+    _level('PRC_CFW', "กระแสเงินสดเพื่อประกอบธุรกิจและชำระหนี้อยู่ในระดับใด"),
+    _level('ECO_ADT', "กิจการของท่านสามารถในการปรับตัวรับสถานการณ์เศรษฐกิจในระดับใด"),
+    _level('ECM_NET', "การเข้าถึงเครือข่ายอินเตอร์เน็ตของกิจการอยู่ในระดับใด"),
+    _level('RES_CH', "ความสามารถในการโต้ตอบลูกค้าผ่านช่องทางต่าง ๆ อยู่ในระดับใด"),
+]
+FIELDS = {field.name: field for field in INPUT_FIELDS}
+INPUT_COLUMNS = [field.name for field in INPUT_FIELDS]
+BINARY_COLUMNS = [field.name for field in INPUT_FIELDS if field.choices is BINARY_CHOICES]
+
+# ช่วงที่ยอมรับของแต่ละข้อ (เรียงตาม INPUT_COLUMNS) ใช้ตรวจทั้งตารางทีเดียว
+INPUT_LOW = np.array([field.low for field in INPUT_FIELDS], dtype=ANSWER_DTYPE)
+INPUT_HIGH = np.array([field.high for field in INPUT_FIELDS], dtype=ANSWER_DTYPE)
+
+# ไฟล์ Batch อาจพิมพ์คำตอบแบบ มี/ไม่มี เป็นข้อความ -> แปลงเป็นรหัสเดียวกับแบบฟอร์ม
+_TEXT_CODES = {label: code for label, code in BINARY_CHOICES}
+_TEXT_CODES.update({'ไม่มี': 0, 'มี': 1})
+
+def choice_label(name, code):
+    # ข้อความที่แสดงในแบบฟอร์มของรหัสนี้ (ใช้เป็น format_func ของ selectbox)
+    return dict((c, label) for label, c in FIELDS[name].choices).get(code, str(code))
+
+def choice_codes(name):
+    return [code for _, code in FIELDS[name].choices]
+
+def answer_matrix(answers):
+    # ตารางคำตอบ (DataFrame / list ของ dict) -> array float64 ขนาด (แถว, 15) เรียงตาม INPUT_COLUMNS
+    frame = pd.DataFrame(answers).reindex(columns=INPUT_COLUMNS)
+    text_cols = [c for c in frame.columns if not pd.api.types.is_numeric_dtype(frame[c])]
+    if text_cols:
+        # เฉพาะคอลัมน์ที่เป็นข้อความ: แปลงตัวเลข + ข้อ มี/ไม่มี แปลงตามรหัสในแบบฟอร์ม ที่เหลือเป็น NaN
+        text = frame[text_cols].astype('string').apply(lambda col: col.str.strip())
+        numbers = text.apply(pd.to_numeric, errors='coerce').astype(ANSWER_DTYPE)
+        binary = [c for c in text_cols if c in BINARY_COLUMNS]
+        if binary:
+            numbers[binary] = numbers[binary].fillna(text[binary].apply(lambda col: col.map(_TEXT_CODES)).astype(ANSWER_DTYPE))
+        frame = frame.drop(columns=text_cols).join(numbers)[INPUT_COLUMNS]
+    values = frame.to_numpy(dtype=ANSWER_DTYPE, na_value=np.nan, copy=True)
+    # ค่านอกช่วงถือว่าไม่ได้ตอบ (เหมือนข้อความที่อ่านไม่ออก)
+    values[(values < INPUT_LOW) | (values > INPUT_HIGH)] = np.nan
+    return values
+
+# ==========================================
+# 1. Schema ของตารางที่ส่งเข้า AutoGluon (แทนการอ่าน RawData2.xlsx ทุกครั้ง)
+# ==========================================
+SCHEMA_FORMAT_VERSION = 1
+SCHEMA_FILE = 'feature_schema.json'
+WORKBOOK_FILE = 'RawData2.xlsx'
+
+# ค่าคงที่ที่เติมให้ทุกแถวก่อนส่งเข้า AutoGluon
+DEFAULT_VALUES = {'SIZ': 1, 'YER': 10}
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _blank_template(df_raw):
+    # แถวแม่แบบที่ล้างค่าเป็น NaN ทั้งหมด (dtype เหมือนการตั้งค่า NaN ผ่าน .at ในหน้าเว็บเดิม)
+    template = df_raw.head(1).copy().reset_index(drop=True)
+    for col in template.columns:
+        template.at[0, col] = float('nan')
+    return template
+
+def build_schema(workbook_path):
+    df_raw = pd.read_excel(workbook_path)
+    template = _blank_template(df_raw)
+    return {
+        'format_version': SCHEMA_FORMAT_VERSION,
+        'source': os.path.basename(workbook_path),
+        'source_sha256': file_sha256(workbook_path),
+        'columns': list(template.columns),
+        # เก็บเฉพาะ float64 / object เพื่อให้อ่านได้ตรงกันทุกเวอร์ชันของ pandas
+        'dtypes': ['float64' if pd.api.types.is_numeric_dtype(t) else 'object' for t in template.dtypes],
+        'defaults': {k: v for k, v in DEFAULT_VALUES.items() if k in template.columns},
+    }
+
+def write_schema(schema, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+def template_from_schema(schema):
+    # แถวแม่แบบเป็น float64 ทั้งแถว (คอลัมน์ข้อความใน Workbook ไม่มีค่าอยู่แล้ว = NaN) ไม่มี object ไปถึงโมเดล
+    columns = schema['columns']
+    row = np.full((1, len(columns)), np.nan, dtype=ANSWER_DTYPE)
+    for col, val in schema['defaults'].items():
+        row[0, columns.index(col)] = val
+    return pd.DataFrame(row, columns=columns)
+
+# ==========================================
+# 2. โหลด Schema (ตรวจว่าไฟล์ยังตรงกับ Workbook ถ้ามี Workbook อยู่)
+# ==========================================
+def is_stale(schema, workbook_path):
+    if schema.get('format_version') != SCHEMA_FORMAT_VERSION:
+        return True
+    if os.path.exists(workbook_path):
+        return schema.get('source_sha256') != file_sha256(workbook_path)
+    return False
+
+def load_schema(base_dir):
+    schema_path = os.path.join(base_dir, SCHEMA_FILE)
+    workbook_path = os.path.join(base_dir, WORKBOOK_FILE)
+
+    schema = None
+    if os.path.exists(schema_path):
+        try:
+            with open(schema_path, encoding='utf-8') as f:
+                schema = json.load(f)
+        except (OSError, ValueError):
+            schema = None
+
+    if schema is not None and not is_stale(schema, workbook_path):
+        return schema
+
+    # ไม่มี Sidecar หรือไม่ตรงกับ Workbook -> อ่าน Excel แล้วสร้างใหม่
+    if not os.path.exists(workbook_path):
+        return None
+    schema = build_schema(workbook_path)
+    try:
+        write_schema(schema, schema_path)
+    except OSError:
+        pass # Volume อ่านได้อย่างเดียว ใช้ค่าในหน่วยความจำไปก่อน
+    return schema
+
+def load_template(base_dir):
+    schema = load_schema(base_dir)
+    if schema is None:
+        return pd.DataFrame() # กรณีไม่มีไฟล์
+    return template_from_schema(schema)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างไฟล์ feature_schema.json จาก RawData2.xlsx")
+    parser.add_argument('--base-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args(argv)
+
+    workbook_path = os.path.join(args.base_dir, WORKBOOK_FILE)
+    schema = build_schema(workbook_path)
+    write_schema(schema, os.path.join(args.base_dir, SCHEMA_FILE))
+    print(f"บันทึก {SCHEMA_FILE} ({len(schema['columns'])} คอลัมน์) จาก {WORKBOOK_FILE}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
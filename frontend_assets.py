@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import re
+import sys
+import urllib.request
+from functools import lru_cache
+
+# ==========================================
+# ไฟล์ Static ของหน้าเว็บ (ฟอนต์ + Stylesheet) ให้ Streamlit เสิร์ฟจาก app/static
+# ==========================================
+# ต้องเปิด [server] enableStaticServing = true ใน .streamlit/config.toml
+# หน้าเว็บฝัง fincheck.js ครั้งเดียวต่อ Session แล้วเบราว์เซอร์โหลด/Cache CSS เอง (ไม่ส่ง <style> ซ้ำทุกรอบ)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+FONTS_DIR = os.path.join(STATIC_DIR, 'fonts')
+SCRIPT_FILE = 'fincheck.js'
+FONTS_CSS = 'fonts.css'
+
+# ฟอนต์ที่ใช้ (Sarabun = ภาษาไทย, Jost = ชื่อ SME FinCheck) และ Subset ที่เก็บไว้
+FONT_FAMILIES = {'Sarabun': (300, 400, 500, 600, 700), 'Jost': (300, 400, 500, 600)}
+FONT_SUBSETS = ('thai', 'latin', 'latin-ext')
+GOOGLE_FONTS_CSS = 'https://fonts.googleapis.com/css2'
+# Google Fonts ส่ง woff2 ให้เฉพาะเบราว์เซอร์รุ่นใหม่
+_WOFF2_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+_FONT_FACE = re.compile(r'/\*\s*([\w-]+)\s*\*/\s*(@font-face\s*\{[^}]*\})')
+
+# ==========================================
+# 1. โค้ดที่ฝังลงหน้าเว็บ
+# ==========================================
+@lru_cache(maxsize=1)
+def bootstrap_html():
+    # iframe ของ components.html อยู่ Origin เดียวกับหน้าหลัก -> ย้ายโค้ดไปรันในหน้าหลัก (อยู่ต่อแม้ iframe ถูกลบ)
+    with open(os.path.join(STATIC_DIR, SCRIPT_FILE), encoding='utf-8') as f:
+        source = f.read()
+    if not os.path.exists(os.path.join(FONTS_DIR, FONTS_CSS)):
+        # เตือนครั้งเดียวต่อ Process (lru_cache) หน้าเว็บจะใช้ฟอนต์ในเครื่องผู้ใช้แทน Sarabun/Jost
+        print(f"[startup] ไม่พบ static/fonts/{FONTS_CSS} กรุณารัน python frontend_assets.py แล้ว Commit static/fonts",
+              file=sys.stderr)
+    return ("<script>\n"
+            "var doc = window.parent.document;\n"
+            "if (!doc.getElementById('fincheck-assets')) {\n"
+            "    var script = doc.createElement('script');\n"
+            "    script.id = 'fincheck-assets';\n"
+            f"    script.textContent = {json.dumps(source)};\n"
+            "    doc.head.appendChild(script);\n"
+            "}\n"
+            "</script>")
+
+def page_marker(page):
+    # ตัวระบุหน้าปัจจุบัน (ใช้เลือกกฎ CSS เฉพาะหน้า และสั่งเลื่อนขึ้นบนสุดเมื่อเปลี่ยนหน้า)
+    return f'<div class="fc-page" data-page="{page}"></div>'
+
+# ==========================================
+# 2. ดาวน์โหลดฟอนต์มาเก็บในเครื่อง (รันครั้งเดียวตอน Deploy แล้ว Commit ไฟล์ใน static/fonts)
+# ==========================================
+def _get(url):
+    request = urllib.request.Request(url, headers={'User-Agent': _WOFF2_USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+def fetch_fonts(fonts_dir=FONTS_DIR, families=FONT_FAMILIES, subsets=FONT_SUBSETS):
+    query = '&'.join(f"family={name}:wght@{';'.join(map(str, weights))}" for name, weights in families.items())
+    css = _get(f'{GOOGLE_FONTS_CSS}?{query}&display=swap').decode('utf-8')
+
+    os.makedirs(fonts_dir, exist_ok=True)
+    faces, total = [], 0
+    for subset, face in _FONT_FACE.findall(css):
+        if subset not in subsets:
+            continue
+        family = re.search(r"font-family:\s*'([^']+)'", face).group(1)
+        weight = re.search(r'font-weight:\s*(\d+)', face).group(1)
+        url = re.search(r'url\((https://[^)]+\.woff2)\)', face).group(1)
+        filename = f'{family}-{weight}-{subset}.woff2'
+        data = _get(url)
+        with open(os.path.join(fonts_dir, filename), 'wb') as f:
+            f.write(data)
+        total += len(data)
+        # CSS ถูกฝังเป็น <style> ในหน้าหลัก -> path อ้างอิงจากหน้าเว็บ ไม่ใช่จากไฟล์ CSS
+        faces.append(f'/* {subset} */\n' + face.replace(url, f'app/static/fonts/{filename}'))
+
+    if not faces:
+        raise RuntimeError("ไม่พบฟอนต์ในคำตอบของ Google Fonts")
+    with open(os.path.join(fonts_dir, FONTS_CSS), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(faces) + '\n')
+    return len(faces), total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ดาวน์โหลดฟอนต์ Sarabun/Jost มาเก็บใน static/fonts (ใช้งานได้แม้ไม่มีอินเทอร์เน็ต)")
+    parser.add_argument('--fonts-dir', default=FONTS_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        count, total = fetch_fonts(args.fonts_dir)
+    except (OSError, RuntimeError) as e:
+        print(f"ดาวน์โหลดฟอนต์ไม่สำเร็จ: {e}", file=sys.stderr)
+        return 1
+    print(f"บันทึกฟอนต์ {count} ไฟล์ ({total / 1024:.0f} KB) -> {args.fonts_dir}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
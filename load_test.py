@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+# ==========================================
+# Load Test หน้าเว็บแบบหลาย Session พร้อมกัน (Server จริงบน localhost + Client WebSocket แบบไม่มีเบราว์เซอร์)
+# ==========================================
+# Client แต่ละตัวทำตัวเหมือนเบราว์เซอร์: ส่ง BackMsg (rerun_script + ค่า Widget) แล้วรอ ForwardMsg จนสคริปต์รันจบ
+# (ไม่ใช้ AppTest เพราะ AppTest ใช้ Runtime ตัวเดียวของ Process รันพร้อมกันหลาย Session ไม่ได้)
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+STREAM_PATH = '/_stcore/stream'
+HEALTH_PATH = '/_stcore/health'
+STEPS = ('landing', 'input_step1', 'input_step2', 'dashboard', 'recommendation', 'profile', 'profile_submit')
+
+# ปุ่มที่ใช้เดินไปหน้าถัดไป และข้อความที่ต้องเจอในหน้าที่ได้ (ตรวจว่าไปถึงหน้าที่ถูกต้องจริง)
+FLOW = (
+    ('input_step1', 'Start', 'ถัดไป'),
+    ('input_step2', 'ถัดไป', 'ประเมินผลลัพธ์'),
+    ('dashboard', 'ประเมินผลลัพธ์', 'Recommendation'),
+    ('recommendation', 'Recommendation', 'โปรไฟล์'),
+    ('profile', 'โปรไฟล์', 'ยืนยัน'),
+    ('profile_submit', 'ยืนยัน', 'ทำแบบสอบถาม'),
+)
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None # ไม่ใช่ Linux หรือไม่รู้ pid ของ Server
+
+# ==========================================
+# 1. เปิด Server Streamlit บน localhost
+# ==========================================
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(app_file=APP_FILE, port=None, timeout=120):
+    port = port or _free_port()
+    cmd = [sys.executable, '-m', 'streamlit', 'run', app_file,
+           '--server.headless', 'true', '--server.address', '127.0.0.1', '--server.port', str(port),
+           '--browser.gatherUsageStats', 'false', '--server.fileWatcherType', 'none']
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server ปิดตัวก่อนพร้อมใช้งาน (exit {proc.returncode})")
+        try:
+            with urllib.request.urlopen(url + HEALTH_PATH, timeout=1) as resp:
+                if resp.status == 200:
+                    return proc, url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"Server ไม่พร้อมภายใน {timeout} วินาที")
+
+# ==========================================
+# 2. Client จำลองเบราว์เซอร์ 1 Session
+# ==========================================
+class SessionClient:
+    def __init__(self, url, seed, timeout=60):
+        self.ws_url = url.replace('http', 'ws', 1) + STREAM_PATH
+        self.rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.timeout = timeout
+        self.ws = None
+        self.widgets = []
+        self.texts = []
+        self.payload = {} # จำนวน byte ของ ForwardMsg ที่ได้รับต่อหน้า
+        self.received = 0
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+        self.ws = await connect(self.ws_url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def rerun(self, widget_states=()):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = ''
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+        await self.ws.send(msg.SerializeToString())
+        self.received = 0
+
+        # เก็บ Element ของรอบล่าสุด (st.rerun ทำให้ได้ new_session ใหม่ -> เริ่มนับใหม่)
+        while True:
+            data = await asyncio.wait_for(self.ws.recv(), self.timeout)
+            self.received += len(data)
+            fwd = ForwardMsg.FromString(data)
+            kind = fwd.WhichOneof('type')
+            if kind == 'new_session':
+                self.widgets, self.texts = [], []
+            elif kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                self._collect(fwd.delta.new_element)
+            elif kind == 'script_finished':
+                if fwd.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                    return
+                if fwd.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("สคริปต์ Compile ไม่ผ่าน")
+
+    def _collect(self, element):
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            raise RuntimeError(f"{element.exception.type}: {element.exception.message}")
+        if kind in ('button', 'selectbox', 'text_input', 'link_button'):
+            self.widgets.append((kind, getattr(element, kind)))
+        elif kind == 'markdown':
+            self.texts.append(element.markdown.body)
+
+    def _has(self, label):
+        return any(label in w.label for _, w in self.widgets) or any(label in t for t in self.texts)
+
+    def _states_for_click(self, label):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        button = next((w for kind, w in self.widgets if kind == 'button' and label in w.label), None)
+        if button is None:
+            raise RuntimeError(f"ไม่พบปุ่ม '{label}'")
+        states = []
+        for kind, widget in self.widgets:
+            state = WidgetState(id=widget.id)
+            if kind == 'selectbox':
+                state.string_value = widget.options[int(self.rng.integers(len(widget.options)))]
+            elif kind == 'text_input':
+                state.string_value = f'load-test-{self.seed}'
+            else:
+                continue
+            states.append(state)
+        states.append(WidgetState(id=button.id, trigger_value=True))
+        return states
+
+    async def run_flow(self):
+        timings = {}
+        started = time.perf_counter()
+        await self.rerun()
+        timings['landing'] = time.perf_counter() - started
+        self.payload['landing'] = self.received
+        for name, click, expect in FLOW:
+            states = self._states_for_click(click)
+            started = time.perf_counter()
+            await self.rerun(states)
+            timings[name] = time.perf_counter() - started
+            self.payload[name] = self.received
+            if not self._has(expect):
+                raise RuntimeError(f"{name}: ไม่พบ '{expect}' ในหน้าที่ได้")
+        return timings
+
+# ==========================================
+# 3. รันหลาย Session พร้อมกันที่ระดับ Concurrency ต่างๆ
+# ==========================================
+def _percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values, dtype=float) * 1000
+    return {'p50_ms': float(np.percentile(values, 50)), 'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max())}
+
+async def _run_level_async(url, concurrency, sessions, timeout, seed, server_pid):
+    release = asyncio.Event()
+    gate = asyncio.Semaphore(concurrency)
+    done_times = []
+
+    # Session ที่ทำเสร็จแล้วปล่อย slot ทันที แต่ยังไม่ปิด Connection จนกว่าจะวัดหน่วยความจำเสร็จ
+    async def held(i):
+        async with gate:
+            client = SessionClient(url, seed + i, timeout)
+            started = time.perf_counter()
+            try:
+                await client.connect()
+                pages, error = await client.run_flow(), None
+            except Exception as e:
+                pages, error = {}, f"{type(e).__name__}: {e}"
+            payload = dict(client.payload)
+            done_times.append(time.perf_counter())
+            seconds = done_times[-1] - started
+        await release.wait()
+        await client.close()
+        return {'seed': seed + i, 'seconds': seconds, 'pages': pages, 'payload': payload, 'error': error}
+
+    rss_before = _rss_mb(server_pid) if server_pid else None
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(held(i)) for i in range(sessions)]
+    while len(done_times) < sessions:
+        await asyncio.sleep(0.01)
+    elapsed = max(done_times) - started
+    rss_after = _rss_mb(server_pid) if server_pid else None
+    release.set()
+    return await asyncio.gather(*tasks), elapsed, rss_before, rss_after
+
+def run_level(url, concurrency, sessions, timeout=60, seed=0, server_pid=None):
+    results, elapsed, rss_before, rss_after = asyncio.run(
+        _run_level_async(url, concurrency, sessions, timeout, seed, server_pid))
+    completed = [r for r in results if r['error'] is None]
+    errors = [r['error'] for r in results if r['error'] is not None]
+    return {
+        'concurrency': concurrency,
+        'sessions': sessions,
+        'completed': len(completed),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'seconds': elapsed,
+        'sessions_per_sec': len(completed) / elapsed if elapsed > 0 else 0.0,
+        'pages': {name: _percentiles([r['pages'][name] for r in completed if name in r['pages']]) for name in STEPS},
+        # ขนาดข้อมูลที่ Server ส่งให้เบราว์เซอร์ต่อหน้า (เฉลี่ย KB)
+        'payload_kb': {name: float(np.mean([r['payload'][name] for r in completed])) / 1024 if completed else None
+                       for name in STEPS},
+        'server_rss_before_mb': rss_before,
+        'server_rss_after_mb': rss_after,
+        'rss_growth_per_session_kb': (rss_after - rss_before) * 1024 / sessions
+                                     if rss_before is not None and rss_after is not None and sessions else None,
+    }
+
+def run(url, levels, sessions_per_level=None, timeout=60, warmup=True, server_pid=None):
+    if warmup:
+        # Session แรกรอโหลดโมเดล/สร้าง Cache ไม่นับรวมในผล
+        warm = run_level(url, 1, 1, timeout, seed=10 ** 9, server_pid=server_pid)
+        if warm['errors']:
+            raise RuntimeError(f"Session อุ่นเครื่องล้มเหลว: {warm['error_samples'][0]}")
+
+    reports = []
+    for i, concurrency in enumerate(levels):
+        report = run_level(url, concurrency, sessions_per_level or concurrency * 4, timeout,
+                           seed=i * 100000, server_pid=server_pid)
+        reports.append(report)
+        dashboard = report['pages']['dashboard'] or {}
+        growth = report['rss_growth_per_session_kb']
+        payload = sum(kb or 0.0 for kb in report['payload_kb'].values())
+        print(f"concurrency {concurrency:>3}: {report['sessions_per_sec']:.2f} sessions/s | "
+              f"dashboard p50 {dashboard.get('p50_ms', float('nan')):.0f} ms p99 {dashboard.get('p99_ms', float('nan')):.0f} ms | "
+              f"{payload:.0f} KB/session | "
+              f"RSS {'-' if growth is None else f'{growth:+.0f}'} KB/session | ผิดพลาด {report['errors']}",
+              file=sys.stderr)
+    return reports
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: Load Test หน้าเว็บหลาย Session พร้อมกัน (ทำงานบนเครื่องอย่างเดียว)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="จำนวน Session พร้อมกันที่จะทดสอบ")
+    parser.add_argument('--sessions', type=int, default=None, help="จำนวน Session ต่อระดับ (ค่าเริ่มต้น = concurrency x 4)")
+    parser.add_argument('--timeout', type=float, default=60, help="เวลาสูงสุดต่อการแสดงผล 1 หน้า (วินาที)")
+    parser.add_argument('--url', default=None, help="ทดสอบ Server ที่เปิดอยู่แล้ว เช่น http://127.0.0.1:8501 (ค่าเริ่มต้น = เปิด Server ใหม่)")
+    parser.add_argument('--server-pid', type=int, default=None, help="pid ของ Server ที่เปิดอยู่แล้ว (สำหรับวัดหน่วยความจำ)")
+    parser.add_argument('--no-warmup', action='store_true', help="นับ Session แรก (โหลดโมเดล) รวมในผลด้วย")
+    parser.add_argument('-o', '--output', default=None, help="บันทึกผลเป็นไฟล์ JSON")
+    args = parser.parse_args(argv)
+
+    if args.url and not args.url.startswith(('http://127.0.0.1', 'http://localhost')):
+        parser.error("ทดสอบได้เฉพาะ Server บน localhost")
+
+    proc = None
+    url, server_pid = args.url, args.server_pid
+    if url is None:
+        proc, url = start_server()
+        server_pid = proc.pid
+    try:
+        reports = run(url, args.concurrency, args.sessions, args.timeout, not args.no_warmup, server_pid)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'cpu_count': os.cpu_count(), 'levels': reports},
+                      f, indent=1, ensure_ascii=False)
+        print(f"บันทึกผลที่ {args.output}", file=sys.stderr)
+    return 1 if any(r['errors'] for r in reports) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+# ==========================================
+# วัด/จำกัดหน่วยความจำของโมเดลพยากรณ์ (หลาย Replica ต่อเครื่อง = หน่วยความจำคือตัวจำกัด)
+# ==========================================
+# FINCHECK_MEMORY_BUDGET_MB = งบหน่วยความจำของ AutoGluon ต่อ Process (ว่าง = โหลด Ensemble เต็มแบบเดิม)
+#   เลือกโมเดลที่คะแนน Validation ดีที่สุดที่ "โมเดลที่ต้องใช้ทั้งสาย + ไลบรารีที่ต้อง import" ไม่เกินงบ
+#   แล้วโหลดเข้าหน่วยความจำเฉพาะโมเดลในสายนั้น (ไลบรารีของโมเดลที่ไม่ได้ใช้ เช่น torch ไม่ถูก import เลย)
+# รายงานตอนเริ่ม: RSS ที่เพิ่มขึ้นต่อไลบรารี (ตอน import) และต่อโมเดล (ตอนโหลดเข้าหน่วยความจำ)
+BUDGET_ENV = 'FINCHECK_MEMORY_BUDGET_MB'
+LIBRARY_COST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'library_rss.json')
+
+# ชื่อโมเดล AutoGluon (ขึ้นต้นด้วย) -> ไลบรารีที่ต้อง import
+MODEL_LIBRARIES = (
+    ('LightGBM', ('lightgbm',)),
+    ('CatBoost', ('catboost',)),
+    ('XGBoost', ('xgboost',)),
+    ('NeuralNetTorch', ('torch',)),
+    ('NeuralNetFastAI', ('torch', 'fastai')),
+    ('RandomForest', ('sklearn',)),
+    ('ExtraTrees', ('sklearn',)),
+    ('KNeighbors', ('sklearn',)),
+    ('LinearModel', ('sklearn',)),
+    ('WeightedEnsemble', ()),
+)
+BASELINE_MODULES = ('numpy', 'pandas')
+
+def budget_from_env():
+    value = os.environ.get(BUDGET_ENV)
+    return float(value) if value else None
+
+def rss_mb():
+    # หน่วยความจำที่ใช้อยู่จริงตอนนี้ (Linux: /proc) คืนค่า None ถ้าวัดไม่ได้
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _delta(before):
+    after = rss_mb()
+    return None if before is None or after is None else max(0.0, after - before)
+
+def model_libraries(name):
+    for prefix, libraries in MODEL_LIBRARIES:
+        if name.startswith(prefix):
+            return libraries
+    return ()
+
+def import_libraries(libraries, report=None):
+    # import ทีละไลบรารีพร้อมวัด RSS ที่เพิ่มขึ้น (ไลบรารีที่ import ไปแล้วนับเป็น 0)
+    for name in libraries:
+        if name in sys.modules:
+            continue
+        before = rss_mb()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        if report is not None:
+            report.setdefault('libraries', {})[name] = _delta(before)
+
+# ==========================================
+# 1. ค่าหน่วยความจำของแต่ละไลบรารี (วัดใน Process แยกครั้งเดียวต่อรุ่นไลบรารี แล้ว Cache ไว้)
+# ==========================================
+_MEASURE_SCRIPT = """
+import importlib, json, os, sys
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+for name in {baseline!r}:
+    importlib.import_module(name)
+before = rss()
+importlib.import_module(sys.argv[1])
+print(json.dumps(rss() - before))
+"""
+
+def _library_version(name):
+    try:
+        return metadata.version('scikit-learn' if name == 'sklearn' else name)
+    except metadata.PackageNotFoundError:
+        return None
+
+def library_costs(libraries, cache_path=LIBRARY_COST_FILE):
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    costs, changed = {}, False
+    for name in libraries:
+        key = f'{name}=={_library_version(name)}'
+        if key not in cache:
+            script = _MEASURE_SCRIPT.format(baseline=BASELINE_MODULES)
+            try:
+                out = subprocess.run([sys.executable, '-c', script, name], capture_output=True, text=True,
+                                     timeout=300, check=True).stdout
+                cache[key] = float(json.loads(out))
+            except (OSError, ValueError, subprocess.SubprocessError):
+                cache[key] = 0.0 # วัดไม่ได้ (เช่น ไม่ใช่ Linux / ไม่ได้ติดตั้ง) นับเป็น 0
+            changed = True
+        costs[name] = cache[key]
+    if changed:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    return costs
+
+# ==========================================
+# 2. เลือกโมเดลที่ดีที่สุดที่ไม่เกินงบ แล้วโหลดเฉพาะสายนั้น
+# ==========================================
+def _dir_mb(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / (1 << 20)
+
+def model_size_mb(predictor, name):
+    # ขนาดไฟล์ของโมเดล (pickle/น้ำหนัก) ใช้ประมาณหน่วยความจำเมื่อโหลด
+    return _dir_mb(os.path.join(predictor.path, 'models', name))
+
+def plan(predictor, budget_mb, lib_costs=None):
+    board = predictor.leaderboard(silent=True)
+    trainer = predictor._trainer
+    chains = {name: list(trainer.get_minimum_model_set(name)) for name in board['model']}
+    all_libraries = sorted({lib for chain in chains.values() for m in chain for lib in model_libraries(m)})
+    lib_costs = lib_costs if lib_costs is not None else library_costs(all_libraries)
+    sizes = {}
+
+    candidates = []
+    for row in board.itertuples(index=False):
+        if hasattr(row, 'can_infer') and not row.can_infer:
+            continue
+        chain = chains[row.model]
+        for m in chain:
+            if m not in sizes:
+                sizes[m] = model_size_mb(predictor, m)
+        libraries = sorted({lib for m in chain for lib in model_libraries(m)})
+        estimate = sum(sizes[m] for m in chain) + sum(lib_costs.get(lib, 0.0) for lib in libraries)
+        candidates.append({'model': row.model, 'score_val': float(row.score_val), 'models': chain,
+                           'libraries': libraries, 'estimate_mb': estimate})
+
+    fitting = [c for c in candidates if c['estimate_mb'] <= budget_mb]
+    if fitting:
+        chosen = max(fitting, key=lambda c: (c['score_val'], -c['estimate_mb']))
+    else:
+        # ไม่มีโมเดลไหนพอดีงบ -> ใช้ตัวที่เล็กที่สุด (ดีกว่าโหลดไม่ได้เลย)
+        chosen = min(candidates, key=lambda c: c['estimate_mb'])
+        print(f"[memory] ไม่มีโมเดลที่ใช้หน่วยความจำไม่เกิน {budget_mb:.0f} MB ใช้ {chosen['model']} "
+              f"(~{chosen['estimate_mb']:.0f} MB) แทน", file=sys.stderr)
+    best = max(candidates, key=lambda c: c['score_val'])
+    return dict(chosen, best_model=best['model'], best_score_val=best['score_val'], best_estimate_mb=best['estimate_mb'])
+
+def load_within_budget(predictor, budget_mb, report=None):
+    chosen = plan(predictor, budget_mb)
+    # หน้าเว็บ/Batch เรียก predict_proba โดยไม่ระบุ model -> ใช้ model_best ที่ตั้งไว้ตรงนี้
+    predictor.set_model_best(chosen['model'], save_trainer=False)
+    import_libraries(chosen['libraries'], report)
+    for name in chosen['models']:
+        before = rss_mb()
+        predictor.persist(models=[name], with_ancestors=False)
+        if report is not None:
+            report.setdefault('models', {})[name] = _delta(before)
+    if report is not None:
+        report.update({'budget_mb': budget_mb, 'chosen': chosen['model'], 'estimate_mb': chosen['estimate_mb'],
+                       'score_val': chosen['score_val'], 'best_model': chosen['best_model'],
+                       'best_score_val': chosen['best_score_val'], 'best_estimate_mb': chosen['best_estimate_mb']})
+    return chosen
+
+# ==========================================
+# 3. รายงาน
+# ==========================================
+def format_report(report):
+    def mb(value):
+        return '?' if value is None else f'{value:.0f} MB'
+
+    parts = [f"RSS {mb(report.get('rss_mb'))}"]
+    if report.get('chosen'):
+        parts.append(f"งบ {report['budget_mb']:.0f} MB -> {report['chosen']} (val {report['score_val']:.4f}, "
+                     f"ประมาณ {report['estimate_mb']:.0f} MB; Ensemble ดีที่สุด {report['best_model']} "
+                     f"val {report['best_score_val']:.4f} ประมาณ {report['best_estimate_mb']:.0f} MB)")
+    if report.get('libraries'):
+        parts.append('ไลบรารี: ' + ', '.join(f'{name} {mb(v)}' for name, v in report['libraries'].items()))
+    if report.get('models'):
+        parts.append('โมเดล: ' + ', '.join(f'{name} {mb(v)}' for name, v in report['models'].items()))
+    return ' | '.join(parts)
+
+def main(argv=None):
+    import argparse
+
+    import scoring
+
+    parser = argparse.ArgumentParser(description="SME FinCheck: รายงานหน่วยความจำของโมเดลพยากรณ์ (ใช้งบตาม FINCHECK_MEMORY_BUDGET_MB)")
+    parser.add_argument('--base-dir', default=scoring.BASE_DIR)
+    parser.add_argument('--budget-mb', type=float, default=None, help="งบหน่วยความจำ (แทนค่าใน FINCHECK_MEMORY_BUDGET_MB)")
+    args = parser.parse_args(argv)
+    if args.budget_mb is not None:
+        os.environ[BUDGET_ENV] = str(args.budget_mb)
+
+    memory = {}
+    started = time.perf_counter()
+    resources = scoring.load_artifacts(args.base_dir, memory=memory)
+    print(f"โหลดโมเดลรุ่น {resources.version} ใน {time.perf_counter() - started:.2f}s | {format_report(memory)}",
+          file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# รวมคำขอพยากรณ์จากหลาย Session เป็น Batch เดียว (เรียก predict_proba ครั้งเดียวต่อหลายแถว)
+# ==========================================
+WINDOW_ENV = 'FINCHECK_BATCH_WINDOW_MS'   # เวลารอคำขอถัดไปหลังคำขอแรกมาถึง (0 = รวมเฉพาะที่รออยู่แล้ว)
+MAX_BATCH_ENV = 'FINCHECK_BATCH_MAX'      # จำนวนแถวสูงสุดต่อ Batch (1 = ไม่รวม)
+MAX_QUEUE_ENV = 'FINCHECK_BATCH_QUEUE'    # จำนวนคำขอที่รอได้ เกินนี้ปฏิเสธทันที (Backpressure)
+TIMEOUT_ENV = 'FINCHECK_BATCH_TIMEOUT'    # วินาทีที่ผู้ใช้รอผลได้
+
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_QUEUE = 1024
+DEFAULT_TIMEOUT = 10.0
+
+# ช่วงของขนาด Batch สำหรับ Histogram (1, 2, 3-4, 5-8, ...)
+_HIST_EDGES = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+_HIST_KEYS = [f'<={edge}' for edge in _HIST_EDGES] + [f'>{_HIST_EDGES[-1]}']
+
+class QueueFullError(RuntimeError):
+    pass
+
+class _Request:
+    __slots__ = ('answers', 'future', 'enqueued')
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+def _bucket(rows):
+    for edge in _HIST_EDGES:
+        if rows <= edge:
+            return f'<={edge}'
+    return f'>{_HIST_EDGES[-1]}'
+
+class MicroBatcher:
+    def __init__(self, predict_fn, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                 max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_TIMEOUT, log_every=1000):
+        # predict_fn(answers DataFrame) -> array ความน่าจะเป็นเรียงตามแถว
+        self.predict_fn = predict_fn
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        self.log_every = log_every
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._delays = deque(maxlen=10000)
+        self._sizes = Counter()
+        self.counters = {'requests': 0, 'batches': 0, 'rows': 0, 'rejected': 0, 'timed_out': 0,
+                         'cancelled': 0, 'errors': 0, 'predict_seconds': 0.0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, predict_fn):
+        return cls(predict_fn,
+                   window_ms=float(os.environ.get(WINDOW_ENV, DEFAULT_WINDOW_MS)),
+                   max_batch=int(os.environ.get(MAX_BATCH_ENV, DEFAULT_MAX_BATCH)),
+                   max_queue=int(os.environ.get(MAX_QUEUE_ENV, DEFAULT_MAX_QUEUE)),
+                   timeout=float(os.environ.get(TIMEOUT_ENV, DEFAULT_TIMEOUT)))
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    # ---------- ฝั่ง Session ----------
+    def submit(self, answers):
+        if self._closed:
+            raise RuntimeError("ตัวรวม Batch ถูกปิดแล้ว")
+        request = _Request(answers)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            self._count('rejected')
+            raise QueueFullError("ขณะนี้มีผู้ใช้งานจำนวนมาก กรุณาลองใหม่อีกครั้งในอีกสักครู่")
+        self._count('requests')
+        return request.future
+
+    def predict(self, answers, timeout=None):
+        future = self.submit(answers)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            # ยกเลิกถ้ายังไม่ได้เริ่มพยากรณ์ (Worker จะข้ามคำขอนี้ไป)
+            future.cancel()
+            self._count('timed_out')
+            raise TimeoutError("ระบบพยากรณ์ตอบกลับช้ากว่าที่กำหนด กรุณาลองใหม่อีกครั้ง")
+
+    # ---------- ฝั่ง Worker ----------
+    def _collect(self, first):
+        batch, rows = [first], len(first.answers)
+        deadline = time.monotonic() + self.window
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None) # ส่งต่อสัญญาณปิดให้รอบถัดไป
+                break
+            batch.append(request)
+            rows += len(request.answers)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._process(self._collect(first))
+
+    def _process(self, batch):
+        # คำขอที่ผู้ใช้เลิกรอแล้ว (timeout) ไม่ต้องพยากรณ์
+        live = [r for r in batch if r.future.set_running_or_notify_cancel()]
+        if len(live) < len(batch):
+            self._count('cancelled', len(batch) - len(live))
+        if not live:
+            return
+
+        now = time.monotonic()
+        started = time.perf_counter()
+        try:
+            stacked = pd.concat([r.answers for r in live], ignore_index=True) if len(live) > 1 else live[0].answers
+            prob = np.asarray(self.predict_fn(stacked), dtype=float).reshape(-1)
+            if len(prob) != len(stacked):
+                raise RuntimeError(f"โมเดลคืนค่า {len(prob)} แถว แต่ส่งไป {len(stacked)} แถว")
+        except Exception as e:
+            self._count('errors', len(live))
+            for request in live:
+                request.future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - started
+
+        offset = 0
+        for request in live:
+            n = len(request.answers)
+            request.future.set_result(prob[offset:offset + n])
+            offset += n
+
+        with self._lock:
+            self._delays.extend(now - r.enqueued for r in live)
+            self._sizes[_bucket(len(stacked))] += 1
+            self.counters['batches'] += 1
+            self.counters['rows'] += len(stacked)
+            self.counters['predict_seconds'] += elapsed
+            batches = self.counters['batches']
+        if self.log_every and batches % self.log_every == 0:
+            print(f"[batcher] {self.format_stats()}")
+
+    # ---------- Metrics ----------
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            delays = np.asarray(self._delays, dtype=float) * 1000
+            stats['batch_size_hist'] = {k: self._sizes[k] for k in sorted(self._sizes, key=_HIST_KEYS.index)}
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_batch_rows'] = stats['rows'] / stats['batches'] if stats['batches'] else 0.0
+        stats['queue_delay_p50_ms'] = float(np.percentile(delays, 50)) if len(delays) else 0.0
+        stats['queue_delay_p99_ms'] = float(np.percentile(delays, 99)) if len(delays) else 0.0
+        return stats
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"{s['requests']:,} คำขอ / {s['batches']:,} batch (เฉลี่ย {s['avg_batch_rows']:.1f} แถว) | "
+                f"รอคิว p50 {s['queue_delay_p50_ms']:.1f} ms p99 {s['queue_delay_p99_ms']:.1f} ms | "
+                f"ปฏิเสธ {s['rejected']} หมดเวลา {s['timed_out']} ผิดพลาด {s['errors']}")
+
+    def close(self, timeout=None):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
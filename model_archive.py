@@ -0,0 +1,234 @@
+import argparse
+import bisect
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+try:
+    import fcntl
+except ImportError: # Windows: ไม่มี flock ทำงานแบบไม่ล็อก
+    fcntl = None
+
+# ==========================================
+# 1. ค่าคงที่ของไฟล์โมเดล AutoGluon ที่แบ่งเป็นหลาย Part
+# ==========================================
+PART_PREFIX = 'model_part_'
+MANIFEST_FILE = 'model_manifest.json'
+EXTRACT_DIR = 'autogluon_model_extracted'
+STAMP_FILE = '.extracted_from'
+BLOCK_SIZE = 1 << 20
+UNVERIFIED_ENV = 'FINCHECK_ALLOW_UNVERIFIED_MODEL'  # '1' = ยอมแตกไฟล์ Part ที่ไม่มี Manifest (ไม่ตรวจ SHA-256)
+
+def list_parts(base_dir):
+    return sorted(f for f in os.listdir(base_dir) if f.startswith(PART_PREFIX))
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ==========================================
+# 2. อ่านไฟล์ Part ต่อกันเป็นไฟล์เดียว (ไม่ต้องเขียน full_model_combined.zip)
+# ==========================================
+class ConcatenatedParts(io.RawIOBase):
+    # ไฟล์อ่านอย่างเดียวที่ seek ได้ ให้ zipfile อ่าน Part ทั้งหมดเหมือนเป็น Zip ไฟล์เดียว
+    def __init__(self, paths):
+        self._files = [open(p, 'rb') for p in paths]
+        self._starts = []
+        total = 0
+        for f in self._files:
+            self._starts.append(total)
+            total += os.fstat(f.fileno()).st_size
+        self._size = total
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"whence ไม่ถูกต้อง: {whence}")
+        if pos < 0:
+            raise ValueError("ตำแหน่ง seek ติดลบ")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        written = 0
+        while written < len(view) and self._pos < self._size:
+            index = bisect.bisect_right(self._starts, self._pos) - 1
+            f = self._files[index]
+            f.seek(self._pos - self._starts[index])
+            n = f.readinto(view[written:])
+            if not n:
+                break
+            written += n
+            self._pos += n
+        return written
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        super().close()
+
+# ==========================================
+# 3. Manifest (ค่า SHA-256 ของแต่ละ Part)
+# ==========================================
+def build_manifest(base_dir):
+    parts = list_parts(base_dir)
+    return {'parts': [{'name': p, 'sha256': _sha256(os.path.join(base_dir, p))} for p in parts]}
+
+def manifest_digest(manifest):
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()
+
+def load_manifest(base_dir):
+    path = os.path.join(base_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def verify_parts(base_dir, manifest):
+    expected = [p['name'] for p in manifest['parts']]
+    found = list_parts(base_dir)
+    if found != expected:
+        raise ValueError(f"ไฟล์ Part ไม่ตรงกับ {MANIFEST_FILE}: พบ {found} แต่ต้องการ {expected}")
+    for part in manifest['parts']:
+        if _sha256(os.path.join(base_dir, part['name'])) != part['sha256']:
+            raise ValueError(f"ไฟล์ {part['name']} เสียหาย (SHA-256 ไม่ตรงกับ {MANIFEST_FILE})")
+
+# ==========================================
+# 4. แตกไฟล์แบบปลอดภัยเมื่อหลาย Replica ใช้ Volume เดียวกัน
+# ==========================================
+class _FileLock:
+    def __init__(self, path):
+        self._path = path
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self._path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX) # Process อื่นจะรอตรงนี้จนกว่าจะแตกไฟล์เสร็จ
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+        self._f.close()
+
+def _read_stamp(extract_path):
+    try:
+        with open(os.path.join(extract_path, STAMP_FILE), encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _is_current(extract_path, digest):
+    if not os.path.isdir(extract_path):
+        return False
+    # ไม่มี Manifest (ไม่มีไฟล์ Part หรือตั้ง FINCHECK_ALLOW_UNVERIFIED_MODEL) = ตรวจไม่ได้ ใช้โฟลเดอร์เดิมต่อ / มี Manifest ต้องมี Stamp ตรงกันเท่านั้น
+    # (โฟลเดอร์ที่ไม่มี Stamp อาจแตกไม่ครบหรือแตกด้วยวิธีเก่า -> แตกใหม่ครั้งเดียวแล้วมี Stamp)
+    if digest is None:
+        return True
+    return _read_stamp(extract_path) == digest
+
+def ensure_extracted(base_dir):
+    # คืนค่า path ของโฟลเดอร์โมเดลที่แตกแล้ว หรือ None ถ้าไม่มีทั้งโฟลเดอร์และไฟล์ Part
+    extract_path = os.path.join(base_dir, EXTRACT_DIR)
+    parts = list_parts(base_dir)
+    manifest = load_manifest(base_dir) if parts else None
+    if parts and manifest is None:
+        # มีไฟล์ Part ต้องมี Manifest เสมอ (ไฟล์ที่ Upload ไม่ครบ/เสียหายจะถูกแตกและโหลดโดยไม่มีใครรู้)
+        if os.environ.get(UNVERIFIED_ENV, '0') != '1':
+            raise FileNotFoundError(
+                f"ไม่พบ {MANIFEST_FILE} สำหรับไฟล์ {PART_PREFIX}* กรุณารัน python model_archive.py manifest "
+                f"บนเครื่องที่มีไฟล์ Part ที่ถูกต้อง แล้ว Commit {MANIFEST_FILE} "
+                f"(หรือตั้ง {UNVERIFIED_ENV}=1 เพื่อแตกไฟล์โดยไม่ตรวจสอบ)")
+        print(f"[model] ไม่พบ {MANIFEST_FILE} และตั้ง {UNVERIFIED_ENV}=1 จะแตกไฟล์โดยไม่ตรวจสอบ SHA-256",
+              file=sys.stderr)
+    digest = manifest_digest(manifest) if manifest is not None else None
+
+    if _is_current(extract_path, digest):
+        return extract_path
+    if not parts:
+        return None
+
+    with _FileLock(extract_path + '.lock'):
+        # อาจมี Process อื่นแตกไฟล์เสร็จระหว่างที่รอ Lock อยู่
+        if _is_current(extract_path, digest):
+            return extract_path
+
+        if manifest is not None:
+            verify_parts(base_dir, manifest)
+
+        tmp_path = tempfile.mkdtemp(prefix=EXTRACT_DIR + '.tmp-', dir=base_dir)
+        try:
+            with ConcatenatedParts([os.path.join(base_dir, p) for p in parts]) as raw:
+                with zipfile.ZipFile(io.BufferedReader(raw, BLOCK_SIZE), 'r') as zip_ref:
+                    zip_ref.extractall(tmp_path)
+            if digest is not None:
+                with open(os.path.join(tmp_path, STAMP_FILE), 'w', encoding='utf-8') as f:
+                    f.write(digest)
+
+            # เปลี่ยนชื่อเข้าที่ทีเดียว ไม่มีทางเหลือโฟลเดอร์ที่แตกไม่ครบ
+            # การแทนที่โฟลเดอร์เดิมใช้ rename 2 ครั้ง ระหว่างนั้นไม่มีโฟลเดอร์อยู่ชั่วครู่: Process ที่ตรวจในช่วงนั้น
+            # เห็นว่าไม่มี -> รอ Lock นี้ แล้วได้โฟลเดอร์ใหม่ แต่ Process ที่กำลังโหลดจากโฟลเดอร์เดิมอยู่อาจโหลดไม่ครบ
+            # (เกิดเฉพาะเมื่อเปลี่ยนไฟล์ Part ขณะ Replica อื่นทำงานอยู่ การเปลี่ยนรุ่นระหว่างทำงานให้ใช้ model_registry.py)
+            if os.path.exists(extract_path):
+                old_path = tempfile.mkdtemp(prefix=EXTRACT_DIR + '.old-', dir=base_dir)
+                os.replace(extract_path, os.path.join(old_path, EXTRACT_DIR))
+                os.replace(tmp_path, extract_path)
+                shutil.rmtree(old_path, ignore_errors=True)
+            else:
+                os.replace(tmp_path, extract_path)
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return extract_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="จัดการไฟล์โมเดล AutoGluon (model_part_*)")
+    parser.add_argument('command', choices=['manifest', 'verify', 'extract'],
+                        help="manifest = สร้าง model_manifest.json, verify = ตรวจ SHA-256, extract = แตกไฟล์")
+    parser.add_argument('--base-dir', default=os.path.dirname(os.path.abspath(__file__)))
+    args = parser.parse_args(argv)
+
+    if args.command == 'manifest':
+        manifest = build_manifest(args.base_dir)
+        with open(os.path.join(args.base_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        print(f"บันทึก {MANIFEST_FILE} ({len(manifest['parts'])} Part)", file=sys.stderr)
+    elif args.command == 'verify':
+        manifest = load_manifest(args.base_dir)
+        if manifest is None:
+            print(f"ไม่พบ {MANIFEST_FILE}", file=sys.stderr)
+            return 1
+        verify_parts(args.base_dir, manifest)
+        print("ไฟล์ Part ครบและถูกต้อง", file=sys.stderr)
+    else:
+        print(ensure_extracted(args.base_dir))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
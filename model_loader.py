@@ -0,0 +1,134 @@
+import threading
+import time
+import weakref
+
+import memory_budget
+import model_registry
+import scoring
+
+# ==========================================
+# โหลดโมเดลใน Thread เบื้องหลัง (หน้า Landing/แบบฟอร์มแสดงผลได้ทันที)
+# ==========================================
+# มี Registry (model_registry.py) และเลือกรุ่นไว้แล้ว -> โหลดรุ่นที่ ACTIVE ชี้อยู่ แล้วคอยตรวจ ACTIVE ต่อ
+# เมื่อรุ่นเปลี่ยน: โหลด + ทดสอบรุ่นใหม่เบื้องหลัง (Session ยังใช้รุ่นเดิมได้ตามปกติ) ผ่านแล้วค่อยสลับ
+# Session ที่กำลังประเมินอยู่ถือรุ่นเดิมไว้จนจบรอบ รุ่นเดิมถูกปล่อยเมื่อไม่มีใครอ้างถึง
+class BackgroundLoader:
+    def __init__(self, base_dir=scoring.BASE_DIR, registry=None, poll=None):
+        self.base_dir = base_dir
+        self.registry = registry if registry is not None else model_registry.registry_from_env()
+        self.poll = model_registry.poll_from_env() if poll is None else poll
+        self.timings = {}
+        self.memory = {} # RSS ต่อไลบรารี/โมเดลตอนโหลดรุ่นล่าสุด (memory_budget.format_report)
+        self.bundle = None # รุ่นใน Registry ที่ใช้อยู่ (None = ไฟล์ในโฟลเดอร์โปรเจกต์)
+        self.switches = 0
+        self.last_error = None
+        self._resources = None
+        self._texts = {} # ข้อความคำแนะนำของทุกรุ่นที่เคยใช้ใน Process นี้ (ผลเดิมแสดงข้อความของรุ่นที่ให้คะแนน)
+        self._error = None
+        self._failed = None # รุ่นที่ทดสอบไม่ผ่าน (ไม่ลองซ้ำจนกว่า ACTIVE จะเปลี่ยน)
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+        self._thread.start()
+
+    def _load(self, bundle, timings, memory):
+        if bundle is None:
+            return scoring.load_artifacts(self.base_dir, timings=timings, memory=memory)
+        resources = model_registry.load_bundle(self.registry, bundle, timings=timings, memory=memory)
+        timings['smoke_test'] = model_registry.smoke_test(resources)
+        return resources
+
+    def _install(self, resources, bundle):
+        previous = self._resources
+        self._texts[resources.version] = resources.texts
+        self._resources = resources # สลับทีเดียว Session ถัดไปได้รุ่นใหม่ทันที
+        self.bundle = bundle
+        if previous is not None:
+            self.switches += 1
+            weakref.finalize(previous.kmeans, print, f"[registry] ปล่อยโมเดลรุ่น {previous.version} แล้ว")
+
+    def _run(self):
+        self._load_initial()
+        if self.registry:
+            # ตรวจ ACTIVE ต่อแม้โหลดครั้งแรกไม่สำเร็จ (เปิดใช้รุ่นที่แก้แล้วได้โดยไม่ต้อง Restart ทุก Worker)
+            self._watch()
+
+    def _load_initial(self):
+        self.timings, self.memory = {}, {}
+        started = time.perf_counter()
+        bundle = model_registry.active_version(self.registry) if self.registry else None
+        try:
+            try:
+                self._install(self._load(bundle, self.timings, self.memory), bundle)
+            except Exception as e:
+                if bundle is None:
+                    raise
+                # รุ่นใน Registry ใช้ไม่ได้ตั้งแต่เปิด -> ใช้ไฟล์ในโฟลเดอร์โปรเจกต์ไปก่อน
+                print(f"[registry] โหลดรุ่น {bundle} ไม่สำเร็จ ({e}) ใช้โมเดลในโฟลเดอร์โปรเจกต์แทน")
+                self._failed, self.last_error = bundle, str(e)
+                self._install(scoring.load_artifacts(self.base_dir, timings=self.timings, memory=self.memory), None)
+        except Exception as e:
+            if self._resources is None: # Thread ตรวจ Registry อาจติดตั้งรุ่นที่ใช้ได้ไปแล้วระหว่างลองใหม่
+                self._error = e
+        finally:
+            self.timings['total'] = time.perf_counter() - started
+            self._done.set()
+            print(f"[startup] โหลดโมเดล: {self.format_timings()}")
+            print(f"[memory] {memory_budget.format_report(self.memory)}")
+
+    def _watch(self):
+        while not self._stop.wait(self.poll):
+            bundle = model_registry.active_version(self.registry)
+            if bundle is None or bundle == self.bundle or bundle == self._failed:
+                continue
+            timings, memory = {}, {}
+            started = time.perf_counter()
+            try:
+                resources = self._load(bundle, timings, memory)
+            except Exception as e:
+                self._failed, self.last_error = bundle, str(e)
+                print(f"[registry] รุ่น {bundle} ใช้ไม่ได้ ({e}) ใช้รุ่น {self.bundle or 'เดิม'} ต่อ")
+                continue
+            self._failed = self.last_error = None
+            self._install(resources, bundle)
+            self.memory = memory
+            self._error = None # โหลดครั้งแรกไม่สำเร็จ -> รุ่นนี้ใช้แทนได้ทันที
+            self._done.set()
+            print(f"[registry] สลับเป็นรุ่น {bundle} (โมเดลรุ่น {resources.version}) ใน "
+                  f"{time.perf_counter() - started:.2f}s: "
+                  + ' | '.join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+                  + f" | {memory_budget.format_report(memory)}")
+
+    def ready(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        # รอจนกว่าจะโหลดเสร็จ (ใช้ตอนกดประเมินผลเท่านั้น) คืนค่ารุ่นล่าสุดที่ผ่านการทดสอบ
+        if not self._done.wait(timeout):
+            raise TimeoutError("โหลดโมเดลยังไม่เสร็จ")
+        error = self._error
+        if error is not None:
+            self._retry()
+            raise error
+        return self._resources
+
+    def _retry(self):
+        # โหลดครั้งแรกไม่สำเร็จ (เช่น ไฟล์ Part เสีย) -> เริ่มโหลดใหม่เบื้องหลัง ครั้งถัดไปที่เรียก result() รอผลรอบใหม่
+        # (เหมือน st.cache_resource ที่ไม่ Cache ข้อผิดพลาด แก้ไฟล์แล้วไม่ต้อง Restart Process)
+        with self._lock:
+            if self._error is None or not self._done.is_set():
+                return # มีรอบใหม่กำลังโหลดอยู่แล้ว
+            self._error = None
+            self._done.clear()
+        threading.Thread(target=self._load_initial, name='model-loader-retry', daemon=True).start()
+
+    def texts(self, version):
+        # ข้อความคำแนะนำของรุ่นที่ให้ผลนั้น (None = ข้อความเริ่มต้น)
+        return self._texts.get(version)
+
+    def close(self):
+        self._stop.set()
+
+    def format_timings(self):
+        return ' | '.join(f"{stage} {seconds:.2f}s" for stage, seconds in self.timings.items())
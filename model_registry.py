@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import cluster_lookup
+import compiled_model
+import feature_schema
+import model_archive
+import recommendations
+import scoring
+
+# ==========================================
+# Registry ของชุดโมเดล (เปลี่ยนรุ่นโมเดลโดยไม่ต้อง Restart หน้าเว็บ)
+# ==========================================
+# registry/
+#   bundles/<รุ่น>/   ชุดโมเดลที่เผยแพร่แล้ว ห้ามแก้ (ชื่อรุ่น = hash ของไฟล์ทั้งหมดในชุด)
+#                     scaler / K-Means / ตาราง DNA / Schema / ตารางแปลงคะแนน / AutoGluon (model_part_*)
+#                     หรือรุ่น compiled / ข้อความคำแนะนำ (recommendations.json) / bundle.json
+#   ACTIVE            ชื่อรุ่นที่ใช้งานอยู่ (เขียนใหม่ทั้งไฟล์ด้วย os.replace ไม่มีสถานะครึ่งๆ กลางๆ)
+#   history.log       ประวัติการเปลี่ยนรุ่น (ใช้ rollback)
+# หน้าเว็บ (model_loader.BackgroundLoader) ตรวจ ACTIVE เป็นระยะ -> โหลด + ทดสอบรุ่นใหม่เบื้องหลัง -> สลับทันที
+REGISTRY_ENV = 'FINCHECK_REGISTRY'        # ว่าง = ไม่ใช้ Registry (โหลดไฟล์ในโฟลเดอร์โปรเจกต์แบบเดิม)
+POLL_ENV = 'FINCHECK_REGISTRY_POLL'       # วินาทีระหว่างการตรวจ ACTIVE
+DEFAULT_REGISTRY = os.path.join(scoring.BASE_DIR, 'registry')
+DEFAULT_POLL = 5.0
+
+BUNDLES_DIR = 'bundles'
+ACTIVE_FILE = 'ACTIVE'
+HISTORY_FILE = 'history.log'
+BUNDLE_MANIFEST = 'bundle.json'
+
+BUNDLE_FILES = (cluster_lookup.KMEANS_FILE, cluster_lookup.SCALER_FILE, cluster_lookup.TABLE_FILE,
+                cluster_lookup.META_FILE, feature_schema.SCHEMA_FILE, scoring.CALIBRATION_FILE,
+                model_archive.MANIFEST_FILE, recommendations.TEXTS_FILE)
+REQUIRED_FILES = (cluster_lookup.KMEANS_FILE, cluster_lookup.SCALER_FILE)
+
+def registry_from_env():
+    path = os.environ.get(REGISTRY_ENV, DEFAULT_REGISTRY)
+    return path or None
+
+def poll_from_env():
+    return float(os.environ.get(POLL_ENV, DEFAULT_POLL))
+
+def bundle_dir(registry, version):
+    return os.path.join(registry, BUNDLES_DIR, version)
+
+def active_version(registry):
+    # คืนค่า None ถ้ายังไม่เคยเลือกรุ่น (หรือไม่มี Registry)
+    try:
+        with open(os.path.join(registry, ACTIVE_FILE), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def read_manifest(registry, version):
+    with open(os.path.join(bundle_dir(registry, version), BUNDLE_MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+def list_bundles(registry):
+    root = os.path.join(registry, BUNDLES_DIR)
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for name in os.listdir(root):
+        if os.path.exists(os.path.join(root, name, BUNDLE_MANIFEST)):
+            manifests.append(read_manifest(registry, name))
+    return sorted(manifests, key=lambda m: m['created'])
+
+# ==========================================
+# 1. เผยแพร่ชุดโมเดล (คัดลอกไฟล์เข้า Registry ครั้งเดียว แล้วไม่แก้อีก)
+# ==========================================
+def _bundle_sources(source_dir, variant):
+    # คืนค่า [(path ในชุดโมเดล, path ต้นทาง)]
+    sources = [(name, os.path.join(source_dir, name)) for name in BUNDLE_FILES
+               if os.path.exists(os.path.join(source_dir, name))]
+    sources += [(name, os.path.join(source_dir, name)) for name in model_archive.list_parts(source_dir)]
+    if variant and variant != 'full':
+        variant_dir = os.path.join(source_dir, scoring.VARIANTS_DIR, variant)
+        if not os.path.isdir(variant_dir):
+            raise FileNotFoundError(f"ไม่พบโมเดลรุ่น {variant} ใน {scoring.VARIANTS_DIR}")
+        for root, dirs, files in os.walk(variant_dir):
+            # โฟลเดอร์ memory-map (compiled_model.mmap) สร้างจาก .npz ได้เสมอ ไม่นับเป็นเนื้อหาของชุด
+            dirs[:] = [d for d in dirs if not d.endswith(compiled_model.MMAP_SUFFIX)]
+            for name in files:
+                path = os.path.join(root, name)
+                sources.append((os.path.relpath(path, source_dir), path))
+    return sorted(sources)
+
+def publish(source_dir, registry, variant=None, label=None, overrides=None):
+    # overrides = {ชื่อไฟล์ในชุด: path} ใช้แทนไฟล์ใน source_dir (เช่น K-Means ที่เทรนใหม่จาก recluster.py)
+    overrides = overrides or {}
+    missing = [name for name in REQUIRED_FILES
+               if name not in overrides and not os.path.exists(os.path.join(source_dir, name))]
+    if missing:
+        raise FileNotFoundError(f"ไม่พบไฟล์ {', '.join(missing)} ใน {source_dir}")
+
+    sources = sorted(dict(_bundle_sources(source_dir, variant), **overrides).items())
+    hashes = {path: feature_schema.file_sha256(source) for path, source in sources}
+    if recommendations.TEXTS_FILE not in hashes:
+        # ชุดโมเดลต้องมีข้อความคำแนะนำของตัวเองเสมอ (ไม่มีไฟล์ = ใช้ข้อความปัจจุบัน)
+        hashes[recommendations.TEXTS_FILE] = hashlib.sha256(
+            json.dumps(recommendations.DEFAULT_TEXTS, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+    version = hashlib.sha256(json.dumps([hashes, variant or 'full'], sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+    target = bundle_dir(registry, version)
+    if os.path.exists(os.path.join(target, BUNDLE_MANIFEST)):
+        return version, False # เนื้อหาเดียวกันเคยเผยแพร่แล้ว
+
+    # คัดลอกลงโฟลเดอร์ชั่วคราวก่อน แล้ว rename ทีเดียว (ผู้อ่านไม่เห็นชุดโมเดลที่ยังคัดลอกไม่ครบ)
+    tmp = os.path.join(registry, BUNDLES_DIR, f'.tmp-{version}-{os.getpid()}')
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        for path, source in sources:
+            os.makedirs(os.path.dirname(os.path.join(tmp, path)), exist_ok=True)
+            shutil.copy2(source, os.path.join(tmp, path))
+        if not os.path.exists(os.path.join(tmp, recommendations.TEXTS_FILE)):
+            recommendations.dump_texts(os.path.join(tmp, recommendations.TEXTS_FILE))
+        manifest = {'version': version, 'variant': variant or 'full', 'label': label, 'created': time.time(),
+                    'source': os.path.abspath(source_dir), 'files': hashes}
+        with open(os.path.join(tmp, BUNDLE_MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            if not os.path.exists(os.path.join(target, BUNDLE_MANIFEST)): # อีก Process เผยแพร่ชุดเดียวกันไปก่อน
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return version, True
+
+def activate(registry, version):
+    if not os.path.exists(os.path.join(bundle_dir(registry, version), BUNDLE_MANIFEST)):
+        raise FileNotFoundError(f"ไม่พบชุดโมเดลรุ่น {version} ใน {registry}")
+    tmp = os.path.join(registry, ACTIVE_FILE + f'.tmp-{os.getpid()}')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(registry, ACTIVE_FILE))
+    with open(os.path.join(registry, HISTORY_FILE), 'a', encoding='utf-8') as f:
+        f.write(f"{time.strftime('%Y-%m-%dT%H:%M:%S')}\t{version}\n")
+
+def previous_version(registry):
+    # รุ่นก่อนหน้ารุ่นที่ใช้อยู่ตามประวัติ (สำหรับ rollback)
+    try:
+        with open(os.path.join(registry, HISTORY_FILE), encoding='utf-8') as f:
+            history = [line.rstrip('\n').split('\t')[-1] for line in f if line.strip()]
+    except OSError:
+        return None
+    current = active_version(registry)
+    for version in reversed(history):
+        if version != current:
+            return version
+    return None
+
+# ==========================================
+# 2. โหลด + ทดสอบชุดโมเดล (ใช้ทั้งตอนเปิดหน้าเว็บ ตอนสลับรุ่น และก่อน activate)
+# ==========================================
+def load_bundle(registry, version, timings=None, memory=None):
+    manifest = read_manifest(registry, version)
+    return scoring.load_artifacts(bundle_dir(registry, version), timings=timings, variant=manifest.get('variant') or 'full',
+                                  memory=memory)
+
+def smoke_answers():
+    # คำตอบค่าเริ่มต้น / ต่ำสุด / สูงสุด ครบทุกข้อ
+    defaults = [field.default for field in feature_schema.INPUT_FIELDS]
+    return pd.DataFrame([defaults, feature_schema.INPUT_LOW, feature_schema.INPUT_HIGH],
+                        columns=feature_schema.INPUT_COLUMNS, dtype=float)
+
+def smoke_test(resources):
+    # เรียกโมเดลจริง 1 ครั้ง (อุ่นเครื่องไปในตัว) และตรวจว่าผลอยู่ในช่วงที่หน้าเว็บแสดงได้
+    answers = smoke_answers()
+    started = time.perf_counter()
+    scores = scoring.score_frame(answers, resources, chunk_size=len(answers))
+    elapsed = time.perf_counter() - started
+    clusters = scores['cluster_id'].to_numpy()
+    probs, risk_scores = scores['risk_prob'].to_numpy(dtype=float), scores['risk_score'].to_numpy(dtype=float)
+    if len(scores) != len(answers):
+        raise RuntimeError(f"ทดสอบโมเดลไม่ผ่าน: ได้ผล {len(scores)} แถวจาก {len(answers)} แถว")
+    if not np.all((clusters >= 0) & (clusters < len(scoring.CLUSTER_NAMES))):
+        raise RuntimeError(f"ทดสอบโมเดลไม่ผ่าน: กลุ่ม DNA นอกช่วง {clusters.tolist()}")
+    if not (np.all(np.isfinite(probs)) and np.all((probs >= 0) & (probs <= 1))):
+        raise RuntimeError(f"ทดสอบโมเดลไม่ผ่าน: ความน่าจะเป็นผิดปกติ {probs.tolist()}")
+    if not (np.all(np.isfinite(risk_scores)) and np.all((risk_scores >= 0) & (risk_scores <= 100))):
+        raise RuntimeError(f"ทดสอบโมเดลไม่ผ่าน: คะแนนความเสี่ยงผิดปกติ {risk_scores.tolist()}")
+    return elapsed
+
+# ==========================================
+# 3. Command Line
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: จัดการชุดโมเดลใน Registry")
+    parser.add_argument('--registry', default=registry_from_env() or DEFAULT_REGISTRY)
+    commands = parser.add_subparsers(dest='command', required=True)
+    p = commands.add_parser('publish', help="เผยแพร่ไฟล์โมเดลในโฟลเดอร์เป็นชุดใหม่")
+    p.add_argument('source', nargs='?', default=scoring.BASE_DIR)
+    p.add_argument('--variant', default=None, help="รุ่นใน predictor_variants ที่จะใส่ในชุด (ค่าเริ่มต้น = Ensemble เต็ม)")
+    p.add_argument('--label', default=None)
+    p.add_argument('--activate', action='store_true', help="ทดสอบแล้วใช้งานทันที")
+    p = commands.add_parser('activate', help="ทดสอบแล้วเปลี่ยนรุ่นที่ใช้งาน")
+    p.add_argument('version')
+    p.add_argument('--no-check', action='store_true', help="ไม่ต้องโหลด/ทดสอบก่อนเปลี่ยน")
+    commands.add_parser('rollback', help="กลับไปใช้รุ่นก่อนหน้า")
+    commands.add_parser('list', help="แสดงชุดโมเดลทั้งหมด")
+    args = parser.parse_args(argv)
+
+    def check_and_activate(version, check=True):
+        if check:
+            resources = load_bundle(args.registry, version)
+            elapsed = smoke_test(resources)
+            print(f"ทดสอบรุ่น {version} ผ่าน (โมเดลรุ่น {resources.version}, {elapsed * 1000:.0f} ms)", file=sys.stderr)
+        activate(args.registry, version)
+        print(f"ใช้งานรุ่น {version} แล้ว (หน้าเว็บจะสลับภายใน ~{poll_from_env():.0f} วินาที)", file=sys.stderr)
+
+    try:
+        if args.command == 'publish':
+            version, created = publish(args.source, args.registry, variant=args.variant, label=args.label)
+            print(f"{'เผยแพร่' if created else 'มีอยู่แล้ว'}: {version} -> {bundle_dir(args.registry, version)}",
+                  file=sys.stderr)
+            if args.activate:
+                check_and_activate(version)
+        elif args.command == 'activate':
+            check_and_activate(args.version, check=not args.no_check)
+        elif args.command == 'rollback':
+            version = previous_version(args.registry)
+            if version is None:
+                print("ไม่มีรุ่นก่อนหน้าให้ย้อนกลับ", file=sys.stderr)
+                return 1
+            check_and_activate(version)
+        else:
+            active = active_version(args.registry)
+            for m in list_bundles(args.registry):
+                created = time.strftime('%Y-%m-%d %H:%M', time.localtime(m['created']))
+                print(f"{'*' if m['version'] == active else ' '} {m['version']}  {created}  {m['variant']:<10} {m.get('label') or ''}")
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"ไม่สำเร็จ: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import memory_budget
+import model_registry
+import scoring
+
+# ==========================================
+# Server ให้คะแนนแยก Process (โหลดโมเดลครั้งเดียว แล้ว fork Worker ใช้หน่วยความจำร่วมกันแบบ copy-on-write)
+# ==========================================
+# ทุก Replica ของหน้าเว็บเชื่อมมาที่ Server นี้แทนการโหลด AutoGluon เอง (ตั้ง FINCHECK_MODEL_SERVER)
+# Protocol: ข้อความ JSON นำหน้าด้วยความยาว 4 byte (big-endian) ผ่าน Unix socket หรือ TCP บน localhost
+#   {"op": "info"}                               -> {"ok": true, "version": ..., "has_predictor": ...}
+#   {"op": "score", "answers": [[15 ค่า], ...]}  -> {"ok": true, "cluster_id": [...], "risk_prob": [...], "risk_score": [...]}
+ADDRESS_ENV = 'FINCHECK_MODEL_SERVER'
+DEFAULT_ADDRESS = 'unix:' + os.path.join(scoring.BASE_DIR, '.cache', 'model_server.sock')
+MAX_MESSAGE_BYTES = 64 << 20
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# อายุของ info ที่ Client จำไว้ (วินาที) หน้าเว็บใช้ version จาก info เป็น Key ของ Cache ผลลัพธ์
+# -> ต้องถามใหม่เป็นระยะ ไม่เช่นนั้นหลัง Server เปลี่ยนรุ่นโมเดล Cache เก่าจะตอบผลของรุ่นเดิมไปตลอด
+INFO_TTL_SECONDS = 5.0
+
+_HEADER = struct.Struct('>I')
+
+def parse_address(address):
+    # 'unix:/path/to.sock' หรือ path ที่มี / -> Unix socket, 'host:port' -> TCP
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if os.sep in address or address.endswith('.sock'):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"รูปแบบที่อยู่ไม่ถูกต้อง: {address} (ใช้ unix:/path หรือ 127.0.0.1:port)")
+    return socket.AF_INET, (host, int(port))
+
+def send_message(sock, obj):
+    data = json.dumps(obj, allow_nan=True).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+def recv_message(sock):
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"ข้อความใหญ่เกิน {MAX_MESSAGE_BYTES:,} byte")
+    data = _recv_exact(sock, size)
+    if data is None:
+        raise ConnectionError("การเชื่อมต่อถูกปิดกลางข้อความ")
+    return json.loads(data.decode('utf-8'))
+
+# ==========================================
+# 1. ฝั่ง Server
+# ==========================================
+def handle_request(resources, request):
+    op = request.get('op')
+    if op == 'info':
+        return {'ok': True, 'version': resources.version, 'has_predictor': scoring.has_predictor(resources),
+                'pid': os.getpid()}
+    if op == 'score':
+        answers = pd.DataFrame(np.asarray(request.get('answers', []), dtype=float).reshape(-1, len(scoring.INPUT_COLUMNS)),
+                               columns=scoring.INPUT_COLUMNS)
+        scores = scoring.score_frame(answers, resources, chunk_size=max(1, len(answers)))
+        return {'ok': True, 'version': resources.version,
+                'cluster_id': scores['cluster_id'].astype(int).tolist(),
+                'risk_prob': scores['risk_prob'].astype(float).tolist(),
+                'risk_score': scores['risk_score'].astype(float).tolist()}
+    return {'ok': False, 'error': f"ไม่รู้จักคำสั่ง {op}"}
+
+def _serve_connection(conn, resources):
+    with conn:
+        while True:
+            try:
+                request = recv_message(conn)
+            except (OSError, ValueError) as e:
+                print(f"[model-server {os.getpid()}] อ่านคำขอไม่ได้: {e}", file=sys.stderr)
+                return
+            if request is None:
+                return
+            try:
+                response = handle_request(resources, request)
+            except Exception as e:
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            try:
+                send_message(conn, response)
+            except OSError:
+                return
+
+def _worker_loop(listener, resources):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    while True:
+        conn, _ = listener.accept()
+        _serve_connection(conn, resources)
+
+def _bind(address):
+    family, target = parse_address(address)
+    if family == socket.AF_UNIX:
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        if os.path.exists(target):
+            os.remove(target) # Socket ค้างจากครั้งก่อน
+    elif target[0] not in LOOPBACK_HOSTS:
+        raise ValueError(f"เปิด Server ได้เฉพาะ localhost ({', '.join(LOOPBACK_HOSTS)})")
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    if family != socket.AF_UNIX:
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(target)
+    listener.listen(128)
+    return listener, family, target
+
+def serve(address=DEFAULT_ADDRESS, workers=None, base_dir=scoring.BASE_DIR):
+    workers = workers or os.cpu_count() or 1
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, str(threads_per_worker))
+
+    timings, memory = {}, {}
+    started = time.perf_counter()
+    # มีชุดโมเดลที่เลือกไว้ใน Registry -> ใช้รุ่นนั้น (เปลี่ยนรุ่น = Restart Server หน้าเว็บไม่ต้อง Restart)
+    registry = model_registry.registry_from_env()
+    bundle = model_registry.active_version(registry) if registry else None
+    if bundle is not None:
+        resources = model_registry.load_bundle(registry, bundle, timings=timings, memory=memory)
+        model_registry.smoke_test(resources)
+    else:
+        resources = scoring.load_artifacts(base_dir, timings=timings, memory=memory)
+    print(f"[model-server] โหลดโมเดลรุ่น {resources.version} ใน {time.perf_counter() - started:.2f}s "
+          f"({type(resources.predictor).__name__ if scoring.has_predictor(resources) else 'Demo'})", file=sys.stderr)
+    print(f"[model-server] หน่วยความจำ: {memory_budget.format_report(memory)}", file=sys.stderr)
+
+    listener, family, target = _bind(address)
+    if not hasattr(os, 'fork'):
+        # Windows: ไม่มี fork ให้บริการใน Process เดียว
+        print(f"[model-server] ให้บริการที่ {address} (Process เดียว)", file=sys.stderr)
+        _worker_loop(listener, resources)
+        return 0
+
+    # ย้าย Object ที่โหลดแล้วออกจาก GC เพื่อไม่ให้ Worker แตะหน้า memory ร่วม (copy-on-write คงอยู่)
+    gc.freeze()
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker_loop(listener, resources)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    print(f"[model-server] ให้บริการที่ {address} ด้วย {workers} Worker", file=sys.stderr)
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            children.discard(pid)
+            if not stopping:
+                # Worker ตาย (เช่น หน่วยความจำไม่พอ) -> เปิดใหม่แทน
+                print(f"[model-server] Worker {pid} หยุดทำงาน (status {status}) เปิดใหม่", file=sys.stderr)
+                spawn()
+    finally:
+        listener.close()
+        if family == socket.AF_UNIX and os.path.exists(target):
+            os.remove(target)
+    return 0
+
+# ==========================================
+# 2. ฝั่ง Client (หน้าเว็บ ใช้แค่ pandas/numpy)
+# ==========================================
+class ModelClient:
+    def __init__(self, address, timeout=10.0):
+        self.address = address
+        self.family, self.target = parse_address(address)
+        self.timeout = timeout
+        self._info = None
+        self._info_at = 0.0
+
+    def _call(self, request):
+        # เปิด Connection ใหม่ทุกคำขอ (Worker ว่างตัวไหนรับก็ได้ ไม่มี Connection ค้างผูก Worker ไว้)
+        try:
+            with socket.socket(self.family, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.target)
+                send_message(sock, request)
+                response = recv_message(sock)
+        except socket.timeout:
+            raise TimeoutError("Server ให้คะแนนตอบกลับช้ากว่าที่กำหนด กรุณาลองใหม่อีกครั้ง")
+        except OSError as e:
+            raise ConnectionError(f"เชื่อมต่อ Server ให้คะแนน ({self.address}) ไม่ได้: {e}")
+        if response is None:
+            raise ConnectionError("Server ให้คะแนนปิดการเชื่อมต่อก่อนตอบกลับ")
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error', 'Server ให้คะแนนผิดพลาด'))
+        return response
+
+    def info(self, refresh=False):
+        if self._info is None or refresh or time.monotonic() - self._info_at > INFO_TTL_SECONDS:
+            self._info = self._call({'op': 'info'})
+            self._info_at = time.monotonic()
+        return self._info
+
+    def score(self, answers):
+        # answers = ตารางคำตอบ (คอลัมน์ INPUT_COLUMNS) คืนค่า DataFrame แบบเดียวกับ scoring.score_frame
+        values = answers.reindex(columns=scoring.INPUT_COLUMNS).to_numpy(dtype=float)
+        response = self._call({'op': 'score', 'answers': values.tolist()})
+        if self._info is not None and response['version'] != self._info['version']:
+            self._info = None # Server เปลี่ยนรุ่นโมเดล
+        return pd.DataFrame({'cluster_id': response['cluster_id'], 'risk_prob': response['risk_prob'],
+                             'risk_score': response['risk_score']}), response['version']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: Server ให้คะแนนใช้ร่วมกันทุก Replica ของหน้าเว็บ")
+    parser.add_argument('--address', default=os.environ.get(ADDRESS_ENV, DEFAULT_ADDRESS),
+                        help="unix:/path/to.sock หรือ 127.0.0.1:port")
+    parser.add_argument('--workers', type=int, default=None, help="จำนวน Worker (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument('--base-dir', default=scoring.BASE_DIR)
+    parser.add_argument('--check', action='store_true', help="ตรวจว่า Server ที่อยู่นี้ทำงานอยู่หรือไม่")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        try:
+            info = ModelClient(args.address).info()
+        except (ConnectionError, TimeoutError, RuntimeError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Server ทำงานอยู่: รุ่น {info['version']} ({'มีโมเดลพยากรณ์' if info['has_predictor'] else 'Demo'}) "
+              f"Worker pid {info['pid']}", file=sys.stderr)
+        return 0
+    return serve(args.address, args.workers, args.base_dir)
+
+if __name__ == '__main__':
+    sys.exit(main())
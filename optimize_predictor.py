@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import feature_schema
+import model_archive
+import scoring
+
+# ==========================================
+# 1. สร้างโมเดลรุ่นสำหรับใช้งานจริง (Deployment Variants)
+# ==========================================
+# full       = Ensemble เต็มจากการเทรน (ค่าเริ่มต้นของหน้าเว็บ)
+# refit_full = เทรนโมเดลที่ดีที่สุดใหม่บนข้อมูลทั้งหมด (ไม่มี bagging) แล้วเก็บเฉพาะที่จำเป็น
+# pruned     = โมเดลที่เร็วที่สุดที่คะแนนไม่ต่ำกว่าโมเดลดีที่สุดเกิน --tolerance
+VARIANTS = ('full', 'refit_full', 'pruned')
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def _find_model_path(extract_path):
+    for root, dirs, files in os.walk(extract_path):
+        if 'predictor.pkl' in files:
+            return root
+    return extract_path
+
+def build_refit_full(predictor, out_path):
+    work_path = out_path + '.work'
+    shutil.rmtree(work_path, ignore_errors=True)
+    clone = predictor.clone(path=work_path, return_clone=True)
+    clone.refit_full(model='best', set_best_to_refit_full=True)
+    clone.clone_for_deployment(path=out_path, model='best', dirs_exist_ok=True)
+    shutil.rmtree(work_path, ignore_errors=True)
+
+def build_pruned(predictor, out_path, tolerance):
+    # เลือกจากคะแนน Validation/OOF (score_val) ไม่ใช่ข้อมูลที่ใช้เทรน (คะแนน in-sample เข้าข้างโมเดลที่ Overfit)
+    board = predictor.leaderboard(silent=True).dropna(subset=['score_val'])
+    best_score = board['score_val'].max()
+    candidates = board[board['score_val'] >= best_score - tolerance]
+    chosen = candidates.sort_values('pred_time_val').iloc[0]['model']
+    predictor.clone_for_deployment(path=out_path, model=chosen, dirs_exist_ok=True)
+    return chosen
+
+# ==========================================
+# 2. วัดผลเทียบกับ Ensemble เต็ม
+# ==========================================
+def _eval_frame(df_raw, template):
+    # ใช้แถวแบบเดียวกับหน้าเว็บ (มีแค่คำตอบ 15 ข้อ + SIZ/YER ที่เหลือเป็น NaN)
+    answers = scoring.prepare_answers(df_raw)
+    return scoring.build_prediction_frame(answers, template)
+
+def _score_val(board, model):
+    # คะแนน Validation ของโมเดล (รุ่น refit_full ไม่มีค่า Validation ของตัวเอง ใช้ของโมเดลต้นทางแทน)
+    if model not in board.index and model.endswith('_FULL'):
+        model = model[:-len('_FULL')]
+    value = board['score_val'].get(model)
+    return None if value is None or pd.isna(value) else float(value)
+
+def measure_variant(path, eval_df, y, reference_prob=None, latency_rows=200, throughput_rows=20000):
+    from autogluon.tabular import TabularPredictor
+    from sklearn.metrics import roc_auc_score
+
+    started = time.perf_counter()
+    predictor = TabularPredictor.load(path, require_py_version_match=False)
+    load_seconds = time.perf_counter() - started
+
+    # ความหน่วงต่อ 1 แถว (แบบที่หน้าเว็บเรียกใช้)
+    latencies = []
+    for i in range(min(latency_rows, len(eval_df))):
+        row = eval_df.iloc[[i]]
+        t0 = time.perf_counter()
+        predictor.predict_proba(row)
+        latencies.append(time.perf_counter() - t0)
+
+    # Throughput แบบ Batch
+    repeats = max(1, throughput_rows // max(1, len(eval_df)))
+    batch = pd.concat([eval_df] * repeats, ignore_index=True)
+    t0 = time.perf_counter()
+    predictor.predict_proba(batch)
+    batch_seconds = time.perf_counter() - t0
+
+    prob = np.asarray(predictor.predict_proba(eval_df).values, dtype=float)[:, -1]
+    report = {
+        'path': path,
+        'disk_mb': _dir_size(path) / 1e6,
+        'load_seconds': load_seconds,
+        'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'latency_p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'batch_rows_per_sec': len(batch) / batch_seconds if batch_seconds > 0 else 0.0,
+        # RawData2.xlsx คือข้อมูลที่ใช้เทรน (ไม่มีการระบุแถว Hold-out) -> AUC นี้เป็นค่า in-sample
+        # ใช้ดูความสอดคล้อง ไม่ใช่ความแม่นยำจริง ความแม่นยำจริงดูที่ score_val (Validation/OOF)
+        'auc_in_sample': float(roc_auc_score(y, prob)) if len(np.unique(y)) > 1 else None,
+    }
+    if reference_prob is not None:
+        # ความสอดคล้องกับ Ensemble เต็ม ทั้งค่าดิบและระดับความเสี่ยง (ต่ำ/ปานกลาง/สูง)
+        score, ref_score = scoring.rescale_risk(prob), scoring.rescale_risk(reference_prob)
+        bands, ref_bands = scoring.risk_bands(score), scoring.risk_bands(ref_score)
+        report['max_abs_prob_diff'] = float(np.max(np.abs(prob - reference_prob)))
+        report['mean_abs_score_diff'] = float(np.mean(np.abs(score - ref_score)))
+        report['band_agreement'] = float(np.mean(bands == ref_bands))
+    return report, prob
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างโมเดล AutoGluon รุ่นเบาสำหรับใช้งานจริง พร้อมรายงานเทียบกับ Ensemble เต็ม")
+    parser.add_argument('--base-dir', default=scoring.BASE_DIR)
+    parser.add_argument('--variants', nargs='+', default=['refit_full', 'pruned'], choices=VARIANTS[1:])
+    parser.add_argument('--tolerance', type=float, default=0.01, help="คะแนนที่ยอมให้ต่ำกว่าโมเดลดีที่สุดได้ (สำหรับ pruned)")
+    parser.add_argument('--latency-rows', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    from autogluon.tabular import TabularPredictor
+
+    base_dir = args.base_dir
+    extract_path = model_archive.ensure_extracted(base_dir)
+    if extract_path is None:
+        print("ไม่พบไฟล์โมเดล AutoGluon (model_part_*)", file=sys.stderr)
+        return 1
+    full_path = _find_model_path(extract_path)
+    predictor = TabularPredictor.load(full_path, require_py_version_match=False)
+
+    df_raw = pd.read_excel(os.path.join(base_dir, feature_schema.WORKBOOK_FILE))
+    template = feature_schema.load_template(base_dir)
+    eval_df = _eval_frame(df_raw, template)
+    y = (df_raw[predictor.label] == predictor.positive_class).astype(int).to_numpy()
+    board = predictor.leaderboard(silent=True).set_index('model')
+
+    variants_dir = os.path.join(base_dir, scoring.VARIANTS_DIR)
+    os.makedirs(variants_dir, exist_ok=True)
+
+    report = {}
+    report['full'], reference_prob = measure_variant(full_path, eval_df, y, latency_rows=args.latency_rows)
+    report['full']['model'] = predictor.model_best
+    for name in args.variants:
+        out_path = os.path.join(variants_dir, name)
+        shutil.rmtree(out_path, ignore_errors=True)
+        if name == 'refit_full':
+            build_refit_full(predictor, out_path)
+            chosen = None
+        else:
+            chosen = build_pruned(predictor, out_path, args.tolerance)
+        report[name], _ = measure_variant(out_path, eval_df, y, reference_prob, latency_rows=args.latency_rows)
+        report[name]['model'] = chosen or TabularPredictor.load(out_path, require_py_version_match=False).model_best
+    for name in report:
+        report[name][f'score_val ({predictor.eval_metric.name})'] = _score_val(board, report[name]['model'])
+
+    with open(os.path.join(variants_dir, 'report.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+
+    print(pd.DataFrame(report).T.to_string())
+    print("\nauc_in_sample วัดบน RawData2.xlsx ซึ่งเป็นข้อมูลที่ใช้เทรน เทียบความแม่นยำด้วย score_val (Validation/OOF)",
+          file=sys.stderr)
+    print(f"\nเลือกรุ่นที่ใช้ในหน้าเว็บด้วย {scoring.PREDICTOR_VARIANT_ENV}=<ชื่อรุ่น>", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
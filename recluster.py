@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import assessment_store
+import cluster_lookup
+import feature_schema
+import model_registry
+import scoring
+from stream_scoring import iter_chunks
+
+# ==========================================
+# จัดกลุ่ม DNA ธุรกิจใหม่จากประวัติการประเมิน (Mini-batch K-Means ทีละก้อน หน่วยความจำคงที่)
+# ==========================================
+# 1. อ่านคำตอบ 8 ข้อ (CLUSTER_FEATURES) จากฐานข้อมูล assessment_store (หรือไฟล์) ทีละก้อน
+#    -> scaler เดิม (scaler_behavior.joblib) -> MiniBatchKMeans.partial_fit เริ่มจากจุดศูนย์กลางเดิม
+# 2. จับคู่จุดศูนย์กลางใหม่กับเดิม (ระยะรวมน้อยที่สุด) แล้วเรียงใหม่ให้ cluster_id เดิม = กลุ่มเดิม
+#    ชื่อกลุ่ม/ข้อความคำแนะนำ (Active Marketer / Potential Starter / Master Leader) จึงใช้ต่อได้
+# 3. อ่านประวัติอีกรอบ เทียบกลุ่มเดิม/ใหม่ของทุกรายการ -> สัดส่วนที่ย้ายกลุ่ม + ระยะที่จุดศูนย์กลางขยับ
+# 4. เผยแพร่เป็นชุดโมเดลใหม่ใน Registry (K-Means + ตาราง DNA ใหม่ ไฟล์อื่นเหมือนรุ่นต้นทาง)
+DEFAULT_EPOCHS = 3
+REPORT_DIR = 'reports'
+
+# ==========================================
+# 1. อ่านประวัติทีละก้อน
+# ==========================================
+def _iter_store(path, chunk_size):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        columns = ', '.join(f'"{col}"' for col in scoring.CLUSTER_FEATURES)
+        cursor = conn.execute(f'SELECT {columns} FROM assessments ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield np.array(rows, dtype=float) # NULL (ไม่ได้ตอบ) -> NaN
+    finally:
+        conn.close()
+
+def _iter_file(path, chunk_size):
+    for chunk in iter_chunks(path, chunk_size):
+        missing = [c for c in scoring.CLUSTER_FEATURES if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"ไฟล์ข้อมูลขาดคอลัมน์: {', '.join(missing)}")
+        yield scoring.prepare_answers(chunk)[scoring.CLUSTER_FEATURES].to_numpy(dtype=float)
+
+def iter_history(path, chunk_size=scoring.DEFAULT_CHUNK_SIZE):
+    # คืนค่าคำตอบ 8 ข้อเป็น DataFrame ทีละก้อน (ข้อที่ไม่ได้ตอบ = 0 เหมือน scoring.assign_clusters)
+    ext = os.path.splitext(path)[1].lower()
+    chunks = _iter_store(path, chunk_size) if ext in ('.sqlite', '.db') else _iter_file(path, chunk_size)
+    for values in chunks:
+        yield pd.DataFrame(values, columns=scoring.CLUSTER_FEATURES).fillna(0)
+
+# ==========================================
+# 2. เทรนแบบ Mini-batch แล้วจับคู่ป้ายกลุ่มกับรุ่นเดิม
+# ==========================================
+def fit(path, scaler, kmeans, chunk_size=scoring.DEFAULT_CHUNK_SIZE, epochs=DEFAULT_EPOCHS, fresh=False, seed=0):
+    from sklearn.cluster import MiniBatchKMeans
+
+    n_clusters = kmeans.cluster_centers_.shape[0]
+    model = MiniBatchKMeans(n_clusters=n_clusters, init='k-means++' if fresh else kmeans.cluster_centers_,
+                            n_init=1, batch_size=chunk_size, random_state=seed)
+    fitted = False
+    for _ in range(max(1, epochs)):
+        pending = None # ก้อนแรกต้องมีอย่างน้อย n_clusters แถว (รวมก้อนเล็กๆ ต่อกันก่อน)
+        for answers in iter_history(path, chunk_size):
+            X_scaled = scaler.transform(answers)
+            if pending is not None:
+                X_scaled, pending = np.vstack([pending, X_scaled]), None
+            if not fitted and len(X_scaled) < n_clusters:
+                pending = X_scaled
+                continue
+            model.partial_fit(X_scaled)
+            fitted = True
+        if not fitted:
+            raise ValueError(f"ประวัติการประเมินน้อยเกินไป (ต้องมีอย่างน้อย {n_clusters} รายการ)")
+    return model
+
+def match_labels(old_centers, new_centers):
+    # order[i] = จุดศูนย์กลางใหม่ที่คู่กับกลุ่มเดิม i (ระยะรวมน้อยที่สุด)
+    from scipy.optimize import linear_sum_assignment
+
+    cost = np.linalg.norm(old_centers[:, None, :] - new_centers[None, :, :], axis=2)
+    _, order = linear_sum_assignment(cost)
+    return order
+
+def relabel(model, order):
+    model.cluster_centers_ = model.cluster_centers_[order]
+    if hasattr(model, '_counts'):
+        model._counts = model._counts[order]
+    return model
+
+# ==========================================
+# 3. เทียบรุ่นเดิม/ใหม่ทั้งประวัติ (อ่านอีกรอบ เก็บแค่ตัวนับ)
+# ==========================================
+def compare(path, scaler, old_kmeans, new_kmeans, old_table=None, chunk_size=scoring.DEFAULT_CHUNK_SIZE):
+    n_clusters = old_kmeans.cluster_centers_.shape[0]
+    transitions = np.zeros((n_clusters, n_clusters), dtype=np.int64) # แถว = กลุ่มเดิม, คอลัมน์ = กลุ่มใหม่
+    inertia = {'old': 0.0, 'new': 0.0}
+    for answers in iter_history(path, chunk_size):
+        X_scaled = scaler.transform(answers)
+        old = scoring.assign_clusters(answers, scaler, old_kmeans, old_table)
+        new = np.ravel(new_kmeans.predict(X_scaled)).astype(int)
+        np.add.at(transitions, (old, new), 1)
+        inertia['old'] += float(((X_scaled - old_kmeans.cluster_centers_[old]) ** 2).sum())
+        inertia['new'] += float(((X_scaled - new_kmeans.cluster_centers_[new]) ** 2).sum())
+    return transitions, inertia
+
+def build_report(scaler, old_kmeans, new_kmeans, transitions, inertia):
+    rows = int(transitions.sum())
+    old_centers = scaler.inverse_transform(old_kmeans.cluster_centers_)
+    new_centers = scaler.inverse_transform(new_kmeans.cluster_centers_)
+    clusters = []
+    for cluster_id in range(len(old_centers)):
+        change = new_centers[cluster_id] - old_centers[cluster_id]
+        clusters.append({
+            'cluster_id': cluster_id,
+            'name': scoring.CLUSTER_NAMES[cluster_id] if cluster_id < len(scoring.CLUSTER_NAMES) else None,
+            # ระยะที่จุดศูนย์กลางขยับ (หน่วยหลัง scaler) และรายข้อ (หน่วยคำตอบ 0-5)
+            'shift': float(np.linalg.norm(new_kmeans.cluster_centers_[cluster_id] - old_kmeans.cluster_centers_[cluster_id])),
+            'old_center': dict(zip(scoring.CLUSTER_FEATURES, map(float, old_centers[cluster_id]))),
+            'new_center': dict(zip(scoring.CLUSTER_FEATURES, map(float, new_centers[cluster_id]))),
+            'change': dict(zip(scoring.CLUSTER_FEATURES, map(float, change))),
+            'old_count': int(transitions[cluster_id].sum()),
+            'new_count': int(transitions[:, cluster_id].sum()),
+            'stayed': int(transitions[cluster_id, cluster_id]),
+        })
+    return {
+        'rows': rows,
+        'reassignment_rate': 1.0 - float(np.trace(transitions)) / rows if rows else 0.0,
+        'transitions': transitions.tolist(),
+        'inertia_old': inertia['old'] / rows if rows else None,
+        'inertia_new': inertia['new'] / rows if rows else None,
+        'clusters': clusters,
+    }
+
+# ==========================================
+# 4. เผยแพร่เป็นชุดโมเดลใหม่
+# ==========================================
+def _carry_calibration(source_dir, staging, resources):
+    # ผล Calibration ผูกกับ key ที่รวม hash ของ K-Means แต่คะแนนความเสี่ยงไม่ได้ใช้กลุ่ม DNA
+    # -> คัดลอกผลของโมเดลพยากรณ์ตัวเดิมไปไว้ใต้ key ใหม่ (ไม่ต้อง Calibrate ซ้ำ)
+    path = os.path.join(source_dir, scoring.CALIBRATION_FILE)
+    if resources.rescale is None or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        calibrations = json.load(f)
+    schema_path = os.path.join(source_dir, feature_schema.SCHEMA_FILE)
+    if os.path.exists(schema_path):
+        shutil.copy2(schema_path, os.path.join(staging, feature_schema.SCHEMA_FILE))
+    calibrations[scoring.model_key(staging, resources.predictor_file)] = calibrations[resources.key]
+    target = os.path.join(staging, scoring.CALIBRATION_FILE)
+    with open(target, 'w', encoding='utf-8') as f:
+        json.dump(calibrations, f, indent=1)
+    return target
+
+def publish(model, source_dir, registry, variant, resources, label=None):
+    staging = tempfile.mkdtemp(prefix='.recluster-', dir=registry)
+    try:
+        joblib.dump(model, os.path.join(staging, cluster_lookup.KMEANS_FILE))
+        shutil.copy2(os.path.join(source_dir, cluster_lookup.SCALER_FILE), os.path.join(staging, cluster_lookup.SCALER_FILE))
+        cluster_lookup.rebuild(staging, scoring.CLUSTER_FEATURES)
+        overrides = {name: os.path.join(staging, name)
+                     for name in (cluster_lookup.KMEANS_FILE, cluster_lookup.TABLE_FILE, cluster_lookup.META_FILE)}
+        calibration = _carry_calibration(source_dir, staging, resources)
+        if calibration is not None:
+            overrides[scoring.CALIBRATION_FILE] = calibration
+        return model_registry.publish(source_dir, registry, variant=variant, label=label, overrides=overrides)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+def write_report(report, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+def format_report(report):
+    lines = [f"ย้ายกลุ่ม {report['reassignment_rate']:.1%} ของ {report['rows']:,} รายการ | "
+             f"ระยะเฉลี่ยถึงจุดศูนย์กลาง {report['inertia_old']:.3f} -> {report['inertia_new']:.3f}"]
+    for c in report['clusters']:
+        largest = max(c['change'], key=lambda name: abs(c['change'][name]))
+        lines.append(f"  {c['cluster_id']} {c['name'] or '-':<18} ขยับ {c['shift']:.3f} "
+                     f"(มากสุด {largest} {c['change'][largest]:+.2f}) | {c['old_count']:,} -> {c['new_count']:,} รายการ "
+                     f"(อยู่กลุ่มเดิม {c['stayed']:,})")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: จัดกลุ่ม DNA ธุรกิจใหม่จากประวัติการประเมิน แล้วเผยแพร่เป็นชุดโมเดลใหม่")
+    parser.add_argument('history', nargs='?', default=os.environ.get(assessment_store.STORE_PATH_ENV) or assessment_store.DEFAULT_STORE_PATH,
+                        help="ฐานข้อมูลผลการประเมิน (.sqlite) หรือไฟล์คำตอบ (.csv / .parquet / .xlsx)")
+    parser.add_argument('--registry', default=model_registry.registry_from_env() or model_registry.DEFAULT_REGISTRY)
+    parser.add_argument('--source', default=None, help="โฟลเดอร์โมเดลต้นทาง (ค่าเริ่มต้น = รุ่นที่ใช้งานอยู่ใน Registry หรือโฟลเดอร์โปรเจกต์)")
+    parser.add_argument('--variant', default=None, help="รุ่นใน predictor_variants ของต้นทาง (เมื่อไม่ได้ใช้รุ่นใน Registry)")
+    parser.add_argument('--chunk-size', type=int, default=scoring.DEFAULT_CHUNK_SIZE, help="จำนวนรายการต่อก้อน")
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS, help="จำนวนรอบที่อ่านประวัติตอนเทรน")
+    parser.add_argument('--fresh', action='store_true', help="เริ่มจาก k-means++ แทนจุดศูนย์กลางเดิม (ยังจับคู่ชื่อกลุ่มให้)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', default=None, help="ไฟล์รายงาน JSON (ค่าเริ่มต้น = <registry>/reports/recluster-<รุ่น>.json)")
+    parser.add_argument('--label', default=None)
+    parser.add_argument('--activate', action='store_true', help="ทดสอบแล้วใช้งานรุ่นใหม่ทันที")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.history):
+        print(f"ไม่พบไฟล์ {args.history}", file=sys.stderr)
+        return 1
+    source, variant = args.source, args.variant
+    if source is None:
+        active = model_registry.active_version(args.registry)
+        if active is not None:
+            source, variant = model_registry.bundle_dir(args.registry, active), model_registry.read_manifest(args.registry, active)['variant']
+        else:
+            source = scoring.BASE_DIR
+
+    started = time.perf_counter()
+    try:
+        resources = scoring.load_artifacts(source, variant=variant or 'full')
+        model = fit(args.history, resources.scaler, resources.kmeans, args.chunk_size, args.epochs, args.fresh, args.seed)
+        order = match_labels(resources.kmeans.cluster_centers_, model.cluster_centers_)
+        model = relabel(model, order)
+        transitions, inertia = compare(args.history, resources.scaler, resources.kmeans, model, resources.cluster_table,
+                                       args.chunk_size)
+        report = build_report(resources.scaler, resources.kmeans, model, transitions, inertia)
+
+        os.makedirs(args.registry, exist_ok=True)
+        label = args.label or f"recluster {report['rows']:,} รายการ"
+        version, created = publish(model, source, args.registry, variant, resources, label)
+    except (OSError, ValueError, RuntimeError, sqlite3.Error) as e:
+        print(f"จัดกลุ่มใหม่ไม่สำเร็จ: {e}", file=sys.stderr)
+        return 1
+
+    report.update({'bundle': version, 'source': os.path.abspath(source), 'source_version': resources.version,
+                   'history': os.path.abspath(args.history), 'epochs': args.epochs, 'init': 'k-means++' if args.fresh else 'current',
+                   'label_order': [int(i) for i in order], 'seconds': time.perf_counter() - started, 'created': time.time()})
+    report_path = args.report or os.path.join(args.registry, REPORT_DIR, f'recluster-{version}.json')
+    write_report(report, report_path)
+    print(f"{'เผยแพร่' if created else 'มีอยู่แล้ว'}: {version} ใน {report['seconds']:.1f}s | รายงาน -> {report_path}\n"
+          + format_report(report), file=sys.stderr)
+
+    if args.activate:
+        try:
+            elapsed = model_registry.smoke_test(model_registry.load_bundle(args.registry, version))
+        except Exception as e:
+            print(f"ทดสอบรุ่น {version} ไม่ผ่าน ไม่เปลี่ยนรุ่นที่ใช้งาน: {e}", file=sys.stderr)
+            return 1
+        model_registry.activate(args.registry, version)
+        print(f"ใช้งานรุ่น {version} แล้ว (ทดสอบ {elapsed * 1000:.0f} ms)", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
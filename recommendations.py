@@ -0,0 +1,79 @@
+import json
+import os
+
+# ==========================================
+# ข้อความผลการประเมินและคำแนะนำ (ใช้ร่วมกันระหว่างหน้าเว็บและรายงาน bulk_reports.py)
+# ==========================================
+# ชุดโมเดลใน Registry (model_registry.py) เก็บข้อความของตัวเองไว้ใน recommendations.json
+# เพราะเลข cluster_id ผูกกับ K-Means รุ่นนั้น ค่าด้านล่างคือข้อความของโมเดลชุดปัจจุบัน (ใช้เมื่อไม่มีไฟล์)
+TEXTS_FILE = 'recommendations.json'
+
+# DNA ธุรกิจตาม cluster_id (ชื่อ / สีการ์ด / คำอธิบาย / คำแนะนำเบื้องต้นหน้า Dashboard)
+# advice = (ชนิดกล่องข้อความของ Streamlit, ข้อความ)
+CLUSTER_INFO = {
+    0: {"name": "Active Marketer (นักการตลาดไฟแรง)", "color": "#F9D607", # เหลือง (กลาง)
+        "desc": "โดดเด่นด้านการตลาดและภาพลักษณ์องค์กร ควรเสริมสร้างระบบเทคโนโลยีและการบริหารความเสี่ยงหลังบ้าน",
+        "advice": ('info', "ℹ️ การตลาดยอดเยี่ยม เข้าใจผู้บริโภค แต่ต้องอุดรูรั่วความปลอดภัยของระบบ IT")},
+    1: {"name": "Potential Starter (นักสู้ผู้มีศักยภาพ)", "color": "#e74c3c", # แดง (สูง)
+        "desc": "มีความยืดหยุ่น ควรสร้างวินัยทางการเงินและวางระบบบัญชีให้น่าเชื่อถือ เพื่อเพิ่มโอกาสเข้าถึงแหล่งเงินทุน",
+        "advice": ('warning', "⚠️ ควรเร่งจัดทำบัญชีรายรับ-รายจ่ายให้ชัดเจน และลดภาระหนี้ที่ไม่จำเป็น")},
+    2: {"name": "Master Leader (ผู้นำระดับมาสเตอร์)", "color": "#2ecc71", # เขียว (ต่ำ)
+        "desc": "ความพร้อมรอบด้าน ทั้งด้านการเงิน การตลาด และการรับมือวิกฤตการณ์ ธนาคารและนักลงทุนพร้อมสนับสนุนแหล่งเงินทุน",
+        "advice": ('success', "✅ เครดิตดี เตรียมเอกสารยื่นกู้เพื่อขยายกิจการได้เลย")},
+}
+
+# คำแนะนำด้านการจัดการ ยึดตาม DNA ธุรกิจ (K-Means)
+RECS = {
+    0: { # Active Marketer
+        "strength": "กิจการของท่านมีความเข้มแข็งด้านการตลาด การสร้างแบรนด์และภาพลักษณ์องค์กร",
+        "urgent": "ควรสร้างความปลอดภัยทางเทคโนโลยี รักษาข้อมูลส่วนบุคคลของลูกค้า และกำหนดแผนรองรับวิกฤตการณ์ด่วน! ธนาคารและนักลงทุนมองว่านี่คือความเสี่ยงแฝง",
+        "maintain": "รักษาฐานลูกค้าเอาไว้ให้มั่น และเสริมสร้างการตลาดออนไลน์ให้ต่อเนื่อง"
+    },
+    1: { # Potential Starter
+        "strength": "กิจการของท่านมีความยืดหยุ่นและมีโอกาสในการเริ่มต้นวางระบบองค์กรที่ถูกต้อง",
+        "urgent": "ควรเริ่มจัดทำบัญชีรายรับ-รายจ่ายที่ชัดเจน น่าเชื่อถือ และเสริมสร้างวินัยการเงิน แยกกระเป๋าส่วนตัวออกจากกระเป๋าของธุรกิจ ธนาคารและนักลงทุนต้องการตัวเลขที่น่าเชื่อถือ",
+        "maintain": "ยึดมั่นความตั้งใจธุรกิจเอาไว้ หาความรู้เพิ่มเติมด้านการจัดการ และการวางแผนงบประมาณ"
+    },
+    2: { # Master Leader
+        "strength": "กิจการของท่านมีความพร้อมรอบด้าน ธนาคารและนักลงทุนพอใจกับกิจการลักษณะนี้",
+        "urgent": "ควรหาโอกาสขยายธุรกิจให้เติบโตยิ่งขึ้น ลงทุนในนวัตกรรมเพื่อสร้างความได้เปรียบระยะยาว",
+        "maintain": "รักษามาตรฐานระบบการจัดการ ส่งเสริมการตลาดและผลิตภัณฑ์ และเทคโนโลยีให้ทันสมัยอยู่เสมอ"
+    }
+}
+
+DEFAULT_CLUSTER = 1 # cluster_id ที่ไม่รู้จัก แสดงเป็น Potential Starter (เหมือนหน้า Dashboard เดิม)
+DEFAULT_TEXTS = {'cluster_info': CLUSTER_INFO, 'recs': RECS}
+
+def load_texts(base_dir):
+    # อ่านข้อความของชุดโมเดล คืนค่า None ถ้าไม่มีไฟล์ (ใช้ DEFAULT_TEXTS)
+    path = os.path.join(base_dir, TEXTS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        raw = json.load(f)
+    texts = {name: {int(k): v for k, v in raw[name].items()} for name in DEFAULT_TEXTS}
+    for info in texts['cluster_info'].values():
+        info['advice'] = tuple(info['advice'])
+    if DEFAULT_CLUSTER not in texts['cluster_info'] or DEFAULT_CLUSTER not in texts['recs']:
+        raise ValueError(f"{TEXTS_FILE} ต้องมีข้อความของกลุ่ม {DEFAULT_CLUSTER}")
+    return texts
+
+def dump_texts(path, texts=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(texts or DEFAULT_TEXTS, f, ensure_ascii=False, indent=2)
+
+def cluster_info(cluster_id, texts=None):
+    table = (texts or DEFAULT_TEXTS)['cluster_info']
+    return table.get(int(cluster_id), table[DEFAULT_CLUSTER])
+
+def cluster_recs(cluster_id, texts=None):
+    table = (texts or DEFAULT_TEXTS)['recs']
+    return table.get(int(cluster_id), table[DEFAULT_CLUSTER])
+
+def urgent_advice(risk_score):
+    # คำแนะนำด้านการเงิน ยึดตามความเสี่ยง AutoGluon (Risk Score)
+    if risk_score > 70:
+        return "ควรเร่งสร้างวินัยทางการเงิน จัดทำบัญชีรายรับ-รายจ่ายให้ชัดเจน และลดภาระหนี้ที่ไม่จำเป็นด่วน ธนาคาร นักลงทุนและเจ้าหนี้พิจารณา 'กระแสเงินสด' ที่น่าเชื่อถือเป็นหลัก"
+    if risk_score >= 41:
+        return "กิจการของท่านยังพอประคองตัวได้ แต่ควรระวังการใช้เงินเกินตัว ควรเริ่มจัดเตรียมเอกสารทางการเงินให้เป็นระบบ จัดเตรียมพร้อมด้านไอทีและการรองรับวิกฤติการณ์ต่าง ๆ ที่อาจเกิดขึ้น"
+    return "กิจการมีเครือข่ายธุรกิจที่ดี บัญชีและกระแสเงินสดน่าเชื่อถือทำให้เครดิตอยู่ในเกณฑ์ยอดเยี่ยม ระบบไอทีมีความพร้อม สามารถปรับตัวกับเศรษฐกิจและวิกฤติการณ์ได้ เตรียมแผนธุรกิจเพื่อยื่นขอเงินทุนขยายกิจการได้เลย"
@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# ==========================================
+# Cache ผลการประเมิน (คำตอบชุดเดิม + โมเดลรุ่นเดิม = ผลเดิม)
+# ชั้นที่ 1: LRU ในหน่วยความจำของ Process
+# ชั้นที่ 2: SQLite บนดิสก์ ใช้ร่วมกันทุก Replica ในเครื่องเดียวกัน
+# ==========================================
+CACHE_PATH_ENV = 'FINCHECK_CACHE_PATH'
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'results.sqlite')
+
+N_LEVELS = 6
+_PLACE_VALUES = N_LEVELS ** np.arange(14, -1, -1, dtype=np.int64)
+
+def encode_answers(values):
+    # แปลงคำตอบ 15 ข้อ (0-5) เป็นเลขจำนวนเต็มตัวเดียว (ฐาน 6) คืนค่า None ถ้าแปลงไม่ได้
+    values = np.asarray(values, dtype=float)
+    if values.shape != (len(_PLACE_VALUES),):
+        return None
+    if not np.all((values >= 0) & (values < N_LEVELS) & (values == np.floor(values))):
+        return None
+    return int(values.astype(np.int64) @ _PLACE_VALUES)
+
+# ผลของรุ่นอื่นที่ไม่ถูกเขียนเพิ่มนานเกินนี้ถือว่าไม่มี Replica ใช้แล้ว (รุ่นที่ยังใช้อยู่ เช่น ระหว่างสลับรุ่น/Rollback
+# หรือ Replica ที่ยังเป็นรุ่นเดิม เขียนผลใหม่อยู่เรื่อยๆ จึงไม่ถูกลบ) ขนาดรวมคุมด้วย disk_max_entries
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+class ResultCache:
+    def __init__(self, version, max_entries=10000, disk_path=None, disk_max_entries=1000000,
+                 max_age=DEFAULT_MAX_AGE, log_every=1000):
+        self.version = version
+        self.max_entries = max_entries
+        self.disk_path = disk_path if disk_path is not None else os.environ.get(CACHE_PATH_ENV, DEFAULT_CACHE_PATH)
+        self.disk_max_entries = disk_max_entries
+        self.max_age = max_age
+        self.log_every = log_every
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._puts_since_trim = 0
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'disk_errors': 0,
+                         'lookup_seconds': 0.0, 'miss_seconds': 0.0}
+        if self.disk_path:
+            try:
+                self._prune_stale_versions()
+            except (sqlite3.Error, OSError):
+                self._count('disk_errors')
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    # ---------- ชั้นดิสก์ ----------
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.disk_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.disk_path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'version TEXT NOT NULL, code INTEGER NOT NULL, cluster_id INTEGER, '
+                         'risk_prob REAL, risk_score REAL, created REAL, PRIMARY KEY (version, code))')
+            self._local.conn = conn
+        return conn
+
+    def _prune_stale_versions(self):
+        # ลบเฉพาะผลเก่าของรุ่นอื่น (ไม่ลบ Cache ของ Replica ที่ยังใช้รุ่นอื่นอยู่)
+        self._connection().execute('DELETE FROM results WHERE version != ? AND created < ?',
+                                   (self.version, time.time() - self.max_age))
+
+    def _disk_get(self, code):
+        row = self._connection().execute(
+            'SELECT cluster_id, risk_prob, risk_score FROM results WHERE version = ? AND code = ?',
+            (self.version, code)).fetchone()
+        return tuple(row) if row is not None else None
+
+    def _disk_put(self, code, result):
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                     (self.version, code, int(result[0]), float(result[1]), float(result[2]), time.time()))
+        self._puts_since_trim += 1
+        if self._puts_since_trim >= 100:
+            # ตัดรายการเก่าสุดทิ้ง (FIFO) เมื่อเกินขนาดที่กำหนด ตรวจทุก 100 ครั้งเพื่อไม่ให้ COUNT บ่อยเกินไป
+            self._puts_since_trim = 0
+            excess = conn.execute('SELECT COUNT(*) FROM results').fetchone()[0] - self.disk_max_entries
+            if excess > 0:
+                conn.execute('DELETE FROM results WHERE rowid IN '
+                             '(SELECT rowid FROM results ORDER BY created LIMIT ?)', (excess,))
+
+    # ---------- API ----------
+    def get(self, code):
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                result = self._memory.get(code)
+                if result is not None:
+                    self._memory.move_to_end(code)
+                    self._count('memory_hits')
+                    return result
+
+            if self.disk_path:
+                try:
+                    result = self._disk_get(code)
+                except (sqlite3.Error, OSError):
+                    self._count('disk_errors')
+                    result = None
+                if result is not None:
+                    self._remember(code, result)
+                    self._count('disk_hits')
+                    return result
+
+            self._count('misses')
+            return None
+        finally:
+            with self._lock:
+                self.counters['lookup_seconds'] += time.perf_counter() - started
+                lookups = self.counters['memory_hits'] + self.counters['disk_hits'] + self.counters['misses']
+            if self.log_every and lookups % self.log_every == 0:
+                print(f"[cache] {self.format_stats()}")
+
+    def _remember(self, code, result):
+        with self._lock:
+            self._memory[code] = result
+            self._memory.move_to_end(code)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, code, result, miss_seconds=0.0):
+        # result = (cluster_id, risk_prob, risk_score)
+        self._count('miss_seconds', miss_seconds)
+        self._remember(code, tuple(result))
+        if self.disk_path:
+            try:
+                self._disk_put(code, result)
+            except (sqlite3.Error, OSError):
+                self._count('disk_errors')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['avg_lookup_ms'] = stats['lookup_seconds'] / lookups * 1000 if lookups else 0.0
+        stats['avg_miss_ms'] = stats['miss_seconds'] / stats['misses'] * 1000 if stats['misses'] else 0.0
+        return stats
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"รุ่น {self.version} | hit {s['hit_rate']:.0%} (หน่วยความจำ {s['memory_hits']:,} / ดิสก์ {s['disk_hits']:,} / "
+                f"ไม่พบ {s['misses']:,}) | ค้น {s['avg_lookup_ms']:.2f} ms | คำนวณใหม่ {s['avg_miss_ms']:.1f} ms | "
+                f"ดิสก์ผิดพลาด {s['disk_errors']}")
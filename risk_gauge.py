@@ -0,0 +1,104 @@
+import math
+import os
+from functools import lru_cache
+
+import scoring
+
+# ==========================================
+# กราฟ Gauge ความเสี่ยงหน้า Dashboard (สร้างครั้งเดียวต่อคะแนน + ระดับ แล้วใช้ซ้ำทุก Session)
+# ==========================================
+# plotly = กราฟเดิม (ส่ง Figure JSON + plotly.js ไปที่เบราว์เซอร์)
+# svg    = รูป SVG ขนาดเล็กหน้าตาเดียวกัน ไม่ต้อง import plotly (เหมาะกับมือถือสเปกต่ำ)
+RENDERER_ENV = 'FINCHECK_GAUGE'
+RENDERERS = ('plotly', 'svg')
+RENDERER = os.environ.get(RENDERER_ENV, 'plotly')
+if RENDERER not in RENDERERS:
+    RENDERER = 'plotly'
+
+# แถบสีของเกจ (เขียว / เหลือง / แดง) ตามขอบระดับความเสี่ยงใน scoring
+STEPS = ((0, scoring.RISK_BAND_EDGES[0], '#2ecc71'),
+         (scoring.RISK_BAND_EDGES[0], scoring.RISK_BAND_EDGES[1], '#F9D607'),
+         (scoring.RISK_BAND_EDGES[1], 100, '#e74c3c'))
+TICKS = (0,) + scoring.RISK_BAND_EDGES + (100,)
+CACHE_SIZE = 1024 # คะแนนปัดทศนิยม 1 ตำแหน่ง มีไม่เกิน 1,001 ค่า
+
+def gauge_key(risk_score):
+    # ปัดคะแนนเท่ากับที่แสดงบนหน้าเว็บ (.1f) ส่วนระดับความเสี่ยงคิดจากคะแนนจริง (เหมือนเดิม)
+    score = round(min(max(float(risk_score), 0.0), 100.0), 1)
+    return score, scoring.risk_band(float(risk_score))[0]
+
+def _text_color(band):
+    return dict(scoring.RISK_BANDS)[band]
+
+# ==========================================
+# 1. plotly (Figure ที่ตรวจสอบแล้ว เก็บไว้ใช้ซ้ำ ไม่ต้องสร้าง/ตรวจใหม่ทุกรอบ)
+# ==========================================
+@lru_cache(maxsize=CACHE_SIZE)
+def plotly_gauge(score, band):
+    import plotly.graph_objects as go # import เฉพาะเมื่อใช้ plotly
+    fig = go.Figure(go.Indicator(
+        mode="gauge",
+        value=score,
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "gray", 'tickvals': list(TICKS)},
+            'bar': {'color': "darkblue"},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "gray",
+            'steps': [{'range': [low, high], 'color': color} for low, high, color in STEPS],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': score
+            }
+        }
+    ))
+    # ข้อความ สูง/ปานกลาง/ต่ำ ตรงกลางเกจ
+    fig.add_annotation(
+        x=0.5, y=0.10,
+        text=f"<b>{band}</b>",
+        font=dict(size=60, color=_text_color(band), family="Sarabun"),
+        showarrow=False
+    )
+    fig.update_layout(height=300, margin=dict(l=20, r=20, t=30, b=20), font={'family': "Sarabun"})
+    return fig
+
+# ==========================================
+# 2. SVG (ครึ่งวงกลม 3 แถบสี + แถบคะแนน + เส้นตำแหน่งคะแนน)
+# ==========================================
+_CX, _CY = 200, 190
+_R_OUTER, _R_INNER = 160, 96
+
+def _point(score, radius):
+    angle = math.pi * (1 - score / 100)
+    return _CX + radius * math.cos(angle), _CY - radius * math.sin(angle)
+
+def _band_path(low, high, r_outer, r_inner):
+    (x0, y0), (x1, y1) = _point(low, r_outer), _point(high, r_outer)
+    (x2, y2), (x3, y3) = _point(high, r_inner), _point(low, r_inner)
+    return (f'M{x0:.1f},{y0:.1f} A{r_outer},{r_outer} 0 0 1 {x1:.1f},{y1:.1f} '
+            f'L{x2:.1f},{y2:.1f} A{r_inner},{r_inner} 0 0 0 {x3:.1f},{y3:.1f} Z')
+
+@lru_cache(maxsize=CACHE_SIZE)
+def svg_gauge(score, band):
+    parts = [f'<path d="{_band_path(low, high, _R_OUTER, _R_INNER)}" fill="{color}"/>' for low, high, color in STEPS]
+    # กรอบสีเทา (เหมือน borderwidth ของ plotly)
+    parts.append(f'<path d="{_band_path(0, 100, _R_OUTER, _R_INNER)}" fill="none" stroke="gray" stroke-width="2"/>')
+    # แถบคะแนน (กลางวง กว้าง 1/4 ของแถบสี)
+    mid, half = (_R_OUTER + _R_INNER) / 2, (_R_OUTER - _R_INNER) / 8
+    if score > 0:
+        parts.append(f'<path d="{_band_path(0, score, mid + half, mid - half)}" fill="darkblue"/>')
+    # เส้นตำแหน่งคะแนน (threshold)
+    inset = (_R_OUTER - _R_INNER) * 0.125
+    (x0, y0), (x1, y1) = _point(score, _R_INNER + inset), _point(score, _R_OUTER - inset)
+    parts.append(f'<line x1="{x0:.1f}" y1="{y0:.1f}" x2="{x1:.1f}" y2="{y1:.1f}" stroke="black" stroke-width="4"/>')
+    for tick in TICKS:
+        (tx0, ty0), (tx1, ty1) = _point(tick, _R_OUTER), _point(tick, _R_OUTER + 6)
+        lx, ly = _point(tick, _R_OUTER + 20)
+        parts.append(f'<line x1="{tx0:.1f}" y1="{ty0:.1f}" x2="{tx1:.1f}" y2="{ty1:.1f}" stroke="gray" stroke-width="1"/>'
+                     f'<text x="{lx:.1f}" y="{ly + 4:.1f}" font-size="13" fill="#444" text-anchor="middle">{tick}</text>')
+    parts.append(f'<text x="{_CX}" y="{_CY - 8}" font-size="56" font-weight="bold" fill="{_text_color(band)}" '
+                 f'text-anchor="middle">{band}</text>')
+    return (f'<div style="text-align:center;"><svg viewBox="0 0 400 215" role="img" aria-label="ความเสี่ยง{band} {score:.1f}%" '
+            f'style="width:100%; max-width:480px; height:auto; font-family:Sarabun, sans-serif;">'
+            + ''.join(parts) + '</svg></div>')
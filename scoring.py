@@ -0,0 +1,386 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import cluster_lookup
+import feature_schema
+import memory_budget
+import model_archive
+import recommendations
+from compiled_model import COMPILED_FILE, CompiledModel
+
+# ==========================================
+# 1. ค่าคงที่ของแบบประเมิน (ใช้ร่วมกันระหว่างหน้าเว็บและ Batch)
+# ==========================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# คำถาม 15 ข้อจากหน้า Input Step 1 และ Step 2 (ช่วงคำตอบ/รหัส/ค่าเริ่มต้นอยู่ใน feature_schema.INPUT_FIELDS)
+INPUT_COLUMNS = feature_schema.INPUT_COLUMNS
+
+# คำถามที่ใช้จัดกลุ่ม DNA ธุรกิจ (K-Means)
+CLUSTER_FEATURES = ['BEH_MON', 'BRN_IMAGE', 'BRN_BRAND', 'SAV_VIRUS', 'SAV_PDPA', 'CRI_PLN', 'POL_BEN', 'POL_ADJ']
+# ชื่อกลุ่ม DNA ตามเลข cluster_id ของ K-Means (0, 1, 2)
+CLUSTER_NAMES = ('Active Marketer', 'Potential Starter', 'Master Leader')
+
+# ช่วงความน่าจะเป็นดิบจากค่าทดสอบจริง (ใช้เทียบบัญญัติไตรยางศ์เป็นคะแนน 0-100)
+# ใช้เมื่อยังไม่มีผล Calibration ของโมเดลรุ่นนั้น (สร้างด้วย calibrate_rescale.py)
+MAX_RAW_PROB = 0.491  # เพดานความเสี่ยงสูงสุด (เมื่อตอบ 0 หมด)
+MIN_RAW_PROB = 0.099  # พื้นความเสี่ยงต่ำสุด (เมื่อตอบ 5 และมีครบหมด)
+
+# ตารางแปลงความน่าจะเป็นดิบ -> คะแนน (raw เรียงจากน้อยไปมาก, ต่ำกว่า/สูงกว่าช่วงจะถูกตัดที่ 0/100)
+CALIBRATION_FILE = 'rescale_calibration.json'
+DEFAULT_RESCALE = (np.array([MIN_RAW_PROB, MAX_RAW_PROB]), np.array([0.0, 100.0]))
+
+# ระดับความเสี่ยงตามคะแนน 0-100 (ต่ำ < 40, ปานกลาง 40-70, สูง > 70) และสีตัวอักษรของแต่ละระดับ
+RISK_BANDS = (('ต่ำ', '#1b5e20'), ('ปานกลาง', '#b8860b'), ('สูง', '#842029'))
+RISK_BAND_EDGES = (40, 70)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# เลือกรุ่นของ AutoGluon ที่จะโหลด (full = Ensemble เต็ม, อื่นๆ สร้างด้วย optimize_predictor.py)
+PREDICTOR_VARIANT_ENV = 'FINCHECK_PREDICTOR_VARIANT'
+VARIANTS_DIR = 'predictor_variants'
+
+# รุ่น compiled: เปิดน้ำหนักต้นไม้แบบ memory-map ใช้หน้า memory ร่วมกันทุก Process (0 = โหลดเข้าหน่วยความจำแยก)
+MMAP_ENV = 'FINCHECK_MMAP'
+
+# template = แถวแม่แบบ 1 แถว (คอลัมน์/dtype/ค่าเริ่มต้น) ที่สร้างจาก feature_schema.json
+# cluster_table = ตาราง DNA ล่วงหน้า (cluster_lookup.npy) หรือ None ถ้าสร้างไม่ได้
+# version = รหัสรุ่นของชุดโมเดล (เปลี่ยนเมื่อไฟล์โมเดล/Schema/ช่วงคะแนนเปลี่ยน ใช้เป็น key ของ Cache)
+# rescale = ตารางแปลงคะแนน (raw, score) จาก rescale_calibration.json หรือ None = ใช้ DEFAULT_RESCALE
+# key = รหัสไฟล์โมเดลอย่างเดียว (ไม่รวมตารางแปลงคะแนน) ใช้ผูกผล Calibration กับโมเดล
+# texts = ข้อความ DNA/คำแนะนำของชุดโมเดลนี้ (recommendations.json) หรือ None = ข้อความเริ่มต้น
+# predictor_file = ไฟล์โมเดลพยากรณ์ที่ใช้คำนวณ key (None = Demo) ใช้ย้ายผล Calibration เมื่อเปลี่ยนแค่ K-Means
+Resources = namedtuple('Resources', ['kmeans', 'scaler', 'predictor', 'template', 'cluster_table', 'version',
+                                     'rescale', 'key', 'texts', 'predictor_file'],
+                       defaults=(None, None, None, None, None, None))
+
+# ==========================================
+# 2. โหลดโมเดล (ไม่พึ่ง Streamlit เพื่อให้เรียกจาก CLI / Worker ได้)
+# ==========================================
+def limit_threads(threads):
+    # จำกัด Thread ของไลบรารีตัวเลขใน Worker ของ Pool ไม่ให้แย่ง CPU กันเอง
+    # numpy/BLAS ถูกโหลดไปแล้วตั้งแต่ import (Worker fork มาจาก Process หลัก) ตั้ง env ตอนนี้ไม่มีผลกับตัวที่โหลดแล้ว
+    # -> threadpoolctl ปรับ Thread pool ที่โหลดแล้ว ส่วน env มีผลกับไลบรารีที่ยังไม่ถูกโหลด (LightGBM/torch ตอนโหลดโมเดล)
+    from threadpoolctl import threadpool_limits
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    threadpool_limits(limits=threads)
+
+@contextmanager
+def _timed(timings, stage):
+    # จับเวลาแต่ละขั้นตอนของการโหลด (timings = dict หรือ None ถ้าไม่ต้องการ)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = time.perf_counter() - started
+
+def _variant_path(base_dir, variant):
+    variant = variant or os.environ.get(PREDICTOR_VARIANT_ENV, 'full')
+    if variant == 'full':
+        return None
+    path = os.path.join(base_dir, VARIANTS_DIR, variant)
+    if not any(os.path.exists(os.path.join(path, f)) for f in ('predictor.pkl', COMPILED_FILE)):
+        print(f"ไม่พบโมเดลรุ่น '{variant}' ใน {VARIANTS_DIR} ใช้ Ensemble เต็มแทน", file=sys.stderr)
+        return None
+    return path
+
+def _hash_sources(sources):
+    return hashlib.sha256(json.dumps(sources, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def _model_sources(base_dir, predictor_file, member=None):
+    sources = {
+        'clustering': cluster_lookup.source_hashes(base_dir),
+        'predictor': feature_schema.file_sha256(predictor_file) if predictor_file else 'demo',
+        'schema': feature_schema.file_sha256(os.path.join(base_dir, feature_schema.SCHEMA_FILE))
+                  if os.path.exists(os.path.join(base_dir, feature_schema.SCHEMA_FILE)) else None,
+    }
+    if member is not None:
+        # ใช้โมเดลย่อยแทน Ensemble เต็ม (งบหน่วยความจำ) ผลพยากรณ์ต่างจากเดิม -> รุ่น/Calibration แยกกัน
+        sources['member'] = member
+    return sources
+
+def model_key(base_dir, predictor_file=None, member=None):
+    return _hash_sources(_model_sources(base_dir, predictor_file, member))
+
+def model_version(base_dir, predictor_file=None, rescale=None, member=None, texts=None):
+    raw, score = rescale if rescale is not None else DEFAULT_RESCALE
+    sources = _model_sources(base_dir, predictor_file, member)
+    sources['rescale'] = [list(map(float, raw)), list(map(float, score))]
+    if texts is not None and _hash_sources(texts) != _hash_sources(recommendations.DEFAULT_TEXTS):
+        # ชุดโมเดลที่ต่างกันแค่ข้อความ DNA/คำแนะนำ ต้องได้รุ่นต่างกัน (ผลเดิมแสดงข้อความของชุดที่ให้คะแนน)
+        sources['texts'] = _hash_sources(texts)
+    return _hash_sources(sources)
+
+def load_rescale(base_dir, key):
+    # อ่านตารางแปลงคะแนนของโมเดลรุ่นนี้ คืนค่า None ถ้ายังไม่เคย Calibrate
+    try:
+        with open(os.path.join(base_dir, CALIBRATION_FILE), encoding='utf-8') as f:
+            entry = json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+    if entry is None:
+        print(f"ยังไม่มีผล Calibration ของโมเดลรุ่นนี้ ({key}) ใช้ช่วงคะแนนเริ่มต้น", file=sys.stderr)
+        return None
+    raw, score = np.asarray(entry['raw'], dtype=float), np.asarray(entry['score'], dtype=float)
+    if len(raw) < 2 or len(raw) != len(score) or np.any(np.diff(raw) <= 0) or np.any(np.diff(score) < 0):
+        print(f"{CALIBRATION_FILE} ของรุ่น {key} ไม่ถูกต้อง ใช้ช่วงคะแนนเริ่มต้น", file=sys.stderr)
+        return None
+    return raw, score
+
+def _finish(base_dir, kmeans, scaler, predictor, template, cluster_table, predictor_file, member=None):
+    key = model_key(base_dir, predictor_file, member)
+    rescale = load_rescale(base_dir, key) if predictor_file else None
+    try:
+        texts = recommendations.load_texts(base_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"{recommendations.TEXTS_FILE} ไม่ถูกต้อง ใช้ข้อความเริ่มต้น: {e}", file=sys.stderr)
+        texts = None
+    version = model_version(base_dir, predictor_file, rescale, member, texts)
+    return Resources(kmeans, scaler, predictor, template, cluster_table, version, rescale, key, texts, predictor_file)
+
+@contextmanager
+def _measured(memory, group, name):
+    # วัด RSS ที่เพิ่มขึ้นระหว่างโหลด (memory = dict หรือ None ถ้าไม่ต้องการ)
+    before = memory_budget.rss_mb() if memory is not None else None
+    try:
+        yield
+    finally:
+        if memory is not None:
+            after = memory_budget.rss_mb()
+            memory.setdefault(group, {})[name] = None if before is None or after is None else max(0.0, after - before)
+
+def load_artifacts(base_dir=BASE_DIR, timings=None, variant=None, memory=None):
+    try:
+        return _load_artifacts(base_dir, timings, variant, memory)
+    finally:
+        if memory is not None:
+            memory['rss_mb'] = memory_budget.rss_mb()
+
+def _load_artifacts(base_dir, timings, variant, memory):
+    kmeans_path = os.path.join(base_dir, 'kmeans_behavior_model.joblib')
+    scaler_path = os.path.join(base_dir, 'scaler_behavior.joblib')
+    if not os.path.exists(kmeans_path) or not os.path.exists(scaler_path):
+        raise FileNotFoundError("ไม่พบไฟล์โมเดล Clustering (.joblib) กรุณาตรวจสอบ GitHub")
+
+    with _timed(timings, 'joblib'), _measured(memory, 'models', 'kmeans+scaler'):
+        kmeans = joblib.load(kmeans_path)
+        scaler = joblib.load(scaler_path)
+
+    try:
+        with _timed(timings, 'cluster_table'):
+            cluster_table = cluster_lookup.load_table(base_dir, CLUSTER_FEATURES)
+    except Exception as e:
+        print(f"Cluster Table Error: {e}", file=sys.stderr)
+        cluster_table = None
+
+    # รุ่น compiled (export_compiled.py) ใช้แค่ numpy ไม่ต้องแตกไฟล์หรือ import AutoGluon
+    model_path = _variant_path(base_dir, variant)
+    if model_path is not None and os.path.exists(os.path.join(model_path, COMPILED_FILE)):
+        compiled_path = os.path.join(model_path, COMPILED_FILE)
+        with _timed(timings, 'predictor_load'), _measured(memory, 'models', 'compiled'):
+            predictor = CompiledModel.load(compiled_path, mmap=os.environ.get(MMAP_ENV, '1') != '0')
+        with _timed(timings, 'schema'):
+            template = feature_schema.load_template(base_dir)
+        return _finish(base_dir, kmeans, scaler, predictor, template, cluster_table, compiled_path)
+
+    # โหลด AutoGluon (แตกไฟล์ Part แบบ Stream + ตรวจ SHA-256 + ล็อกไม่ให้ Replica แย่งกัน)
+    with _timed(timings, 'extract'):
+        extract_path = model_archive.ensure_extracted(base_dir)
+
+    if extract_path is None:
+        # กรณีไม่มีไฟล์ part และไม่มีโฟลเดอร์โมเดลจริง -> โหมด Demo (template = None)
+        if not os.path.exists(os.path.join(base_dir, "Ag-20250201_135012")):
+            return _finish(base_dir, kmeans, scaler, None, None, cluster_table, None)
+        extract_path = os.path.join(base_dir, model_archive.EXTRACT_DIR)
+
+    # ค้นหา path ของ predictor.pkl (หรือใช้รุ่นที่เลือกไว้ผ่าน FINCHECK_PREDICTOR_VARIANT)
+    if model_path is None:
+        model_path = extract_path
+        for root, dirs, files in os.walk(extract_path):
+            if 'predictor.pkl' in files:
+                model_path = root
+                break
+
+    # Import AutoGluon ตรงนี้ (ไม่ใช่บนสุดของไฟล์) เพราะดึง torch/fastai/lightgbm มาด้วยและช้ามาก
+    try:
+        with _timed(timings, 'import_autogluon'), _measured(memory, 'libraries', 'autogluon.tabular'):
+            from autogluon.tabular import TabularPredictor
+        with _timed(timings, 'predictor_load'):
+            predictor = TabularPredictor.load(model_path, require_py_version_match=False)
+    except Exception:
+        predictor = None # กรณีโหลดไม่ได้จริงๆ
+
+    # มีงบหน่วยความจำ -> เลือก Ensemble ที่ดีที่สุดที่พอดีงบ และโหลดเฉพาะโมเดลในสายนั้น
+    budget = memory_budget.budget_from_env()
+    member = None
+    if predictor is not None and budget is not None:
+        try:
+            original = predictor.model_best
+            with _timed(timings, 'memory_budget'):
+                chosen = memory_budget.load_within_budget(predictor, budget, memory)
+            if chosen['model'] != original:
+                member = chosen['model']
+        except Exception as e:
+            print(f"[memory] เลือกโมเดลตามงบไม่สำเร็จ ใช้ Ensemble เต็ม: {e}", file=sys.stderr)
+
+    # โหลดแม่แบบตาราง (สำหรับ Imputation) จาก Sidecar อ่าน Excel เฉพาะเมื่อไม่มี/ไม่ตรง
+    try:
+        with _timed(timings, 'schema'):
+            template = feature_schema.load_template(base_dir)
+    except Exception:
+        template = pd.DataFrame() # กรณีไม่มีไฟล์
+
+    predictor_file = os.path.join(model_path, 'predictor.pkl')
+    if predictor is None or not os.path.exists(predictor_file):
+        predictor_file = None
+    return _finish(base_dir, kmeans, scaler, predictor, template, cluster_table, predictor_file, member)
+
+# ==========================================
+# 3. ขั้นตอนการให้คะแนน (ทำงานแบบ Vectorized ทีละก้อน)
+# ==========================================
+def prepare_answers(answers):
+    # เรียงคอลัมน์ให้ตรงกับแบบประเมิน ข้อที่ไม่ได้ตอบ/ค่านอกช่วงจะเป็น NaN (ตาม feature_schema)
+    return pd.DataFrame(feature_schema.answer_matrix(answers), columns=INPUT_COLUMNS)
+
+def assign_clusters(answers, scaler, kmeans, table=None):
+    if table is not None:
+        # เปิดตาราง DNA แทนการเรียก scaler + kmeans (คำตอบต้องเป็นจำนวนเต็ม 0-5)
+        values = answers[CLUSTER_FEATURES].to_numpy(dtype=float)
+        cluster_id = cluster_lookup.lookup(table, np.where(np.isnan(values), 0.0, values))
+        if cluster_id is not None:
+            return cluster_id
+
+    X_cluster = answers[CLUSTER_FEATURES].fillna(0)
+
+    X_scaled = scaler.transform(X_cluster)
+    return np.ravel(kmeans.predict(X_scaled)).astype(int)
+
+def build_prediction_frame(answers, template):
+    # จองตาราง float64 ทั้งก้อนจากแถวแม่แบบ (NaN + ค่าเริ่มต้น SIZ/YER) แล้วเติมคำตอบทุกคอลัมน์ในคำสั่งเดียว
+    positions = template.columns.get_indexer(INPUT_COLUMNS)
+    found = positions >= 0
+    values = np.repeat(template.to_numpy(dtype=feature_schema.ANSWER_DTYPE), len(answers), axis=0)
+    values[:, positions[found]] = answers[INPUT_COLUMNS].to_numpy(dtype=feature_schema.ANSWER_DTYPE)[:, found]
+    return pd.DataFrame(values, columns=template.columns, copy=False)
+
+def predict_risk_prob(answers, predictor, template):
+    if isinstance(predictor, CompiledModel):
+        # ตารางต้นไม้ numpy รับคำตอบ 15 ข้อโดยตรง ไม่ต้องสร้างแถว 143 คอลัมน์
+        return predictor.predict_positive(answers)
+
+    pred_df = build_prediction_frame(answers, template)
+    prob_df = predictor.predict_proba(pred_df)
+    # คอลัมน์สุดท้ายคือความน่าจะเป็นของคลาสเสี่ยง (เหมือน prob_array[-1] ในหน้าเว็บ)
+    return np.asarray(prob_df.values, dtype=float).reshape(len(answers), -1)[:, -1]
+
+def rescale_risk(prob, rescale=None):
+    # เปิดตารางแปลงคะแนน (ค่าระหว่างจุดเทียบบัญญัติไตรยางศ์ ค่านอกช่วงถูกตัดที่คะแนนแรก/สุดท้าย ไม่ทะลุ 0-100)
+    raw, score = rescale if rescale is not None else DEFAULT_RESCALE
+    return np.interp(np.asarray(prob, dtype=float), raw, score)
+
+def risk_bands(scores):
+    # ลำดับระดับความเสี่ยง (index ใน RISK_BANDS) ของคะแนนทั้งชุด ขอบบนของช่วงปานกลาง (70) นับเป็นปานกลาง
+    low, high = RISK_BAND_EDGES
+    scores = np.asarray(scores, dtype=float)
+    return np.where(scores < low, 0, np.where(scores <= high, 1, 2))
+
+def risk_band(score):
+    # คืนค่า (ชื่อระดับ, สีตัวอักษร) ของคะแนนเดียว
+    return RISK_BANDS[int(risk_bands(score))]
+
+def fallback_risk(answers):
+    # กรณีไม่มีโมเดล (Demo) ใช้สูตรถ่วงน้ำหนักอย่างง่าย
+    score = (answers['PRC_CFW'].fillna(0) * 0.4
+             + answers['CAP_NETW'].fillna(0) * 0.3
+             + answers['BEH_MON'].fillna(0) * 0.3).to_numpy(dtype=float)
+    prob = 1 - (score / 5.0)
+    return prob, prob * 100
+
+def has_predictor(resources):
+    return resources.predictor is not None and resources.template is not None and not resources.template.empty
+
+def score_chunk(answers, resources, predict=None):
+    # predict = ฟังก์ชันพยากรณ์แทนการเรียกโมเดลตรงๆ (เช่น ส่งผ่านตัวรวม Batch ของหน้าเว็บ)
+    cluster_id = assign_clusters(answers, resources.scaler, resources.kmeans, resources.cluster_table)
+    if has_predictor(resources):
+        prob = (predict(answers) if predict is not None
+                else predict_risk_prob(answers, resources.predictor, resources.template))
+        risk_score = rescale_risk(prob, resources.rescale)
+    else:
+        prob, risk_score = fallback_risk(answers)
+
+    return pd.DataFrame({'cluster_id': cluster_id, 'risk_prob': prob, 'risk_score': risk_score})
+
+def score_frame(df, resources, chunk_size=DEFAULT_CHUNK_SIZE):
+    missing = [c for c in INPUT_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"ไฟล์ข้อมูลขาดคอลัมน์: {', '.join(missing)}")
+
+    answers = prepare_answers(df)
+    parts = [score_chunk(answers.iloc[start:start + chunk_size].reset_index(drop=True), resources)
+             for start in range(0, len(answers), chunk_size)]
+    if not parts:
+        return pd.DataFrame({'cluster_id': pd.Series(dtype=int),
+                             'risk_prob': pd.Series(dtype=float),
+                             'risk_score': pd.Series(dtype=float)})
+    return pd.concat(parts, ignore_index=True)
+
+# ==========================================
+# 4. อ่าน/เขียนไฟล์ และ Command Line
+# ==========================================
+def read_table(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return pd.read_csv(path)
+    if ext == '.parquet':
+        return pd.read_parquet(path)
+    if ext in ('.xlsx', '.xls'):
+        return pd.read_excel(path)
+    raise ValueError(f"ไม่รองรับไฟล์ประเภท {ext} (รองรับ .csv, .parquet, .xlsx)")
+
+def write_table(df, path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        df.to_csv(path, index=False)
+    elif ext == '.parquet':
+        df.to_parquet(path, index=False)
+    elif ext in ('.xlsx', '.xls'):
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"ไม่รองรับไฟล์ประเภท {ext} (รองรับ .csv, .parquet, .xlsx)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: ให้คะแนนความเสี่ยงแบบ Batch")
+    parser.add_argument('input', help="ไฟล์คำตอบ 15 ข้อ (.csv / .parquet / .xlsx)")
+    parser.add_argument('-o', '--output', required=True, help="ไฟล์ผลลัพธ์ (.csv / .parquet / .xlsx)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="จำนวนแถวต่อการเรียกโมเดล 1 ครั้ง")
+    args = parser.parse_args(argv)
+
+    resources = load_artifacts()
+    if not has_predictor(resources):
+        print("ไม่พบโมเดล AutoGluon กำลังทำงานในโหมด Demo...", file=sys.stderr)
+
+    df = read_table(args.input)
+    started = time.perf_counter()
+    scores = score_frame(df, resources, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+
+    result = pd.concat([df.reset_index(drop=True), scores], axis=1)
+    write_table(result, args.output)
+    print(f"ให้คะแนน {len(result):,} แถว ใน {elapsed:.2f} วินาที -> {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
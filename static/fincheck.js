@@ -0,0 +1,54 @@
+// ==========================================
+// SME FinCheck: ติดตั้งครั้งเดียวต่อหน้าเบราว์เซอร์ (app.py ฝังโค้ดนี้ลงหน้าหลักในรอบแรกของ Session)
+// ==========================================
+// 1. โหลด fonts.css (ถ้ามี) + fincheck.css จาก app/static (เบราว์เซอร์ Cache ไว้ ไม่ต้องส่งซ้ำทุกรอบ)
+// 2. เลื่อนหน้าจอขึ้นบนสุดเมื่อตัวระบุหน้า (.fc-page) เปลี่ยน แทนการสร้าง iframe ใหม่ทุกครั้งที่เปลี่ยนหน้า
+(function () {
+    if (window.__fincheckAssets) {
+        return;
+    }
+    window.__fincheckAssets = true;
+
+    var base = document.baseURI;
+
+    function addStyle(path, id) {
+        // อ่านเป็นข้อความแล้วใส่ <style> (ใช้ได้แม้ Server ส่ง Content-Type เป็น text/plain)
+        fetch(new URL(path, base)).then(function (response) {
+            return response.ok ? response.text() : '';
+        }).then(function (css) {
+            if (!css || document.getElementById(id)) {
+                return;
+            }
+            var style = document.createElement('style');
+            style.id = id;
+            style.textContent = css;
+            document.head.appendChild(style);
+        }).catch(function () {});
+    }
+
+    addStyle('app/static/fonts/fonts.css', 'fincheck-fonts');
+    addStyle('app/static/fincheck.css', 'fincheck-css');
+
+    function scrollToTop() {
+        window.scrollTo(0, 0);
+        var containers = document.querySelectorAll('.main, .block-container, .stApp, [data-testid="stMain"]');
+        for (var i = 0; i < containers.length; i++) {
+            containers[i].scrollTop = 0;
+        }
+    }
+
+    var currentPage = null;
+    new MutationObserver(function () {
+        var marker = document.querySelector('.fc-page');
+        var page = marker && marker.getAttribute('data-page');
+        if (!page || page === currentPage) {
+            return;
+        }
+        var first = currentPage === null;
+        currentPage = page;
+        if (!first) {
+            // รอให้ Streamlit วาดหน้าใหม่เสร็จก่อน (เหมือน scroll_to_top เดิม)
+            setTimeout(scrollToTop, 150);
+        }
+    }).observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['data-page']});
+})();
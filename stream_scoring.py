@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import scoring
+
+# ==========================================
+# 1. Worker (โหลดโมเดลครั้งเดียวต่อ Process)
+# ==========================================
+_RESOURCES = None
+
+def _init_worker(base_dir, threads_per_worker):
+    global _RESOURCES
+    scoring.limit_threads(threads_per_worker)
+    _RESOURCES = scoring.load_artifacts(base_dir)
+
+def _score_part(index, chunk, part_path):
+    scores = scoring.score_frame(chunk, _RESOURCES, chunk_size=len(chunk) or 1)
+    result = pd.concat([chunk.reset_index(drop=True), scores], axis=1)
+
+    # เขียนไฟล์ชั่วคราวแล้วค่อย rename เพื่อไม่ให้เหลือไฟล์ครึ่งๆ กลางๆ ตอนเครื่องล่ม
+    tmp_path = part_path + '.tmp'
+    result.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, part_path)
+    return index, len(result)
+
+# ==========================================
+# 2. อ่านไฟล์ทีละก้อน (ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ)
+# ==========================================
+def iter_chunks(path, chunk_size):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif ext == '.parquet':
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif ext in ('.xlsx', '.xls'):
+        # Excel ไม่รองรับการอ่านแบบ Stream ผ่าน pandas จึงแบ่งก้อนหลังอ่าน
+        df = pd.read_excel(path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise ValueError(f"ไม่รองรับไฟล์ประเภท {ext} (รองรับ .csv, .parquet, .xlsx)")
+
+# ==========================================
+# 3. Checkpoint สำหรับทำงานต่อหลังเครื่องล่ม
+# ==========================================
+def _part_path(parts_dir, index):
+    return os.path.join(parts_dir, f'part-{index:06d}.parquet')
+
+def _prepare_parts_dir(input_path, parts_dir, chunk_size, restart):
+    stat = os.stat(input_path)
+    manifest = {
+        'input': os.path.abspath(input_path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'chunk_size': chunk_size,
+    }
+    manifest_path = os.path.join(parts_dir, 'manifest.json')
+
+    if restart and os.path.exists(parts_dir):
+        shutil.rmtree(parts_dir)
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            if json.load(f) != manifest:
+                raise RuntimeError(f"ไฟล์ค้างใน {parts_dir} มาจากไฟล์นำเข้าหรือ chunk-size อื่น (ใช้ --restart เพื่อเริ่มใหม่)")
+    else:
+        os.makedirs(parts_dir, exist_ok=True)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+def _unified_schema(paths):
+    # คอลัมน์ที่ส่งผ่านจากไฟล์นำเข้า (เช่น รหัสลูกค้า) อาจได้ชนิดต่างกันในแต่ละก้อน
+    # (ก้อนที่เป็นค่าว่างทั้งหมด = double, ก้อนอื่น = string) -> ยกชนิดให้เข้ากันได้ ถ้าไม่ได้ใช้ string
+    schemas = [pq.read_schema(path).remove_metadata() for path in paths]
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, []).append(field.type)
+    fields = []
+    for name, candidates in types.items():
+        try:
+            merged = pa.unify_schemas([pa.schema([(name, t)]) for t in candidates], promote_options='permissive')
+            fields.append(merged.field(name))
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+def _merge_parts(parts_dir, n_parts, output_path):
+    # รวมไฟล์ย่อยตามลำดับก้อนทีละไฟล์ (ใช้หน่วยความจำเท่าหนึ่งก้อน)
+    tmp_path = output_path + '.tmp'
+    paths = [_part_path(parts_dir, index) for index in range(n_parts)]
+    try:
+        if paths:
+            schema = _unified_schema(paths)
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                for path in paths:
+                    table = pq.read_table(path)
+                    writer.write_table(table.select(schema.names).cast(schema))
+        else:
+            pq.write_table(pa.table({}), tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        # ไม่ทิ้งไฟล์ผลลัพธ์ครึ่งๆ กลางๆ (ไฟล์ย่อยยังอยู่ แก้แล้วรันซ้ำได้โดยไม่ต้องให้คะแนนใหม่)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# ==========================================
+# 4. ตัวจัดการงานหลัก
+# ==========================================
+def stream_score(input_path, output_path, workers=None, chunk_size=scoring.DEFAULT_CHUNK_SIZE,
+                 base_dir=scoring.BASE_DIR, restart=False, keep_parts=False, max_pending=None):
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    parts_dir = output_path + '.parts'
+    _prepare_parts_dir(input_path, parts_dir, chunk_size, restart)
+
+    started = time.perf_counter()
+    n_parts = 0
+    scored_rows = 0
+    skipped_rows = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(base_dir, threads_per_worker)) as pool:
+        pending = set()
+        for index, chunk in enumerate(iter_chunks(input_path, chunk_size)):
+            n_parts = index + 1
+            part_path = _part_path(parts_dir, index)
+            if os.path.exists(part_path):
+                skipped_rows += len(chunk)
+                continue
+
+            # จำกัดจำนวนก้อนที่รอประมวลผล เพื่อให้หน่วยความจำคงที่
+            while len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                scored_rows += sum(f.result()[1] for f in done)
+
+            pending.add(pool.submit(_score_part, index, chunk, part_path))
+
+        for future in pending:
+            scored_rows += future.result()[1]
+
+    _merge_parts(parts_dir, n_parts, output_path)
+    if not keep_parts:
+        shutil.rmtree(parts_dir)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': scored_rows + skipped_rows,
+        'scored_rows': scored_rows,
+        'resumed_rows': skipped_rows,
+        'chunks': n_parts,
+        'seconds': elapsed,
+        'rows_per_sec': scored_rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SME FinCheck: ให้คะแนนไฟล์ขนาดใหญ่แบบ Stream หลาย Process")
+    parser.add_argument('input', help="ไฟล์คำตอบ 15 ข้อ (.csv / .parquet / .xlsx)")
+    parser.add_argument('-o', '--output', required=True, help="ไฟล์ผลลัพธ์ .parquet")
+    parser.add_argument('--workers', type=int, default=None, help="จำนวน Process (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument('--chunk-size', type=int, default=scoring.DEFAULT_CHUNK_SIZE, help="จำนวนแถวต่อก้อน")
+    parser.add_argument('--restart', action='store_true', help="ลบงานที่ค้างไว้และเริ่มใหม่ทั้งหมด")
+    parser.add_argument('--keep-parts', action='store_true', help="เก็บไฟล์ย่อยแต่ละก้อนไว้หลังรวมไฟล์")
+    args = parser.parse_args(argv)
+
+    if not args.output.lower().endswith('.parquet'):
+        parser.error("ไฟล์ผลลัพธ์ต้องเป็น .parquet")
+
+    summary = stream_score(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                           restart=args.restart, keep_parts=args.keep_parts)
+    print(f"ให้คะแนน {summary['rows']:,} แถว ({summary['chunks']} ก้อน, ทำต่อจากเดิม {summary['resumed_rows']:,} แถว) "
+          f"ใน {summary['seconds']:.2f} วินาที = {summary['rows_per_sec']:,.0f} แถว/วินาที -> {args.output}",
+          file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
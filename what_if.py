@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import feature_schema
+from result_cache import encode_answers
+
+# ==========================================
+# จำลอง "ถ้าปรับคำตอบข้อนี้" (What-if) ทุกข้อพร้อมกัน
+# ==========================================
+# คำตอบปัจจุบัน + ทุกข้อขยับลง/ขึ้น 1 ระดับ (ข้อ มี/ไม่มี = สลับ) -> ตารางไม่เกิน 31 แถว
+# แถวที่เคยประเมินแล้วอ่านจาก ResultCache (คำตอบชุดเดียวกัน = ผลเดียวกัน ใช้ร่วมกับผลการประเมินปกติ)
+# แถวที่เหลือให้คะแนนในการเรียกครั้งเดียว (พยากรณ์ 1 Batch + จัดกลุ่ม DNA แบบ Vectorized)
+STEP = 1
+
+def perturb(values):
+    # คืนค่า (ตารางคำตอบ แถวแรก = คำตอบปัจจุบัน, [(ข้อ, ค่าเดิม, ค่าใหม่)] ของแถวที่เหลือ)
+    values = np.asarray(values, dtype=feature_schema.ANSWER_DTYPE)
+    rows, moves = [values], []
+    for i, column in enumerate(feature_schema.INPUT_COLUMNS):
+        if np.isnan(values[i]):
+            continue # ข้อที่ไม่ได้ตอบ
+        for delta in (-STEP, STEP):
+            new = values[i] + delta
+            if feature_schema.INPUT_LOW[i] <= new <= feature_schema.INPUT_HIGH[i]:
+                row = values.copy()
+                row[i] = new
+                rows.append(row)
+                moves.append((column, float(values[i]), float(new)))
+    return np.vstack(rows), moves
+
+def score_rows(matrix, score_fn, cache=None):
+    # score_fn(answers DataFrame) -> DataFrame (cluster_id, risk_prob, risk_score) เรียงตามแถว
+    # คืนค่า (cluster_id, risk_score, จำนวนแถวที่ต้องให้คะแนนจริง)
+    n = len(matrix)
+    cluster_id, risk_score = np.zeros(n, dtype=int), np.zeros(n)
+    codes = [encode_answers(row) for row in matrix] if cache is not None else [None] * n
+    missing = []
+    for i, code in enumerate(codes):
+        cached = cache.get(code) if code is not None else None
+        if cached is None:
+            missing.append(i)
+        else:
+            cluster_id[i], risk_score[i] = cached[0], cached[2]
+
+    if missing:
+        started = time.perf_counter()
+        scores = score_fn(pd.DataFrame(matrix[missing], columns=feature_schema.INPUT_COLUMNS))
+        elapsed = (time.perf_counter() - started) / len(missing)
+        cluster_id[missing] = scores['cluster_id'].to_numpy(dtype=int)
+        risk_score[missing] = scores['risk_score'].to_numpy(dtype=float)
+        for i, result in zip(missing, scores[['cluster_id', 'risk_prob', 'risk_score']].itertuples(index=False)):
+            if codes[i] is not None:
+                cache.put(codes[i], (int(result[0]), float(result[1]), float(result[2])), elapsed)
+    return cluster_id, risk_score, len(missing)
+
+def simulate(answers, score_fn, cache=None):
+    # answers = คำตอบ 1 แถว (dict / DataFrame) คืนค่า (ผลปัจจุบัน, ตารางผลรายข้อ เรียงจากลดความเสี่ยงได้มากสุด, จำนวนแถวที่ให้คะแนนจริง)
+    values = feature_schema.answer_matrix(answers if isinstance(answers, pd.DataFrame) else [answers])[0]
+    matrix, moves = perturb(values)
+    cluster_id, risk_score, scored = score_rows(matrix, score_fn, cache)
+    base = {'cluster_id': int(cluster_id[0]), 'risk_score': float(risk_score[0])}
+    table = pd.DataFrame(moves, columns=['column', 'current', 'new'])
+    table['risk_score'] = risk_score[1:]
+    table['risk_change'] = table['risk_score'] - base['risk_score']
+    table['cluster_id'] = cluster_id[1:]
+    table['cluster_changed'] = table['cluster_id'] != base['cluster_id']
+    return base, table.sort_values('risk_change', kind='stable').reset_index(drop=True), scored